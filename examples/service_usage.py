@@ -0,0 +1,42 @@
+"""Serving requests in-process with AssistantSession."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_cli_assistant import AssistantSession
+
+
+def main():
+    """Share one warm session between threads and coroutines."""
+    # Config, client, system prompt and caches are set up once
+    assistant = AssistantSession(temperature=0.2)
+
+    # One session serves many threads
+    questions = ["What is HTTP/2?", "What is QUIC?", "What is TLS 1.3?"]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        for reply in pool.map(assistant.ask, questions):
+            print(f"{reply.text}\n")
+
+    # Streaming
+    stream = assistant.stream("Write a haiku about caches")
+    for text in stream:
+        print(text, end="", flush=True)
+    print(f"\n{stream.usage}")
+
+    # A chat keeps its transcript between turns
+    chat = assistant.open_chat("service-demo")
+    print(assistant.chat("My name is Sam.", chat).text)
+    print(assistant.chat("What is my name?", chat).text)
+
+    # Async callers
+    async def handle():
+        reply = await assistant.aask("Say hello")
+        print(reply.text)
+        async for text in assistant.astream("Count to five"):
+            print(text, end="", flush=True)
+
+    asyncio.run(handle())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,24 @@
 
 This package provides a comprehensive CLI interface for interacting with
 Google's Gemini AI models, featuring conversation history, streaming responses,
-and advanced configuration options.
+and advanced configuration options. For use from other Python code, see
+:class:`AssistantSession`.
 """
 
+from typing import Any
+
 __version__ = "2.0.0"
 __author__ = "Patrick Larocque"
 
-__all__ = ["__version__", "__author__"]
+__all__ = ["__version__", "__author__", "AssistantSession", "Reply", "ReplyStream"]
+
+_LAZY = {"AssistantSession", "AssistantError", "Reply", "ReplyStream"}
+
+
+def __getattr__(name: str) -> Any:
+    # Imported on first use so that importing the package stays cheap
+    if name in _LAZY:
+        from ai_cli_assistant import assistant
+
+        return getattr(assistant, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,20 @@
 """API interaction logic for Google Gen AI."""
 
+import importlib.util
 import os
-from typing import Any, Optional
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Union
 
+import httpx
 from dotenv import load_dotenv
 from google import genai
-from tenacity import retry, stop_after_attempt, wait_exponential
+from google.genai import types
+from tenacity import RetryCallState, retry
+
+from ai_cli_assistant import cassette, keypool, resilience
+from ai_cli_assistant.config import HttpSettings, KeyPoolSettings
 
 
 class APIError(Exception):
@@ -16,44 +25,195 @@ class MissingAPIKeyError(APIError):
     """Raised when no API key is found."""
 
 
+@dataclass
+class SafetyRating:
+    """One safety classifier result."""
+
+    category: str
+    probability: str
+
+
+@dataclass
+class SafetyBlock:
+    """Why a prompt or a candidate was blocked.
+
+    ``source`` is ``"prompt"`` or ``"candidate"``; ``candidate_index`` is the
+    1-based candidate number for candidate blocks.
+    """
+
+    source: str
+    reason: str
+    ratings: List[SafetyRating] = field(default_factory=list)
+    candidate_index: Optional[int] = None
+
+
 class SafetyError(APIError):
-    """Raised when content is blocked by safety filters."""
+    """Raised when content is blocked by safety filters.
+
+    ``blocks`` holds the structured details, so callers can group failures by
+    category or reason without parsing the message.
+    """
+
+    def __init__(self, message: str, blocks: Optional[List[SafetyBlock]] = None):
+        super().__init__(message)
+        self.blocks = blocks or []
+
+    @property
+    def categories(self) -> List[str]:
+        """Distinct categories of the ratings attached to the blocks."""
+        seen: Dict[str, None] = {}
+        for block in self.blocks:
+            for rating in block.ratings:
+                seen.setdefault(rating.category)
+        return list(seen)
+
+
+class StreamInterruptedError(APIError):
+    """Raised when a stream fails after some output was already delivered."""
+
+    def __init__(self, message: str, partial_text: str):
+        super().__init__(message)
+        self.partial_text = partial_text
+
 
+def build_http_options(settings: HttpSettings) -> types.HttpOptions:
+    """Translate HTTP settings into SDK options for its underlying httpx clients.
+
+    HTTP/2 is only enabled when the optional ``h2`` package is installed.
+    """
+    client_args: Dict[str, Any] = {
+        "limits": httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        "http2": settings.http2 and importlib.util.find_spec("h2") is not None,
+    }
+    if settings.proxy:
+        client_args["proxy"] = settings.proxy
+
+    return types.HttpOptions(
+        timeout=int(settings.timeout * 1000) if settings.timeout else None,
+        client_args=client_args,
+        async_client_args=dict(client_args),
+    )
+
+
+def get_api_keys() -> List[str]:
+    """API keys from the environment or ``.env``.
+
+    ``GEMINI_API_KEYS`` (comma-separated) takes precedence over the single
+    ``GEMINI_API_KEY`` or ``GOOGLE_API_KEY``.
+    """
+    load_dotenv()
+    pooled = os.getenv("GEMINI_API_KEYS")
+    if pooled:
+        keys = [key.strip() for key in pooled.split(",") if key.strip()]
+        if keys:
+            return list(dict.fromkeys(keys))
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    return [api_key] if api_key else []
+
+
+def build_client(
+    http: Optional[HttpSettings] = None,
+    pool: Optional[KeyPoolSettings] = None,
+) -> Any:
+    """Create a Gen AI client using the API key(s) from the environment.
+
+    Args:
+        http: Connection pool, timeout and proxy settings. SDK defaults are
+            used when omitted.
+        pool: Scheduling settings used when several keys are configured.
+
+    Returns:
+        A ``genai.Client``, or a :class:`keypool.PooledClient` with one client
+        per key when ``GEMINI_API_KEYS`` lists more than one.
 
-def build_client() -> genai.Client:
-    """Create a Gen AI client using the API key from the environment.
-    
     Raises:
         MissingAPIKeyError: If no API key is set.
         APIError: If client initialization fails.
     """
-    load_dotenv()
-    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not api_key:
+    keys = get_api_keys()
+    if not keys:
         raise MissingAPIKeyError(
             "Set GEMINI_API_KEY (preferred) or GOOGLE_API_KEY in the environment or .env file."
         )
 
+    kwargs: Dict[str, Any] = {}
+    if http is not None:
+        kwargs["http_options"] = build_http_options(http)
+
     try:
-        return genai.Client(api_key=api_key)
+        clients = [genai.Client(api_key=key, **kwargs) for key in keys]
     except Exception as exc:
         raise APIError(f"Failed to initialize Google Gen AI client: {exc}")
 
+    if len(clients) == 1:
+        return clients[0]
+    return keypool.PooledClient(
+        keypool.KeyPool(
+            [(keypool.key_label(key), client) for key, client in zip(keys, clients)], pool
+        )
+    )
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=1, max=10),
-    reraise=True,
-)
-def call_api_with_retry(
-    client: genai.Client,
-    model: str,
-    prompt: str,
+
+_client_lock = threading.Lock()
+_shared_client: Optional[Any] = None
+_shared_client_key: Optional[str] = None
+
+
+def get_client(
+    http: Optional[HttpSettings] = None,
+    pool: Optional[KeyPoolSettings] = None,
+) -> Any:
+    """Return the process-wide client, building it on first use.
+
+    Every command shares this client, and with it one connection pool, so
+    repeated and concurrent requests reuse keep-alive connections instead of
+    paying a TLS handshake each. A different ``http`` or ``pool`` profile
+    replaces it.
+
+    While a cassette is being replayed, an offline stand-in is returned
+    instead, so no API key is needed.
+
+    Raises:
+        MissingAPIKeyError: If no API key is set.
+        APIError: If client initialization fails.
+    """
+    global _shared_client, _shared_client_key
+    if cassette.replaying():
+        return cassette.OfflineClient()
+    key = "".join(
+        settings.model_dump_json() if settings is not None else "" for settings in (http, pool)
+    )
+    with _client_lock:
+        if _shared_client is None or _shared_client_key != key:
+            _shared_client = build_client(http, pool)
+            _shared_client_key = key
+        return _shared_client
+
+
+def reset_client() -> None:
+    """Drop the shared client so the next :func:`get_client` builds a new one."""
+    global _shared_client, _shared_client_key
+    with _client_lock:
+        _shared_client = None
+        _shared_client_key = None
+
+
+def build_generation_config(
     system_prompt: Optional[str] = None,
     temperature: Optional[float] = None,
-) -> Any:
-    """Call the API with retry logic for transient failures."""
-    config_dict = {}
+    response_schema: Optional[Dict[str, Any]] = None,
+    tools: Optional[List[Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Build the generation config dict, or ``None`` if nothing is set.
+
+    A ``response_schema`` (JSON Schema) asks for a JSON response matching it;
+    ``tools`` are function declarations the model may call.
+    """
+    config_dict: Dict[str, Any] = {}
 
     if system_prompt:
         config_dict["system_instruction"] = system_prompt
@@ -61,52 +221,307 @@ def call_api_with_retry(
     if temperature is not None:
         config_dict["temperature"] = temperature
 
-    return client.models.generate_content(
-        model=model,
-        contents=prompt,
-        config=config_dict if config_dict else None,
+    if response_schema is not None:
+        config_dict["response_mime_type"] = "application/json"
+        config_dict["response_json_schema"] = response_schema
+
+    if tools:
+        config_dict["tools"] = tools
+
+    return config_dict or None
+
+
+def build_contents(prompt: Any, attachments: Optional[List[Any]] = None) -> Any:
+    """Request contents: the prompt alone, or the attached file parts followed by it.
+
+    A list is taken to be complete contents (e.g. a multi-turn tool exchange)
+    and is sent unchanged.
+    """
+    if not attachments or isinstance(prompt, list):
+        return prompt
+    return [*attachments, prompt]
+
+
+def _retry_predicate(retry_state: RetryCallState) -> bool:
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    return exc is not None and resilience.should_retry(exc, retry_state.attempt_number)
+
+
+def _retry_wait(retry_state: RetryCallState) -> float:
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    if exc is None:
+        return 0.0
+    delay = resilience.backoff_delay(
+        retry_state.attempt_number, exc, resilience.get_settings().max_wait
     )
+    return delay or 0.0
+
+
+@cassette.boundary("generate")
+@retry(retry=_retry_predicate, wait=_retry_wait, reraise=True)
+def call_api_with_retry(
+    client: genai.Client,
+    model: str,
+    prompt: Union[str, List[Any]],
+    system_prompt: Optional[str] = None,
+    temperature: Optional[float] = None,
+    response_schema: Optional[Dict[str, Any]] = None,
+    attachments: Optional[List[Any]] = None,
+    tools: Optional[List[Any]] = None,
+) -> Any:
+    """Call the API, retrying transient failures.
+
+    Only retryable errors (and quota errors with a short server-suggested
+    delay) are retried, within the process-wide retry budget, and calls
+    fail fast while the model's circuit breaker is open. ``attachments`` are
+    content parts (e.g. uploaded file references) sent before the prompt;
+    ``prompt`` may also be a full list of contents.
+
+    Raises:
+        resilience.CircuitOpenError: If the model's circuit is open.
+    """
+    return resilience.guarded_call(
+        model,
+        lambda: client.models.generate_content(
+            model=model,
+            contents=build_contents(prompt, attachments),
+            config=build_generation_config(system_prompt, temperature, response_schema, tools),
+        ),
+    )
+
+
+@dataclass
+class StreamStats:
+    """Timing for a streamed response."""
+
+    started: float = field(default_factory=time.perf_counter)
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    output_tokens: Optional[int] = None
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from request to the first text chunk."""
+        if self.first_token is None:
+            return None
+        return self.first_token - self.started
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Output tokens per second, measured from the first token."""
+        if not self.output_tokens or self.first_token is None or self.finished is None:
+            return None
+        elapsed = self.finished - self.first_token
+        return self.output_tokens / elapsed if elapsed > 0 else None
+
+
+@cassette.stream_boundary("stream")
+def stream_with_retry(
+    client: genai.Client,
+    model: str,
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    temperature: Optional[float] = None,
+    stats: Optional[StreamStats] = None,
+    response_schema: Optional[Dict[str, Any]] = None,
+    attachments: Optional[List[Any]] = None,
+) -> Iterator[Any]:
+    """Stream response chunks, reconnecting on failures before the first token.
+
+    Reconnects follow the same classification, budget and circuit breaker as
+    :func:`call_api_with_retry`. Once text has been yielded a retry would
+    duplicate output, so a later failure raises
+    :class:`StreamInterruptedError` carrying the partial text.
+
+    Raises:
+        resilience.CircuitOpenError: If the model's circuit is open.
+    """
+    stats = stats if stats is not None else StreamStats()
+    config = build_generation_config(system_prompt, temperature, response_schema)
+    contents = build_contents(prompt, attachments)
+    breaker = resilience.get_breaker(model)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        received: List[str] = []
+        breaker.before_call()
+        try:
+            for chunk in client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=config,
+            ):
+                text = getattr(chunk, "text", None)
+                if text:
+                    if stats.first_token is None:
+                        stats.first_token = time.perf_counter()
+                    received.append(text)
+                usage = extract_usage(chunk)
+                if "candidates_token_count" in usage:
+                    stats.output_tokens = usage["candidates_token_count"]
+                yield chunk
+        except GeneratorExit:
+            # The consumer stopped early; the backend was answering.
+            breaker.record_success()
+            raise
+        except Exception as exc:
+            breaker.record_failure(resilience.classify_error(exc))
+            if received:
+                raise StreamInterruptedError(
+                    f"Stream interrupted after partial output: {exc}", "".join(received)
+                ) from exc
+            if not resilience.should_retry(exc, attempt):
+                raise
+            delay = resilience.backoff_delay(
+                attempt, exc, resilience.get_settings().max_wait
+            )
+            time.sleep(delay or 0.0)
+            continue
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+
+        stats.finished = time.perf_counter()
+        breaker.record_success()
+        resilience.get_budget().record_success()
+        return
+
+
+def warm_up(client: genai.Client, model: str) -> None:
+    """Open a connection ahead of the first request with a cheap model lookup.
+
+    Errors are ignored: this only primes the connection pool, and a real
+    problem will surface on the next actual request.
+    """
+    try:
+        client.models.get(model=model)
+    except Exception:
+        pass
+
+
+def extract_usage(response: Any) -> Dict[str, int]:
+    """Return the token counts reported in ``usage_metadata``, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+
+    counts = {}
+    for name in ("prompt_token_count", "candidates_token_count", "total_token_count"):
+        value = getattr(usage, name, None)
+        if isinstance(value, int):
+            counts[name] = value
+    return counts
+
+
+@dataclass
+class ResponseResult:
+    """The parts of a response the CLI uses, extracted in one pass."""
+
+    text: str
+    model: str
+    finish_reason: Optional[str] = None
+    safety_ratings: List[SafetyRating] = field(default_factory=list)
+    usage: Dict[str, int] = field(default_factory=dict)
+    latency: Optional[float] = None
+
+
+def enum_name(value: Any) -> str:
+    """Name of an SDK enum value; ``FinishReason.SAFETY`` and ``"SAFETY"`` both give ``SAFETY``."""
+    return getattr(value, "name", None) or str(value)
+
+
+def _ratings(obj: Any) -> List[SafetyRating]:
+    return [
+        SafetyRating(
+            category=enum_name(getattr(rating, "category", "Unknown category")),
+            probability=enum_name(getattr(rating, "probability", "unknown probability")),
+        )
+        for rating in getattr(obj, "safety_ratings", None) or []
+    ]
+
+
+def parse_response(response: Any, model: str, latency: Optional[float] = None) -> ResponseResult:
+    """Extract text, finish reason, safety ratings and usage from a response.
+
+    A response with text takes a fast path that only looks at the first
+    candidate. Otherwise the prompt feedback and every candidate are checked
+    for safety blocks once.
+
+    Raises:
+        SafetyError: If the prompt or a candidate was blocked, with the
+            structured details in ``blocks``.
+        APIError: If the response was empty.
+    """
+    text = getattr(response, "text", None)
+    candidates = getattr(response, "candidates", None)
+    if not isinstance(candidates, (list, tuple)):
+        candidates = []
+
+    if text:
+        first = candidates[0] if candidates else None
+        finish_reason = getattr(first, "finish_reason", None) if first is not None else None
+        return ResponseResult(
+            text=text.strip(),
+            model=model,
+            finish_reason=enum_name(finish_reason) if finish_reason else None,
+            safety_ratings=_ratings(first) if first is not None else [],
+            usage=extract_usage(response),
+            latency=latency,
+        )
+
+    blocks: List[SafetyBlock] = []
+
+    prompt_feedback = getattr(response, "prompt_feedback", None)
+    if prompt_feedback:
+        block_reason = getattr(prompt_feedback, "block_reason", None)
+        if block_reason and "SAFETY" in enum_name(block_reason).upper():
+            blocks.append(
+                SafetyBlock("prompt", enum_name(block_reason), _ratings(prompt_feedback))
+            )
+
+    for index, candidate in enumerate(candidates, start=1):
+        finish_reason = getattr(candidate, "finish_reason", None)
+        if finish_reason and "SAFETY" in enum_name(finish_reason).upper():
+            blocks.append(
+                SafetyBlock(
+                    "candidate",
+                    enum_name(finish_reason),
+                    _ratings(candidate),
+                    candidate_index=index,
+                )
+            )
+
+    if blocks:
+        raise SafetyError(_describe_blocks(blocks), blocks)
+
+    raise APIError("No text returned from the model.")
+
+
+def _describe_blocks(blocks: List[SafetyBlock]) -> str:
+    lines = []
+    for block in blocks:
+        if block.source == "prompt":
+            lines.extend(
+                f"Prompt blocked: {r.category} ({r.probability})" for r in block.ratings
+            )
+        elif block.ratings:
+            lines.extend(
+                f"Candidate {block.candidate_index} blocked: {r.category} ({r.probability})"
+                for r in block.ratings
+            )
+        else:
+            lines.append(
+                f"Candidate {block.candidate_index} blocked for safety (no ratings provided)."
+            )
+    return "\n".join(lines) or "Prompt blocked for safety (no ratings provided)."
 
 
 def handle_response(response: Any, model: str) -> str:
     """Handle API response and extract text or raise errors.
-    
+
     Raises:
         SafetyError: If the response was blocked.
         APIError: If the response was empty.
     """
-    if not getattr(response, "text", None):
-        safety_details = []
-
-        prompt_feedback = getattr(response, "prompt_feedback", None)
-        if prompt_feedback:
-            block_reason = getattr(prompt_feedback, "block_reason", None)
-            if block_reason and "SAFETY" in str(block_reason).upper():
-                prompt_ratings = getattr(prompt_feedback, "safety_ratings", None) or []
-                for rating in prompt_ratings:
-                    category = getattr(rating, "category", "Unknown category")
-                    probability = getattr(rating, "probability", "unknown probability")
-                    safety_details.append(f"Prompt blocked: {category} ({probability})")
-
-        for index, candidate in enumerate(getattr(response, "candidates", None) or []):
-            finish_reason = getattr(candidate, "finish_reason", None)
-            if finish_reason and "SAFETY" in str(finish_reason).upper():
-                ratings = getattr(candidate, "safety_ratings", None) or []
-                if ratings:
-                    for rating in ratings:
-                        category = getattr(rating, "category", "Unknown category")
-                        probability = getattr(rating, "probability", "unknown probability")
-                        safety_details.append(
-                            f"Candidate {index + 1} blocked: {category} ({probability})"
-                        )
-                else:
-                    safety_details.append(
-                        f"Candidate {index + 1} blocked for safety (no ratings provided)."
-                    )
-
-        if safety_details:
-            raise SafetyError("\n".join(safety_details))
-        
-        raise APIError("No text returned from the model.")
-
-    return response.text.strip()
+    return parse_response(response, model).text
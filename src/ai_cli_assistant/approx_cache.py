@@ -0,0 +1,199 @@
+"""Near-duplicate prompt lookup over the conversation history.
+
+Prompts are normalized (case, whitespace, timestamps, dates, UUIDs and long hex
+strings) and reduced to a 64-bit SimHash of their word shingles, so prompts
+that differ only in such details land within a few bits of each other. The
+fingerprints live in a small index file next to the history, updated from the
+byte offset where the previous update stopped; answers are read back from the
+history itself.
+
+A prompt only matches an exchange made with the same model, system prompt and
+temperature. The last two are compared through :func:`settings_digest`, which
+the history stores with each plain ``ask``/``stream`` exchange. Exchanges
+without one never match.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from ai_cli_assistant import history as history_module
+
+HASH_BITS = 64
+SHINGLE_SIZE = 3
+DEFAULT_WINDOW = 5000
+_INDEX_VERSION = 2
+
+_MASKS = (
+    (
+        re.compile(r"\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?"),
+        "<ts>",
+    ),
+    (re.compile(r"\b\d{4}[-/]\d{2}[-/]\d{2}\b|\b\d{1,2}/\d{1,2}/\d{2,4}\b"), "<date>"),
+    (re.compile(r"\b\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?\b"), "<time>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"), "<uuid>"),
+    (re.compile(r"\b(?=[0-9a-f]*\d)[0-9a-f]{8,}\b"), "<hex>"),
+)
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, mask volatile tokens and collapse whitespace."""
+    text = text.lower()
+    for pattern, placeholder in _MASKS:
+        text = pattern.sub(placeholder, text)
+    return " ".join(text.split())
+
+
+def settings_digest(system_prompt: Optional[str], temperature: Optional[float]) -> str:
+    """Digest of the request settings besides the model that shape an answer."""
+    canonical = json.dumps([system_prompt or "", temperature])
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the normalized text's word shingles."""
+    words = _WORD.findall(normalize_prompt(text))
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [
+            " ".join(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+        ]
+
+    weights = [0] * HASH_BITS
+    for shingle in shingles:
+        digest = int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for bit in range(HASH_BITS):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value
+
+
+def similarity(a: int, b: int) -> float:
+    """Fraction of matching bits between two fingerprints (1.0 = identical)."""
+    return 1.0 - (a ^ b).bit_count() / HASH_BITS
+
+
+@dataclass
+class Match:
+    """A previous exchange whose prompt resembles the new one."""
+
+    similarity: float
+    entry: history_module.ConversationEntry
+
+
+class PromptIndex:
+    """SimHash fingerprints of recent history prompts.
+
+    Each record is ``[fingerprint, model, settings, byte_offset]``, where
+    ``settings`` is the entry's :func:`settings_digest`. Only the newest
+    ``window`` records are kept, and chat turns are skipped because their
+    prompts include the session context.
+    """
+
+    def __init__(self, history_file: Optional[str] = None, window: int = DEFAULT_WINDOW):
+        self.history_file = history_file
+        self.window = window
+        self.path = get_index_path(history_file)
+        self.offset = 0
+        self.records: List[list] = []
+
+    @classmethod
+    def load(
+        cls,
+        history_file: Optional[str] = None,
+        window: int = DEFAULT_WINDOW,
+    ) -> "PromptIndex":
+        """Load the index and bring it up to date with the history file."""
+        index = cls(history_file, window)
+        try:
+            data = json.loads(index.path.read_text(encoding="utf-8"))
+            if data.get("version") == _INDEX_VERSION:
+                index.offset = int(data["offset"])
+                index.records = data["records"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        index.update()
+        return index
+
+    def update(self) -> None:
+        """Fingerprint records appended since the last update and save the index."""
+        history_path = history_module.get_history_file(self.history_file)
+        size = history_path.stat().st_size if history_path.exists() else 0
+        if size < self.offset:
+            # The history was cleared or rewritten
+            self.offset, self.records = 0, []
+        if size == self.offset:
+            return
+
+        last_start = None
+        for offset, entry in history_module.iter_history_from(self.offset, self.history_file):
+            if entry.session_id is None:
+                self.records.append(
+                    [simhash(entry.full_prompt()), entry.model, entry.settings_sha256, offset]
+                )
+            last_start = offset
+        if last_start is None:
+            return
+        with open(history_path, "rb") as f:
+            f.seek(last_start)
+            self.offset = last_start + len(f.readline())
+
+        if len(self.records) > self.window:
+            del self.records[: len(self.records) - self.window]
+        self._save()
+
+    def find(
+        self,
+        prompt: str,
+        model: str,
+        settings: str,
+        threshold: float,
+    ) -> Optional[Match]:
+        """Return the most similar previous exchange at or above ``threshold``.
+
+        Only exchanges with ``model`` and the same ``settings`` digest are
+        considered. Ties go to the most recent exchange.
+        """
+        fingerprint = simhash(prompt)
+        best_score, best_offset = -1.0, None
+        for value, record_model, record_settings, offset in reversed(self.records):
+            if record_model != model or record_settings != settings:
+                continue
+            score = similarity(fingerprint, value)
+            if score > best_score:
+                best_score, best_offset = score, offset
+                if score == 1.0:
+                    break
+
+        if best_offset is None or best_score < threshold:
+            return None
+        entry = history_module.read_entry_at(best_offset, self.history_file)
+        return Match(best_score, entry) if entry is not None else None
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=".simhash-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": _INDEX_VERSION, "offset": self.offset, "records": self.records}, f
+            )
+        os.replace(tmp_name, self.path)
+
+
+def get_index_path(history_file: Optional[str] = None) -> Path:
+    """Get the index file that sits next to the history file."""
+    path = history_module.get_history_file(history_file)
+    return path.with_name(f"{path.stem}.simhash.idx")
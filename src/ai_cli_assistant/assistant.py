@@ -0,0 +1,538 @@
+"""Embeddable, in-process assistant for long-running services.
+
+:class:`AssistantSession` is the layer the ``ask``, ``stream`` and ``chat``
+commands are built on. It owns the resolved configuration, the shared API
+client, the system prompt, the model-check, upload and tool caches and the
+history writer. A service creates one at startup and serves every request from
+it, without paying process startup, config resolution or connection setup each
+time::
+
+    from ai_cli_assistant import AssistantSession
+
+    assistant = AssistantSession(model="gemini-2.5-flash")
+    print(assistant.ask("Summarise this log: ...").text)
+
+    for text in assistant.stream("Write a haiku"):
+        print(text, end="")
+
+    reply = await assistant.aask("Hello")
+    async for text in assistant.astream("Write a haiku"):
+        ...
+
+A session can be shared between threads. The async methods run the blocking
+SDK calls on worker threads, so they never block the event loop. A chat keeps
+its transcript in a :class:`~ai_cli_assistant.sessions.ChatSession`; use
+:meth:`AssistantSession.open_chat` to get one per conversation.
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Set, Union
+
+from ai_cli_assistant import api, approx_cache, cassette, resilience
+from ai_cli_assistant import attachments as attachments_module
+from ai_cli_assistant import catalog as catalog_module
+from ai_cli_assistant import history as history_module
+from ai_cli_assistant import sessions as sessions_module
+from ai_cli_assistant import tools as tools_module
+from ai_cli_assistant.config import AssistantConfig, load_config
+from ai_cli_assistant.structured import ResponseSchema
+from ai_cli_assistant.utils import prompts, tokens
+
+AttachmentSpec = Union[str, Path, attachments_module.Attachment, Any]
+ToolSpec = Union[Sequence[str], tools_module.ToolRegistry]
+
+_END = object()
+
+
+class AssistantError(Exception):
+    """Raised when a request names a model the model catalog does not know."""
+
+
+@dataclass
+class Reply:
+    """A complete reply."""
+
+    text: str
+    model: str
+    usage: Dict[str, int] = field(default_factory=dict)
+    data: Any = None
+    tool_results: List[tools_module.ToolResult] = field(default_factory=list)
+    turn: Optional[int] = None
+    response: Any = None
+    latency: Optional[float] = None
+
+
+class ReplyStream:
+    """The text chunks of a streamed reply, for ``for`` and ``async for`` loops.
+
+    Nothing is sent until iteration starts. ``text``, ``usage`` and ``stats``
+    are complete once the stream is exhausted; ``turn`` is set for chat replies.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        start: Callable[["ReplyStream"], Iterator[Any]],
+        on_finish: Callable[["ReplyStream"], None],
+    ):
+        self.model = model
+        self.stats = api.StreamStats()
+        self.usage: Dict[str, int] = {}
+        self.turn: Optional[int] = None
+        self.finished = False
+        self._parts: List[str] = []
+        self._chunks = self._run(start, on_finish)
+
+    @property
+    def text(self) -> str:
+        """The text received so far."""
+        return "".join(self._parts)
+
+    def _run(
+        self,
+        start: Callable[["ReplyStream"], Iterator[Any]],
+        on_finish: Callable[["ReplyStream"], None],
+    ) -> Iterator[str]:
+        last_chunk = None
+        for chunk in start(self):
+            text = getattr(chunk, "text", None)
+            if text:
+                self._parts.append(text)
+                yield text
+            self.usage = api.extract_usage(chunk) or self.usage
+            last_chunk = chunk
+        if not self._parts:
+            # Nothing streamed: surface safety blocks the same way as whole replies
+            api.handle_response(last_chunk, self.model)
+        self.finished = True
+        on_finish(self)
+
+    def __iter__(self) -> "ReplyStream":
+        return self
+
+    def __next__(self) -> str:
+        return next(self._chunks)
+
+    def __aiter__(self) -> "ReplyStream":
+        return self
+
+    async def __anext__(self) -> str:
+        text = await asyncio.to_thread(next, self._chunks, _END)
+        if text is _END:
+            raise StopAsyncIteration
+        return text
+
+    def close(self) -> None:
+        """Stop the stream early, closing the underlying response."""
+        self._chunks.close()
+
+
+class AssistantSession:
+    """Config, client, prompt, caches and history for in-process requests.
+
+    Args:
+        config: Resolved configuration (default: loaded like the CLI does).
+        model: Default model for requests (default: ``config.default_model``).
+        temperature: Default temperature (default: ``config.temperature``).
+        system_prompt: System prompt text; overrides ``template``.
+        template: Named prompt template rendered as the system prompt.
+        variables: Values for the template's variables.
+        client: API client to use instead of the shared one.
+
+    Raises:
+        prompts.TemplateError: If ``template`` cannot be found or rendered.
+    """
+
+    def __init__(
+        self,
+        config: Optional[AssistantConfig] = None,
+        *,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        system_prompt: Optional[str] = None,
+        template: Optional[str] = None,
+        variables: Optional[Mapping[str, str]] = None,
+        client: Optional[Any] = None,
+    ):
+        self.config = config if config is not None else load_config()
+        self.model = model or self.config.default_model
+        self.temperature = temperature if temperature is not None else self.config.temperature
+        if system_prompt is None:
+            if template:
+                registry = prompts.get_template_registry(self.config.template_dirs)
+                system_prompt = registry.render(template, variables)
+            else:
+                system_prompt = prompts.load_system_prompt()
+        self.system_prompt = system_prompt
+
+        self._client = client
+        self._lock = threading.RLock()
+        self._checked_models: Set[str] = set()
+        self._uploads: Optional[attachments_module.UploadCache] = None
+        self._registries: Dict[tuple, tools_module.ToolRegistry] = {}
+        self._default_chat: Optional[sessions_module.ChatSession] = None
+
+    @property
+    def client(self) -> Any:
+        """The API client, created on first use.
+
+        Raises:
+            api.APIError: If no API key is set or the client cannot be created.
+        """
+        with self._lock:
+            if self._client is None:
+                resilience.configure(self.config.retry)
+                self._client = api.get_client(self.config.http, self.config.key_pool)
+            return self._client
+
+    def warm_up(self, model: Optional[str] = None) -> None:
+        """Open a connection ahead of the first request."""
+        api.warm_up(self.client, model or self.model)
+
+    def check_model(self, model: Optional[str] = None) -> None:
+        """Check a model name against the cached model catalog, once per name.
+
+        Raises:
+            AssistantError: If the catalog does not know the model.
+        """
+        model = model or self.model
+        if model in self._checked_models:
+            return
+        message = catalog_module.check_model(
+            model, lambda: self.client, self.config.model_cache_ttl
+        )
+        if message:
+            raise AssistantError(message)
+        with self._lock:
+            self._checked_models.add(model)
+
+    def attach(self, path: Union[str, Path]) -> attachments_module.Attachment:
+        """Upload a file, or reuse its cached upload.
+
+        While a cassette is replaying, nothing is uploaded: replayed requests
+        identify attachments by content.
+
+        Raises:
+            attachments_module.AttachmentError: If the file cannot be read or uploaded.
+        """
+        path = Path(path)
+        with self._lock:
+            if self._uploads is None:
+                self._uploads = attachments_module.UploadCache.load()
+            try:
+                digest, attachment = attachments_module.lookup(path, self._uploads)
+            finally:
+                self._uploads.save()
+        if attachment is not None:
+            return attachment
+        if cassette.replaying():
+            return attachments_module.replay_attachment(path, digest)
+
+        # Uploading (and waiting for processing) can take minutes; other threads
+        # keep using the session meanwhile
+        attachment = attachments_module.upload(self.client, path, digest)
+        with self._lock:
+            self._uploads.handles[digest] = attachment.handle
+            self._uploads.save()
+        return attachment
+
+    def tool_registry(self, tools: ToolSpec) -> tools_module.ToolRegistry:
+        """The registry for a list of tool names, built once per list.
+
+        Raises:
+            tools_module.ToolError: If a tool is unknown or cannot be loaded.
+        """
+        if isinstance(tools, tools_module.ToolRegistry):
+            return tools
+        key = tuple(tools)
+        with self._lock:
+            if key not in self._registries:
+                self._registries[key] = tools_module.ToolRegistry.from_settings(
+                    self.config.tools, list(key)
+                )
+            return self._registries[key]
+
+    def context_budget(self, model: Optional[str] = None) -> Optional[int]:
+        """Tokens left for chat context after the system prompt, if the input limit is known."""
+        catalog = catalog_module.load_catalog()
+        input_limit = catalog.input_token_limit(model or self.model) if catalog else None
+        if not input_limit:
+            return None
+        return input_limit - tokens.estimate_tokens(self.system_prompt)
+
+    def _request_options(
+        self,
+        schema: Optional[ResponseSchema],
+        attachments: Optional[Sequence[AttachmentSpec]],
+    ) -> Dict[str, Any]:
+        options: Dict[str, Any] = {}
+        if schema is not None:
+            options["response_schema"] = schema.json_schema
+        parts = []
+        for item in attachments or []:
+            if isinstance(item, (str, Path)):
+                item = self.attach(item)
+            if isinstance(item, attachments_module.Attachment):
+                cassette.register_file(item.handle.uri, item.handle.sha256)
+                item = item.handle.to_part()
+            parts.append(item)
+        if parts:
+            options["attachments"] = parts
+        return options
+
+    def _settings_digest(self, temperature: float, reusable: bool) -> Optional[str]:
+        # Answers shaped by a schema, attachments or tools get no digest, so they are never reused
+        if not reusable:
+            return None
+        return approx_cache.settings_digest(self.system_prompt, temperature)
+
+    def _log(
+        self,
+        prompt: str,
+        reply_text: str,
+        model: str,
+        usage: Dict[str, int],
+        **extra: Any,
+    ) -> None:
+        if not self.config.enable_history:
+            return
+        with self._lock:
+            history_module.log_conversation(
+                prompt=prompt,
+                response=reply_text,
+                model=model,
+                history_file=self.config.history_file,
+                tokens_used=usage.get("total_token_count"),
+                inline_limit=self.config.history_inline_limit,
+                **extra,
+            )
+
+    def ask(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[ResponseSchema] = None,
+        attachments: Optional[Sequence[AttachmentSpec]] = None,
+        tools: Optional[ToolSpec] = None,
+        on_tool_result: Optional[Callable[[tools_module.ToolResult], None]] = None,
+        history: bool = True,
+        prompt_digest: Optional[str] = None,
+    ) -> Reply:
+        """Send a prompt and return the whole reply.
+
+        Attachments may be paths (uploaded or reused from the upload cache),
+        resolved attachments or content parts. With ``tools``, requested tool
+        calls are run and answered until the model replies with text.
+
+        Raises:
+            api.SafetyError: If the reply was blocked.
+            api.APIError: If the request failed or the reply was empty.
+            structured.SchemaError: If ``schema`` is set and the reply does not follow it.
+            tools_module.ToolError: If a tool cannot be loaded or the tool loop does not end.
+        """
+        model = model or self.model
+        temperature = temperature if temperature is not None else self.temperature
+        options = self._request_options(schema, attachments)
+        tool_results: List[tools_module.ToolResult] = []
+
+        started = time.perf_counter()
+        if tools:
+
+            def collect(result: tools_module.ToolResult) -> None:
+                tool_results.append(result)
+                if on_tool_result is not None:
+                    on_tool_result(result)
+
+            response = tools_module.run_with_tools(
+                self.client,
+                model,
+                prompt,
+                self.system_prompt,
+                temperature,
+                self.tool_registry(tools),
+                max_rounds=self.config.tools.max_rounds,
+                on_result=collect,
+                **options,
+            )
+        else:
+            response = api.call_api_with_retry(
+                self.client, model, prompt, self.system_prompt, temperature, **options
+            )
+
+        result = api.parse_response(response, model, latency=time.perf_counter() - started)
+        text, usage = result.text, result.usage
+        data = schema.parse(text) if schema is not None else None
+        if history:
+            self._log(
+                prompt,
+                text,
+                model,
+                usage,
+                prompt_digest=prompt_digest,
+                settings_digest=self._settings_digest(temperature, not options and not tools),
+            )
+        return Reply(
+            text, model, usage, data, tool_results, response=response, latency=result.latency
+        )
+
+    def stream(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[ResponseSchema] = None,
+        attachments: Optional[Sequence[AttachmentSpec]] = None,
+        history: bool = True,
+        prompt_digest: Optional[str] = None,
+        on_finish: Optional[Callable[[ReplyStream], None]] = None,
+    ) -> ReplyStream:
+        """Stream a reply; the request is sent when iteration starts.
+
+        With ``schema``, the streamed text is JSON following it; parse it
+        incrementally with :class:`structured.JSONArrayParser` if needed.
+
+        Raises:
+            api.StreamInterruptedError: While iterating, if the stream fails after output.
+        """
+        model = model or self.model
+        temperature = temperature if temperature is not None else self.temperature
+
+        def start(stream: ReplyStream) -> Iterator[Any]:
+            return api.stream_with_retry(
+                self.client,
+                model,
+                prompt,
+                self.system_prompt,
+                temperature,
+                stats=stream.stats,
+                **self._request_options(schema, attachments),
+            )
+
+        def finish(stream: ReplyStream) -> None:
+            if on_finish is not None:
+                on_finish(stream)
+            elif history:
+                self._log(
+                    prompt,
+                    stream.text,
+                    model,
+                    stream.usage,
+                    prompt_digest=prompt_digest,
+                    settings_digest=self._settings_digest(
+                        temperature, schema is None and not attachments
+                    ),
+                )
+
+        return ReplyStream(model, start, finish)
+
+    def open_chat(
+        self, name: Optional[str] = None, resume: bool = False
+    ) -> sessions_module.ChatSession:
+        """Start or continue a persistent chat transcript.
+
+        Raises:
+            sessions_module.SessionError: If the session cannot be opened.
+        """
+        return sessions_module.ChatSession.open(
+            sessions_module.get_session_dir(self.config.session_dir),
+            name=name,
+            resume=resume,
+            window=self.config.chat_context_turns,
+            model=self.model,
+        )
+
+    def _chat_session(
+        self, chat: Optional[sessions_module.ChatSession]
+    ) -> sessions_module.ChatSession:
+        if chat is not None:
+            return chat
+        with self._lock:
+            if self._default_chat is None:
+                self._default_chat = self.open_chat()
+            return self._default_chat
+
+    def _record_turn(
+        self,
+        chat: sessions_module.ChatSession,
+        message: str,
+        reply_text: str,
+        usage: Dict[str, int],
+    ) -> int:
+        with self._lock:
+            turn = chat.add_turn(message, reply_text, self.model)
+        self._log(message, reply_text, self.model, usage, session_id=chat.session_id, turn=turn)
+        return turn
+
+    def chat(
+        self,
+        message: str,
+        chat: Optional[sessions_module.ChatSession] = None,
+        *,
+        attachments: Optional[Sequence[AttachmentSpec]] = None,
+        tools: Optional[ToolSpec] = None,
+        on_tool_result: Optional[Callable[[tools_module.ToolResult], None]] = None,
+    ) -> Reply:
+        """Send a chat turn with recent turns as context and record it.
+
+        Without ``chat``, turns go to a new session opened on first use.
+        """
+        chat = self._chat_session(chat)
+        prompt = chat.build_prompt(message, max_tokens=self.context_budget())
+        reply = self.ask(
+            prompt,
+            attachments=attachments,
+            tools=tools,
+            on_tool_result=on_tool_result,
+            history=False,
+        )
+        reply.turn = self._record_turn(chat, message, reply.text, reply.usage)
+        return reply
+
+    def chat_stream(
+        self,
+        message: str,
+        chat: Optional[sessions_module.ChatSession] = None,
+        *,
+        attachments: Optional[Sequence[AttachmentSpec]] = None,
+    ) -> ReplyStream:
+        """Stream a chat turn; it is recorded only if the stream completes."""
+        chat = self._chat_session(chat)
+        prompt = chat.build_prompt(message, max_tokens=self.context_budget())
+
+        def record(stream: ReplyStream) -> None:
+            stream.turn = self._record_turn(chat, message, stream.text.strip(), stream.usage)
+
+        return self.stream(prompt, attachments=attachments, on_finish=record)
+
+    async def aask(self, prompt: str, **kwargs: Any) -> Reply:
+        """:meth:`ask` without blocking the event loop."""
+        return await asyncio.to_thread(self.ask, prompt, **kwargs)
+
+    def astream(self, prompt: str, **kwargs: Any) -> ReplyStream:
+        """:meth:`stream` for ``async for``; each chunk is awaited on a worker thread."""
+        return self.stream(prompt, **kwargs)
+
+    async def achat(
+        self,
+        message: str,
+        chat: Optional[sessions_module.ChatSession] = None,
+        **kwargs: Any,
+    ) -> Reply:
+        """:meth:`chat` without blocking the event loop."""
+        return await asyncio.to_thread(self.chat, message, chat, **kwargs)
+
+    def achat_stream(
+        self,
+        message: str,
+        chat: Optional[sessions_module.ChatSession] = None,
+        **kwargs: Any,
+    ) -> ReplyStream:
+        """:meth:`chat_stream` for ``async for``."""
+        return self.chat_stream(message, chat, **kwargs)
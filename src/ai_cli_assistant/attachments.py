@@ -0,0 +1,271 @@
+"""File attachments uploaded once through the Files API and reused.
+
+Uploaded files are addressed by a handle (name and URI) that the service keeps
+for about 48 hours. Handles are cached by the SHA-256 of the file content with
+their expiry, so the same file is uploaded once and then referenced from any
+later ``ask`` or chat turn until shortly before it expires. Content hashes are
+themselves cached by path, mtime and size, so an unchanged file is not even
+re-read. Uploads stream from an open file rather than loading it into memory.
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.genai import types
+from pydantic import BaseModel, ValidationError
+
+from ai_cli_assistant import api
+from ai_cli_assistant.config import get_cache_dir
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# The service keeps uploads for 48 hours; assume slightly less if it does not say
+DEFAULT_LIFETIME = 47 * 60 * 60
+# Re-upload handles this close to expiry rather than risk them lapsing mid-request
+REUSE_MARGIN = 10 * 60
+PROCESSING_TIMEOUT = 300.0
+PROCESSING_POLL = 2.0
+_CACHE_VERSION = 1
+
+_EXTRA_TYPES = {
+    ".md": "text/markdown",
+    ".py": "text/x-python",
+    ".jsonl": "application/jsonl",
+    ".yaml": "text/yaml",
+    ".yml": "text/yaml",
+}
+
+
+class AttachmentError(Exception):
+    """Raised when a file cannot be read or uploaded."""
+
+
+class FileHandle(BaseModel):
+    """A file stored by the Files API."""
+
+    sha256: str
+    name: str
+    uri: str
+    mime_type: str
+    size: int
+    expires_at: float
+
+    def usable(self, now: Optional[float] = None) -> bool:
+        """Whether the handle stays valid for at least ``REUSE_MARGIN`` seconds."""
+        return self.expires_at - (now if now is not None else time.time()) > REUSE_MARGIN
+
+    def to_part(self) -> types.Part:
+        """Reference the uploaded file in a request."""
+        return types.Part.from_uri(file_uri=self.uri, mime_type=self.mime_type)
+
+
+@dataclass
+class Attachment:
+    """A file resolved to a handle, and whether it was uploaded just now."""
+
+    path: Path
+    handle: FileHandle
+    uploaded: bool
+
+
+def guess_mime_type(path: Path) -> str:
+    """MIME type from the file extension (``application/octet-stream`` if unknown)."""
+    mime_type = _EXTRA_TYPES.get(path.suffix.lower()) or mimetypes.guess_type(path.name)[0]
+    return mime_type or "application/octet-stream"
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_path() -> Path:
+    """Get the location of the upload handle cache."""
+    return get_cache_dir() / "uploads.json"
+
+
+class UploadCache:
+    """Upload handles keyed by content hash, plus content hashes keyed by file path."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or get_cache_path()
+        self.handles: Dict[str, FileHandle] = {}
+        self.hashes: Dict[str, list] = {}  # path -> [mtime_ns, size, sha256]
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "UploadCache":
+        cache = cls(path)
+        try:
+            data = json.loads(cache.path.read_text(encoding="utf-8"))
+            if data.get("version") == _CACHE_VERSION:
+                cache.handles = {
+                    digest: FileHandle.model_validate(handle)
+                    for digest, handle in data["handles"].items()
+                }
+                cache.hashes = data["hashes"]
+        except (OSError, ValueError, KeyError, TypeError, ValidationError):
+            pass
+        return cache
+
+    def save(self) -> None:
+        """Write the cache atomically, dropping handles that have expired."""
+        now = time.time()
+        self.handles = {
+            digest: handle for digest, handle in self.handles.items() if handle.expires_at > now
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=".uploads-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": _CACHE_VERSION,
+                    "handles": {
+                        digest: handle.model_dump() for digest, handle in self.handles.items()
+                    },
+                    "hashes": self.hashes,
+                },
+                f,
+            )
+        os.replace(tmp_name, self.path)
+
+    def content_hash(self, path: Path) -> str:
+        """Hash of ``path``, recomputed only when its mtime or size changed."""
+        stat = path.stat()
+        key = str(path.resolve())
+        cached = self.hashes.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        digest = hash_file(path)
+        self.hashes[key] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+
+def _expiry(uploaded: Any) -> float:
+    expiration = getattr(uploaded, "expiration_time", None)
+    if isinstance(expiration, datetime):
+        return expiration.timestamp()
+    return time.time() + DEFAULT_LIFETIME
+
+
+def _wait_until_active(
+    client: Any,
+    uploaded: Any,
+    sleep: Callable[[float], None],
+    clock: Callable[[], float],
+) -> Any:
+    """Poll files that are still being processed (e.g. video) until they are usable."""
+    deadline = clock() + PROCESSING_TIMEOUT
+    while api.enum_name(getattr(uploaded, "state", None) or "ACTIVE") == "PROCESSING":
+        if clock() > deadline:
+            raise AttachmentError(f"{uploaded.name} is still processing; try again later.")
+        sleep(PROCESSING_POLL)
+        uploaded = client.files.get(name=uploaded.name)
+    if api.enum_name(getattr(uploaded, "state", None) or "ACTIVE") == "FAILED":
+        error = getattr(uploaded, "error", None)
+        raise AttachmentError(
+            f"Processing {uploaded.name} failed: {getattr(error, 'message', None) or error}"
+        )
+    return uploaded
+
+
+def lookup(path: Path, cache: UploadCache) -> Tuple[str, Optional[Attachment]]:
+    """The content hash of ``path`` and its cached upload, if one is still usable.
+
+    Raises:
+        AttachmentError: If the file is missing or cannot be read.
+    """
+    if not path.is_file():
+        raise AttachmentError(f"File not found: {path}")
+
+    try:
+        digest = cache.content_hash(path)
+    except OSError as exc:
+        raise AttachmentError(f"Cannot read {path}: {exc}") from exc
+
+    handle = cache.handles.get(digest)
+    if handle is not None and handle.usable():
+        return digest, Attachment(path, handle, uploaded=False)
+    return digest, None
+
+
+def upload(
+    client: Any,
+    path: Path,
+    digest: str,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> Attachment:
+    """Upload ``path`` and wait until the service can use it; the cache is not touched.
+
+    Raises:
+        AttachmentError: If the upload or its processing fails.
+    """
+    mime_type = guess_mime_type(path)
+    try:
+        with open(path, "rb") as f:
+            uploaded = client.files.upload(
+                file=f,
+                config=types.UploadFileConfig(mime_type=mime_type, display_name=path.name),
+            )
+        uploaded = _wait_until_active(client, uploaded, sleep, clock)
+    except AttachmentError:
+        raise
+    except Exception as exc:
+        raise AttachmentError(f"Uploading {path} failed: {exc}") from exc
+
+    handle = FileHandle(
+        sha256=digest,
+        name=uploaded.name,
+        uri=uploaded.uri,
+        mime_type=getattr(uploaded, "mime_type", None) or mime_type,
+        size=path.stat().st_size,
+        expires_at=_expiry(uploaded),
+    )
+    return Attachment(path, handle, uploaded=True)
+
+
+def replay_attachment(path: Path, digest: str) -> Attachment:
+    """A stand-in handle for ``path`` while replaying a cassette, with no upload.
+
+    Replayed requests identify attachments by content hash, so the URI only has
+    to be unique to the content.
+    """
+    handle = FileHandle(
+        sha256=digest,
+        name=f"files/{digest[:16]}",
+        uri=f"cassette://sha256/{digest}",
+        mime_type=guess_mime_type(path),
+        size=path.stat().st_size,
+        expires_at=time.time() + DEFAULT_LIFETIME,
+    )
+    return Attachment(path, handle, uploaded=False)
+
+
+def resolve(
+    client: Any,
+    path: Path,
+    cache: UploadCache,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> Attachment:
+    """Return a usable handle for ``path``, uploading it only if no cached handle is.
+
+    Raises:
+        AttachmentError: If the file is missing or the upload fails.
+    """
+    digest, attachment = lookup(path, cache)
+    if attachment is None:
+        attachment = upload(client, path, digest, sleep, clock)
+        cache.handles[digest] = attachment.handle
+    return attachment
@@ -0,0 +1,70 @@
+"""Content-addressed, compressed storage for large history bodies."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Optional
+
+
+class BlobNotFoundError(KeyError):
+    """Raised when a blob digest is not present in the store."""
+
+
+class BlobStore:
+    """Deduplicated blob store keyed by the SHA-256 of the UTF-8 text.
+
+    Blobs are zlib-compressed and sharded by the first two hex digits of the
+    digest, e.g. ``<root>/ab/cdef...``. Writing content that is already stored
+    is a no-op, so the same piped file logged many times takes space once.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root).expanduser()
+
+    def path_for(self, digest: str) -> Path:
+        """Return the on-disk location of a blob."""
+        return self.root / digest[:2] / digest[2:]
+
+    def put(self, text: str, digest: Optional[str] = None) -> str:
+        """Store ``text`` and return its digest."""
+        data = text.encode("utf-8")
+        if digest is None:
+            digest = hashlib.sha256(data).hexdigest()
+
+        path = self.path_for(digest)
+        if path.exists():
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data))
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return digest
+
+    def get(self, digest: str) -> str:
+        """Load and decompress a blob.
+
+        Raises:
+            BlobNotFoundError: If no blob with this digest exists.
+        """
+        try:
+            data = self.path_for(digest).read_bytes()
+        except FileNotFoundError:
+            raise BlobNotFoundError(digest) from None
+        return zlib.decompress(data).decode("utf-8")
+
+    def __contains__(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def clear(self) -> None:
+        """Remove every blob."""
+        if self.root.exists():
+            shutil.rmtree(self.root)
@@ -0,0 +1,337 @@
+"""Record and replay API calls ("cassettes").
+
+While recording, every :func:`api.call_api_with_retry` and
+:func:`api.stream_with_retry` call is saved with its outcome to a cassette
+directory. That outcome is the response after retries, the streamed chunks
+with their arrival times, or the final error. While replaying, the same calls
+are answered from the cassette without a client, an API key or the network. A
+pipeline, test suite or benchmark recorded once can then be rerun offline in
+seconds.
+
+Each distinct request is one gzip-compressed JSON file named after a hash of
+its parameters: model, prompt or contents, system prompt, temperature, schema,
+attachments and tools. Attached files are identified by the SHA-256 of their
+content rather than by their upload URI, which changes with every upload, so a
+recording stays valid after its files expire. While replaying, attachments are
+not uploaded at all. A request made several times keeps one outcome per call.
+Replay serves them in order and repeats the last one once they run out, so
+reruns are deterministic. Replay is instant unless pacing is on; then streamed
+chunks arrive with their recorded timing.
+
+From Python::
+
+    with cassette.use(Cassette(Path("fixtures/run1"), CassetteMode.REPLAY)):
+        ...
+"""
+
+import contextlib
+import functools
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from google.genai import errors as genai_errors
+from google.genai import types
+from pydantic import BaseModel
+
+_CASSETTE_VERSION = 1
+# Parameters that do not change what is asked of the model
+_IGNORED_PARAMS = ("client", "stats")
+
+
+class CassetteError(Exception):
+    """Raised when a request cannot be recorded or is missing from a replayed cassette."""
+
+
+class ReplayedError(Exception):
+    """A recorded error that cannot be rebuilt as its original type."""
+
+
+class CassetteMode(str, Enum):
+    """Modes accepted by :class:`Cassette`."""
+
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Enum):
+        return value.value
+    return repr(value)
+
+
+# Content hashes of attached files by upload URI; see register_file
+_file_digests: Dict[str, str] = {}
+
+
+def register_file(uri: str, sha256: str) -> None:
+    """Identify requests that reference ``uri`` by the content hash of the file."""
+    _file_digests[uri] = sha256
+
+
+def _by_content(value: Any) -> Any:
+    """Replace the URIs of registered files in a dumped request with their content hashes."""
+    if isinstance(value, dict):
+        digest = _file_digests.get(value.get("file_uri"))
+        if digest is not None:
+            value = {key: item for key, item in value.items() if key != "file_uri"}
+            value["file_sha256"] = digest
+        return {key: _by_content(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_by_content(item) for item in value]
+    return value
+
+
+def _dump_response(response: Any) -> Dict[str, Any]:
+    if not isinstance(response, BaseModel) or not hasattr(types, type(response).__name__):
+        raise CassetteError(f"Cannot record a {type(response).__name__} response.")
+    return {"type": type(response).__name__, "data": _jsonable(response)}
+
+
+def _load_response(record: Dict[str, Any]) -> Any:
+    return getattr(types, record["type"]).model_validate(record["data"])
+
+
+def _dump_error(exc: BaseException) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"type": type(exc).__name__, "message": str(exc)}
+    if isinstance(exc, genai_errors.APIError):
+        record.update(code=exc.code, details=_jsonable(exc.details))
+    partial_text = getattr(exc, "partial_text", None)
+    if isinstance(partial_text, str):
+        record["partial_text"] = partial_text
+    return record
+
+
+def _load_error(record: Dict[str, Any]) -> BaseException:
+    if "code" in record:
+        cls = getattr(genai_errors, record["type"], genai_errors.APIError)
+        return cls(record["code"], record["details"])
+    if "partial_text" in record:
+        # Imported here: api imports this module
+        from ai_cli_assistant.api import StreamInterruptedError
+
+        return StreamInterruptedError(record["message"], record["partial_text"])
+    return ReplayedError(f"{record['type']}: {record['message']}")
+
+
+class Cassette:
+    """A directory of recorded requests, opened for recording or replay."""
+
+    def __init__(self, directory: Path, mode: CassetteMode, pace: bool = False):
+        self.directory = directory
+        self.mode = mode
+        self.pace = pace
+        self._lock = threading.Lock()
+        # Outcomes recorded by this process, and how many of each were replayed
+        self._recorded: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+
+    @staticmethod
+    def request_key(kind: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Stable hash of a request, and the request as stored in the cassette."""
+        request = {"kind": kind, "params": _by_content(_jsonable(params))}
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest(), request
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key[:24]}.json.gz"
+
+    def _save(self, key: str, request: Dict[str, Any], outcome: Dict[str, Any]) -> None:
+        with self._lock:
+            # A new recording of a request replaces what earlier runs stored for it
+            outcomes = self._recorded.setdefault(key, [])
+            outcomes.append(outcome)
+            data = {"version": _CASSETTE_VERSION, "request": request, "outcomes": outcomes}
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".cassette-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8")))
+            os.replace(tmp_name, self._path(key))
+
+    def _next_outcome(self, key: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        path = self._path(key)
+        try:
+            data = json.loads(gzip.decompress(path.read_bytes()))
+        except (OSError, ValueError) as exc:
+            raise CassetteError(
+                f"No recording in {self.directory} for this {request['kind']} request "
+                f"(model {request['params'].get('model')}); record it with --record."
+            ) from exc
+        outcomes = data["outcomes"]
+        with self._lock:
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+        return outcomes[min(index, len(outcomes) - 1)]
+
+    def call(self, kind: str, params: Dict[str, Any], send: Callable[[], Any]) -> Any:
+        """Record or replay a request that returns one response."""
+        key, request = self.request_key(kind, params)
+        if self.mode == CassetteMode.REPLAY:
+            outcome = self._next_outcome(key, request)
+            if self.pace:
+                time.sleep(outcome.get("elapsed", 0.0))
+            if "error" in outcome:
+                raise _load_error(outcome["error"])
+            return _load_response(outcome["response"])
+
+        started = time.perf_counter()
+        try:
+            response = send()
+        except Exception as exc:
+            self._save(key, request, {"elapsed": _since(started), "error": _dump_error(exc)})
+            raise
+        self._save(key, request, {"elapsed": _since(started), "response": _dump_response(response)})
+        return response
+
+    def stream(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        send: Callable[[], Iterator[Any]],
+        stats: Any = None,
+    ) -> Iterator[Any]:
+        """Record or replay a streamed request, chunk by chunk with arrival times."""
+        key, request = self.request_key(kind, params)
+        if self.mode == CassetteMode.REPLAY:
+            yield from self._replay_stream(self._next_outcome(key, request), stats)
+            return
+
+        started = time.perf_counter()
+        chunks: List[Dict[str, Any]] = []
+        try:
+            for chunk in send():
+                chunks.append({"t": _since(started), "chunk": _dump_response(chunk)})
+                yield chunk
+        except GeneratorExit:
+            # The consumer stopped early; keep what it saw
+            self._save(key, request, {"chunks": chunks})
+            raise
+        except Exception as exc:
+            self._save(key, request, {"chunks": chunks, "error": _dump_error(exc)})
+            raise
+        self._save(key, request, {"chunks": chunks})
+
+    def _replay_stream(self, outcome: Dict[str, Any], stats: Any) -> Iterator[Any]:
+        started = time.perf_counter()
+        if stats is not None:
+            stats.started = started
+        for record in outcome.get("chunks", []):
+            if self.pace:
+                time.sleep(max(0.0, started + record["t"] - time.perf_counter()))
+            chunk = _load_response(record["chunk"])
+            if stats is not None:
+                if stats.first_token is None and getattr(chunk, "text", None):
+                    stats.first_token = time.perf_counter()
+                usage = getattr(chunk, "usage_metadata", None)
+                if getattr(usage, "candidates_token_count", None) is not None:
+                    stats.output_tokens = usage.candidates_token_count
+            yield chunk
+        if "error" in outcome:
+            raise _load_error(outcome["error"])
+        if stats is not None:
+            stats.finished = time.perf_counter()
+
+
+def _since(started: float) -> float:
+    return round(time.perf_counter() - started, 4)
+
+
+_active: Optional[Cassette] = None
+
+
+def activate(cassette: Optional[Cassette]) -> Optional[Cassette]:
+    """Route API calls through ``cassette`` (``None`` to stop); returns the previous one."""
+    global _active
+    previous, _active = _active, cassette
+    return previous
+
+
+def active() -> Optional[Cassette]:
+    """The cassette API calls currently go through, if any."""
+    return _active
+
+
+def replaying() -> bool:
+    """Whether API calls are being answered from a cassette."""
+    return _active is not None and _active.mode == CassetteMode.REPLAY
+
+
+@contextlib.contextmanager
+def use(cassette: Cassette) -> Iterator[Cassette]:
+    """Route API calls through ``cassette`` for the duration of a ``with`` block."""
+    previous = activate(cassette)
+    try:
+        yield cassette
+    finally:
+        activate(previous)
+
+
+def _request_params(signature: inspect.Signature, args: Any, kwargs: Any) -> Dict[str, Any]:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return {name: value for name, value in bound.arguments.items() if name not in _IGNORED_PARAMS}
+
+
+def boundary(kind: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorate an API call so an active cassette can record or replay it."""
+
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            cassette = _active
+            if cassette is None:
+                return fn(*args, **kwargs)
+            params = _request_params(signature, args, kwargs)
+            return cassette.call(kind, params, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorate
+
+
+def stream_boundary(kind: str) -> Callable[[Callable[..., Iterator[Any]]], Callable[..., Any]]:
+    """Decorate a streaming API call so an active cassette can record or replay it."""
+
+    def decorate(fn: Callable[..., Iterator[Any]]) -> Callable[..., Iterator[Any]]:
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Iterator[Any]:
+            cassette = _active
+            if cassette is None:
+                return fn(*args, **kwargs)
+            params = _request_params(signature, args, kwargs)
+            stats = signature.bind(*args, **kwargs).arguments.get("stats")
+            return cassette.stream(kind, params, lambda: fn(*args, **kwargs), stats)
+
+        return wrapper
+
+    return decorate
+
+
+class OfflineClient:
+    """Stands in for the API client while replaying, so no API key is needed.
+
+    Anything other than the recorded calls fails with :class:`CassetteError`.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        raise CassetteError(f"client.{name} is not available while replaying a cassette.")
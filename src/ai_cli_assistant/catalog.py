@@ -0,0 +1,194 @@
+"""Local cache of the model listing with capability metadata.
+
+The catalog is a JSON snapshot of ``client.models.list()`` (names, token
+limits, supported actions) kept in the cache directory. Commands use it to
+validate model names and size token budgets without a network call; a stale
+snapshot is still served while a background thread refreshes it. Short
+commands often finish before that refresh does, so the process waits up to
+``REFRESH_GRACE`` seconds for it at exit.
+"""
+
+import atexit
+import difflib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+from ai_cli_assistant.config import get_cache_dir
+
+DEFAULT_TTL = 24 * 60 * 60
+REFRESH_GRACE = 3.0
+
+_refresh_lock = threading.Lock()
+_refresh_thread: Optional[threading.Thread] = None
+_wait_registered = False
+
+
+class ModelInfo(BaseModel):
+    """Capabilities of a single model."""
+
+    name: str
+    display_name: Optional[str] = None
+    description: Optional[str] = None
+    input_token_limit: Optional[int] = None
+    output_token_limit: Optional[int] = None
+    supported_actions: List[str] = Field(default_factory=list)
+
+    @property
+    def short_name(self) -> str:
+        """The name without the ``models/`` prefix, as passed to ``--model``."""
+        return short_name(self.name)
+
+
+class ModelCatalog(BaseModel):
+    """A timestamped snapshot of the available models."""
+
+    fetched_at: float
+    models: List[ModelInfo] = Field(default_factory=list)
+
+    def is_fresh(self, ttl: float = DEFAULT_TTL) -> bool:
+        """Whether the snapshot is younger than ``ttl`` seconds."""
+        return time.time() - self.fetched_at < ttl
+
+    def get(self, model: str) -> Optional[ModelInfo]:
+        """Look a model up by full or short name."""
+        wanted = short_name(model)
+        for info in self.models:
+            if info.short_name == wanted:
+                return info
+        return None
+
+    def suggestions(self, model: str, limit: int = 3) -> List[str]:
+        """Close matches for an unknown model name."""
+        names = [info.short_name for info in self.models]
+        return difflib.get_close_matches(short_name(model), names, n=limit, cutoff=0.5)
+
+    def input_token_limit(self, model: str) -> Optional[int]:
+        """Maximum input tokens for ``model``, if known."""
+        info = self.get(model)
+        return info.input_token_limit if info else None
+
+
+def short_name(model: str) -> str:
+    """Strip the ``models/`` resource prefix."""
+    return model.removeprefix("models/")
+
+
+def get_catalog_path() -> Path:
+    """Get the location of the cached catalog."""
+    return get_cache_dir() / "models.json"
+
+
+def load_catalog(path: Optional[Path] = None) -> Optional[ModelCatalog]:
+    """Load the cached catalog, or ``None`` if there is no usable snapshot."""
+    path = path or get_catalog_path()
+    try:
+        return ModelCatalog.model_validate_json(path.read_text(encoding="utf-8"))
+    except (OSError, ValidationError, ValueError):
+        return None
+
+
+def save_catalog(catalog: ModelCatalog, path: Optional[Path] = None) -> None:
+    """Write the catalog atomically so concurrent readers never see a partial file."""
+    path = path or get_catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".models-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(catalog.model_dump_json())
+    os.replace(tmp_name, path)
+
+
+def fetch_catalog(client: Any) -> ModelCatalog:
+    """Fetch the full (paginated) model listing from the API."""
+    models = []
+    for model in client.models.list():
+        models.append(
+            ModelInfo(
+                name=getattr(model, "name", None) or "unknown",
+                display_name=getattr(model, "display_name", None),
+                description=getattr(model, "description", None),
+                input_token_limit=getattr(model, "input_token_limit", None),
+                output_token_limit=getattr(model, "output_token_limit", None),
+                supported_actions=list(getattr(model, "supported_actions", None) or []),
+            )
+        )
+    return ModelCatalog(fetched_at=time.time(), models=models)
+
+
+def refresh_catalog(client: Any, path: Optional[Path] = None) -> ModelCatalog:
+    """Fetch and store a new snapshot."""
+    catalog = fetch_catalog(client)
+    save_catalog(catalog, path)
+    return catalog
+
+
+def refresh_in_background(client_factory: Callable[[], Any]) -> Optional[threading.Thread]:
+    """Refresh the snapshot on a daemon thread, unless a refresh is already running.
+
+    Failures are ignored; the stale snapshot simply stays in place. The
+    first refresh registers :func:`wait_for_refresh` to run at exit, so the
+    snapshot is written even when the command finishes first.
+    """
+    global _refresh_thread, _wait_registered
+
+    def worker() -> None:
+        try:
+            refresh_catalog(client_factory())
+        except Exception:
+            pass
+
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return None
+        _refresh_thread = threading.Thread(target=worker, name="model-catalog", daemon=True)
+        _refresh_thread.start()
+        if not _wait_registered:
+            atexit.register(wait_for_refresh)
+            _wait_registered = True
+        return _refresh_thread
+
+
+def wait_for_refresh(timeout: float = REFRESH_GRACE) -> bool:
+    """Wait up to ``timeout`` seconds for a running refresh to finish.
+
+    Returns whether no refresh is still running. A refresh that takes longer
+    is abandoned; the daemon thread does not keep the process alive.
+    """
+    with _refresh_lock:
+        thread = _refresh_thread
+    if thread is None:
+        return True
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def check_model(
+    model: str,
+    client_factory: Callable[[], Any],
+    ttl: float = DEFAULT_TTL,
+) -> Optional[str]:
+    """Validate a model name against the cached catalog without a network call.
+
+    Returns an explanation if the name is unknown, ``None`` if it is known or
+    there is no snapshot yet. A stale snapshot triggers a background refresh.
+    """
+    catalog = load_catalog()
+    if catalog is None:
+        refresh_in_background(client_factory)
+        return None
+    if not catalog.is_fresh(ttl):
+        refresh_in_background(client_factory)
+
+    if catalog.get(model) is not None:
+        return None
+
+    message = f"Unknown model '{model}'."
+    suggestions = catalog.suggestions(model)
+    if suggestions:
+        message += f" Did you mean: {', '.join(suggestions)}?"
+    return message
@@ -1,16 +1,46 @@
 """Enhanced CLI AI assistant using Google Gen AI."""
 
+import json
 import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import typer
+from rich.markup import escape
 from rich.panel import Panel
-
-from ai_cli_assistant import api, ui
+from rich.status import Status
+from rich.table import Table
+
+from ai_cli_assistant import (
+    api,
+    approx_cache,
+    history_stats,
+    ingest,
+    profiling,
+    resilience,
+    structured,
+    ui,
+)
+from ai_cli_assistant import assistant as assistant_module
+from ai_cli_assistant import attachments as attachments_module
+from ai_cli_assistant import cassette as cassette_module
+from ai_cli_assistant import catalog as catalog_module
 from ai_cli_assistant import config as config_module
+from ai_cli_assistant import context as context_module
 from ai_cli_assistant import history as history_module
-from ai_cli_assistant.utils import prompts
+from ai_cli_assistant import jobs as jobs_module
+from ai_cli_assistant import minimize as minimize_module
+from ai_cli_assistant import sessions as sessions_module
+from ai_cli_assistant import tools as tools_module
+from ai_cli_assistant.output import (
+    MachineWriter,
+    OutputFormat,
+    get_binary_stdout,
+    write_records,
+)
+from ai_cli_assistant.runner import RequestCancelledError, RequestRunner
+from ai_cli_assistant.utils import prompts, tokens
 
 # Version
 __version__ = "2.0.0"
@@ -21,32 +51,397 @@ app = typer.Typer(
     help="Enhanced AI assistant powered by Google Gen AI.",
 )
 
-# Global config
+# Global config and the CLI layer it was resolved with
 _config: Optional[config_module.AssistantConfig] = None
+_cli_overrides: Dict[str, Any] = {}
 
 
 def get_config() -> config_module.AssistantConfig:
     """Get or load the global configuration."""
     global _config
     if _config is None:
-        _config = config_module.load_config()
+        _config = config_module.load_config(_cli_overrides)
     return _config
 
 
+def _get_client(cfg: config_module.AssistantConfig) -> Any:
+    """Return the shared API client with the configured retry policy applied."""
+    resilience.configure(cfg.retry)
+    try:
+        return api.get_client(cfg.http, cfg.key_pool)
+    except api.APIError as e:
+        ui.print_error("Initialization Error", str(e))
+        raise typer.Exit(code=1)
+
+
+def _open_session(
+    cfg: config_module.AssistantConfig,
+    model_name: str,
+    temperature: Optional[float],
+    system_prompt: str,
+) -> assistant_module.AssistantSession:
+    """Create the session a command runs on, exiting with an error panel if it has no client."""
+    session = assistant_module.AssistantSession(
+        cfg, model=model_name, temperature=temperature, system_prompt=system_prompt
+    )
+    try:
+        session.client
+    except api.APIError as e:
+        ui.print_error("Initialization Error", str(e))
+        raise typer.Exit(code=1)
+    return session
+
+
+def _load_schema(spec: Optional[str]) -> Optional[structured.ResponseSchema]:
+    """Load the ``--schema`` argument, exiting with an error panel if it is invalid."""
+    if spec is None:
+        return None
+    try:
+        return structured.load_schema(spec)
+    except structured.SchemaError as e:
+        ui.print_error("Schema Error", str(e))
+        raise typer.Exit(code=1)
+
+
+def _finish_structured(writer: MachineWriter, data: Any, items_written: int) -> None:
+    """End machine output for a structured response.
+
+    ``json`` gets the parsed document as ``data``; other formats get it as a
+    single item unless its array elements were already written one by one.
+    """
+    if items_written == 0:
+        writer.item(0, data)
+    if writer.format == OutputFormat.JSON:
+        writer.end(data=data)
+    else:
+        writer.end()
+
+
+def _read_prompt_input(
+    cfg: config_module.AssistantConfig,
+    prompt: Optional[str],
+    prompt_file: Optional[Path],
+) -> ingest.PromptInput:
+    """Read the prompt for ask/stream, exiting with an error message if there is none."""
+    try:
+        prompt_input = ingest.read_prompt(
+            prompt,
+            prompt_file,
+            max_bytes=cfg.max_prompt_bytes,
+            overflow=cfg.prompt_overflow,
+        )
+    except ingest.PromptInputError as e:
+        ui.console.print(f"[red]Error: {e}[/]")
+        raise typer.Exit(code=1)
+
+    if prompt_input.truncated:
+        ui.print_warning(
+            "Input Truncated",
+            f"Input from {prompt_input.source} was cut to the first "
+            f"{cfg.max_prompt_bytes} bytes (max_prompt_bytes).",
+        )
+    return prompt_input
+
+
+def _minimize_prompts(
+    cfg: config_module.AssistantConfig,
+    texts: List[str],
+    enabled: Optional[bool],
+) -> List[str]:
+    """Apply the minimization pipeline if enabled and report the tokens it saved."""
+    if not (cfg.minimize.enabled if enabled is None else enabled):
+        return texts
+    results = [minimize_module.minimize(text, cfg.minimize) for text in texts]
+    before = sum(result.original_tokens for result in results)
+    after = sum(result.tokens for result in results)
+    if before:
+        ui.console.print(
+            f"[dim]Minimized prompt: ~{before:,} → ~{after:,} tokens "
+            f"({(before - after) / before:.0%} saved)[/]"
+        )
+    if cfg.verbose:
+        for step in results[0].saved_by_step if results else []:
+            saved = sum(result.saved_by_step[step] for result in results)
+            ui.console.print(f"[dim]  {step}: ~{saved:,} tokens[/]")
+    return [result.text for result in results]
+
+
+def _load_system_prompt(
+    cfg: config_module.AssistantConfig,
+    template: Optional[str],
+    variables: Optional[List[str]],
+) -> str:
+    """Render the named template, or load the base system prompt if none was given."""
+    if not template:
+        return prompts.load_system_prompt()
+
+    try:
+        registry = prompts.get_template_registry(cfg.template_dirs)
+        values = prompts.parse_variables(variables or [], cfg.max_prompt_bytes)
+        return registry.render(template, values)
+    except prompts.TemplateError as e:
+        ui.print_error("Template Error", str(e))
+        raise typer.Exit(code=1)
+
+
+def _pack_context(
+    cfg: config_module.AssistantConfig,
+    specs: List[str],
+    prompt_text: str,
+    system_prompt: str,
+    model_name: str,
+    budget: Optional[int],
+) -> str:
+    """Prepend the files selected by ``--context`` to the prompt."""
+    if budget is None:
+        budget = cfg.context_budget
+    if budget is None:
+        catalog = catalog_module.load_catalog()
+        input_limit = catalog.input_token_limit(model_name) if catalog else None
+        budget = input_limit or context_module.DEFAULT_BUDGET
+    budget -= tokens.estimate_tokens(prompt_text) + tokens.estimate_tokens(system_prompt)
+
+    try:
+        packed = context_module.pack_context(specs, prompt_text, budget)
+    except context_module.ContextError as e:
+        ui.print_error("Context Error", str(e))
+        raise typer.Exit(code=1)
+
+    summary = (
+        f"Context: {len(packed.files)} of {packed.candidates} files, "
+        f"~{packed.tokens:,} tokens"
+    )
+    if packed.over_budget:
+        summary += f" ({packed.over_budget} did not fit)"
+    ui.console.print(f"[dim]{summary}[/]")
+    if cfg.verbose:
+        for name in packed.files:
+            ui.console.print(f"[dim]  {name}[/]")
+    if not packed.text:
+        return prompt_text
+    return f"{packed.text}{prompt_text}"
+
+
+def _resolve_attachments(
+    session: assistant_module.AssistantSession, paths: Optional[List[Path]]
+) -> List[attachments_module.Attachment]:
+    """Upload ``--attach`` files, reusing cached handles."""
+    resolved = []
+    try:
+        for path in paths or []:
+            with ui.console.status(f"[bold green]Preparing {path.name}..."):
+                attachment = session.attach(path)
+            note = "uploaded" if attachment.uploaded else "cached upload"
+            ui.console.print(f"[dim]Attached {path.name} ({note})[/]")
+            resolved.append(attachment)
+    except attachments_module.AttachmentError as e:
+        ui.print_error("Attachment Error", str(e))
+        raise typer.Exit(code=1)
+    return resolved
+
+
+def _tool_registry(
+    cfg: config_module.AssistantConfig,
+    use_enabled: bool,
+    names: Optional[List[str]],
+    approve_all: bool = False,
+    status: Optional[Status] = None,
+    request_runner: Optional[RequestRunner] = None,
+) -> Optional[tools_module.ToolRegistry]:
+    """Build the registry for ``--tools``/``--tool``, or ``None`` if no tools were asked for.
+
+    Built-in tool calls are confirmed on the terminal unless ``approve_all`` is set;
+    ``status`` is a spinner to hide while asking. For requests run by
+    ``request_runner``, the question is asked on the thread waiting for them.
+    """
+    selected = (list(cfg.tools.enabled) if use_enabled else []) + list(names or [])
+    if not selected:
+        if use_enabled:
+            ui.print_error(
+                "Tool Error",
+                "No tools are enabled. List them under tools.enabled in the config, "
+                "or pick them with --tool NAME.",
+            )
+            raise typer.Exit(code=1)
+        return None
+    settings = cfg.tools
+    if approve_all:
+        settings = settings.model_copy(update={"auto_approve": True})
+
+    def approve(result: tools_module.ToolResult) -> bool:
+        if request_runner is None:
+            return _confirm_tool_call(result, status)
+        return request_runner.on_caller_thread(_confirm_tool_call, result, status, default=False)
+
+    try:
+        return tools_module.ToolRegistry.from_settings(settings, selected, approve=approve)
+    except tools_module.ToolError as e:
+        ui.print_error("Tool Error", str(e))
+        raise typer.Exit(code=1)
+
+
+def _confirm_tool_call(result: tools_module.ToolResult, status: Optional[Status]) -> bool:
+    """Show a tool call the model wants to make and ask whether to allow it.
+
+    Ctrl+C at the question cancels the request rather than only this call.
+    """
+    request = escape(" ".join(str(value) for value in result.args.values()))
+    if not sys.stdin.isatty():
+        ui.print_warning(
+            "Tool Call Not Run",
+            f"{result.name}: {request}\n\nConfirming a tool call needs a terminal; "
+            "pass --yes to allow tool calls without asking.",
+        )
+        return False
+    if status is not None:
+        status.stop()
+    try:
+        ui.console.print(Panel(request, title=f"Allow {result.name}?", border_style="yellow"))
+        return typer.confirm(f"Allow this {result.name} call?", default=False, err=True)
+    except typer.Abort:
+        raise KeyboardInterrupt from None
+    finally:
+        if status is not None:
+            status.start()
+
+
+def _print_tool_result(result: tools_module.ToolResult) -> None:
+    style = "red" if result.error else "dim"
+    ui.console.print(f"[{style}]⚙ {escape(tools_module.describe_call(result))}[/]")
+
+
+def _check_model(cfg: config_module.AssistantConfig, model_name: str, client: Any) -> None:
+    """Reject model names the cached catalog does not know, without a network call."""
+    message = catalog_module.check_model(model_name, lambda: client, cfg.model_cache_ttl)
+    if message:
+        _exit_unknown_model(message)
+
+
+def _check_session_model(session: assistant_module.AssistantSession) -> None:
+    try:
+        session.check_model()
+    except assistant_module.AssistantError as e:
+        _exit_unknown_model(str(e))
+
+
+def _exit_unknown_model(message: str) -> None:
+    ui.print_error(
+        "Unknown Model",
+        f"{message}\nRun 'ai-assistant models --refresh' if the model is new.",
+    )
+    raise typer.Exit(code=1)
+
+
+def _stream_chat_reply(
+    request_runner: RequestRunner,
+    session: assistant_module.AssistantSession,
+    chat_session: sessions_module.ChatSession,
+    message: str,
+    attachments: List[attachments_module.Attachment],
+    verbose: bool,
+) -> str:
+    """Print a chat reply as it streams in, record the turn and return the reply text."""
+    markdown = session.config.render_markdown
+    stream = session.chat_stream(message, chat_session, attachments=attachments)
+
+    # Markdown blocks start on their own line; raw text follows the label
+    ui.console.print("\n[bold green]Assistant:[/] ", end="\n" if markdown else "")
+    with ui.stream_printer(markdown, session.config.code_theme) as printer:
+        for text in request_runner.iterate(lambda: stream):
+            printer.feed(text)
+    ui.console.print()
+
+    if verbose:
+        _print_stream_stats(stream.stats)
+    return stream.text.strip()
+
+
+def _print_stream_stats(stats: api.StreamStats) -> None:
+    """Print time-to-first-token and throughput for a streamed reply."""
+    details = []
+    if stats.ttft is not None:
+        details.append(f"TTFT {stats.ttft:.2f}s")
+    if stats.tokens_per_second is not None:
+        details.append(f"{stats.tokens_per_second:.1f} tok/s")
+    if details:
+        ui.console.print(f"[dim]{' · '.join(details)}[/]")
+
+
+def _finish_profile(profiler: profiling.Profiler) -> None:
+    """Stop profiling and show the summary and where the profile was written."""
+    report = profiler.stop()
+    ui.console.print()
+    ui.console.print(report.summary, markup=False, highlight=False, soft_wrap=True)
+    for path in report.files:
+        ui.console.print(f"[dim]Profile written to {path}[/]")
+
+
 @app.callback()
 def cli(
+    ctx: typer.Context,
     verbose: bool = typer.Option(
         False,
         "--verbose",
         "-v",
         help="Enable verbose output for debugging.",
     ),
+    profile: Optional[profiling.ProfileMode] = typer.Option(
+        None,
+        "--profile",
+        help="Profile the command: cpu (cProfile), mem (tracemalloc) or sample "
+        "(low-overhead stack sampling of all threads, for long sessions).",
+    ),
+    profile_dir: Path = typer.Option(
+        Path("."),
+        "--profile-dir",
+        help="Directory for profile files.",
+    ),
+    profile_top: int = typer.Option(
+        profiling.DEFAULT_TOP,
+        "--profile-top",
+        min=1,
+        help="Number of entries in the profile summary.",
+    ),
+    record: Optional[Path] = typer.Option(
+        None,
+        "--record",
+        help="Record API requests and responses to this cassette directory.",
+    ),
+    replay: Optional[Path] = typer.Option(
+        None,
+        "--replay",
+        help="Answer API requests from this cassette directory instead of the network.",
+    ),
+    replay_pace: bool = typer.Option(
+        False,
+        "--replay-pace",
+        help="With --replay, wait as long as the recorded calls and chunks took.",
+    ),
 ) -> None:
     """Enhanced AI assistant with conversation history, streaming, and more."""
-    global _config
-    _config = config_module.load_config()
-    if verbose:
-        _config.verbose = True
+    global _config, _cli_overrides
+    if profile is not None:
+        # Started before config loading so that shows up in the profile too
+        profiler = profiling.start(
+            profile, profile_dir, ctx.invoked_subcommand or "cli", top=profile_top
+        )
+        ctx.call_on_close(lambda: _finish_profile(profiler))
+    if record is not None and replay is not None:
+        ui.print_error("Invalid Options", "Use either --record or --replay, not both.")
+        raise typer.Exit(code=1)
+    if record is not None or replay is not None:
+        tape = cassette_module.Cassette(
+            record or replay,
+            cassette_module.CassetteMode.RECORD if record else cassette_module.CassetteMode.REPLAY,
+            pace=replay_pace,
+        )
+        previous = cassette_module.activate(tape)
+        ctx.call_on_close(lambda: cassette_module.activate(previous))
+    _cli_overrides = {"verbose": True} if verbose else {}
+    _config = config_module.load_config(_cli_overrides)
+    for problem in config_module.ignored_settings(_cli_overrides):
+        ui.print_notice(f"Ignored invalid setting from {escape(problem)}")
+    ui.use_stderr(False)
 
 
 @app.command(name="ask")
@@ -75,43 +470,144 @@ def ask(
         "-t",
         help="Controls randomness (0.0-2.0).",
     ),
+    template: Optional[str] = typer.Option(
+        None,
+        "--template",
+        "-T",
+        help="Named prompt template to use as the system prompt.",
+    ),
+    variables: Optional[List[str]] = typer.Option(
+        None,
+        "--var",
+        "-V",
+        help="Template variable as name=value, or name=@file to insert a file.",
+    ),
     no_history: bool = typer.Option(
         False,
         "--no-history",
         help="Don't save this conversation to history.",
     ),
+    schema_spec: Optional[str] = typer.Option(
+        None,
+        "--schema",
+        help="JSON Schema file or module:Model pydantic class the response must follow. "
+        "Schema files are validated locally only with the 'schema' extra (jsonschema).",
+    ),
+    approx_cache_threshold: Optional[float] = typer.Option(
+        None,
+        "--approx-cache",
+        min=0.0,
+        max=1.0,
+        help="Reuse the answer to a previous prompt at least this similar (0-1).",
+    ),
+    approx_preview: bool = typer.Option(
+        False,
+        "--approx-preview",
+        help="Show the answer to a similar previous prompt while a fresh one is fetched.",
+    ),
+    context_specs: Optional[List[str]] = typer.Option(
+        None,
+        "--context",
+        help="Directory or glob of files to include, most relevant first (repeatable).",
+    ),
+    context_budget: Optional[int] = typer.Option(
+        None,
+        "--context-budget",
+        min=1,
+        help="Token budget for --context files (default: the model's input limit).",
+    ),
+    attach: Optional[List[Path]] = typer.Option(
+        None,
+        "--attach",
+        help="Image, PDF, audio or other file to send with the prompt (repeatable).",
+    ),
+    use_tools: bool = typer.Option(
+        False,
+        "--tools",
+        help="Let the model call the tools listed under tools.enabled in the config.",
+    ),
+    tool_names: Optional[List[str]] = typer.Option(
+        None,
+        "--tool",
+        help="Let the model call this tool: shell, read_file, http_get or a custom one "
+        "(repeatable).",
+    ),
+    approve_all: bool = typer.Option(
+        False,
+        "--yes",
+        "-y",
+        help="Allow the built-in tool calls the model makes without confirming each one "
+        "(tools.auto_approve).",
+    ),
+    minimize: Optional[bool] = typer.Option(
+        None,
+        "--minimize/--no-minimize",
+        help="Strip control codes, repeated lines and excess whitespace from the input, "
+        "truncating its middle to minimize.max_tokens (default: minimize.enabled).",
+    ),
+    output: OutputFormat = typer.Option(
+        OutputFormat.RICH,
+        "--output",
+        "-o",
+        help="Output format: rich, raw, json or jsonl (machine formats skip Rich).",
+    ),
 ) -> None:
     """Send a prompt to Google Gen AI and print the response text."""
     cfg = get_config()
-    
-    try:
-        client = api.build_client()
-    except api.APIError as e:
-        ui.print_error("Initialization Error", str(e))
-        raise typer.Exit(code=1)
+    ui.use_stderr(output != OutputFormat.RICH)
 
-    system_prompt = prompts.load_system_prompt()
+    system_prompt = _load_system_prompt(cfg, template, variables)
+    schema = _load_schema(schema_spec)
+    registry = _tool_registry(cfg, use_tools, tool_names, approve_all)
 
     # Get prompt from file or option or stdin
-    if prompt_file:
-        if not prompt_file.exists():
-            ui.console.print(f"[red]File not found: {prompt_file}[/]")
-            raise typer.Exit(code=1)
-        prompt_text = prompt_file.read_text()
-    elif prompt:
-        prompt_text = prompt
-    elif not sys.stdin.isatty():
-        prompt_text = sys.stdin.read().strip()
-        if not prompt_text:
-            ui.console.print("[red]Error: No prompt provided. Use -p, -f, or pipe input.[/]")
-            raise typer.Exit(code=1)
-    else:
-        ui.console.print("[red]Error: No prompt provided. Use -p, -f, or pipe input.[/]")
-        raise typer.Exit(code=1)
+    prompt_input = _read_prompt_input(cfg, prompt, prompt_file)
+    prompt_text = prompt_input.text
 
     # Use config defaults if not specified
     model_name = model or cfg.default_model
     temp = temperature if temperature is not None else cfg.temperature
+    prompt_digest: Optional[str] = prompt_input.digest
+
+    [minimized] = _minimize_prompts(cfg, [prompt_text], minimize)
+    if minimized != prompt_text:
+        prompt_text, prompt_digest = minimized, None
+
+    if context_specs:
+        prompt_text = _pack_context(
+            cfg, context_specs, prompt_text, system_prompt, model_name, context_budget
+        )
+        prompt_digest = None
+
+    # Cached answers were not produced under a schema, with attachments or with tools
+    reusable = schema is None and not attach and registry is None
+    if reusable and (approx_cache_threshold is not None or approx_preview):
+        threshold = (
+            approx_cache_threshold
+            if approx_cache_threshold is not None
+            else cfg.approx_cache_threshold
+        )
+        index = approx_cache.PromptIndex.load(cfg.history_file, cfg.approx_cache_window)
+        settings = approx_cache.settings_digest(system_prompt, temp)
+        match = index.find(prompt_text, model_name, settings, threshold)
+        if match is not None:
+            cached_text = match.entry.full_response()
+            note = f"cached {match.entry.timestamp[:19]}, {match.similarity:.0%} similar"
+            if approx_cache_threshold is not None:
+                if output == OutputFormat.RICH:
+                    ui.print_response(model_name, cached_text, subtitle=note)
+                else:
+                    writer = MachineWriter(output)
+                    writer.start(model_name, cached=True, similarity=match.similarity)
+                    writer.chunk(cached_text)
+                    writer.end()
+                return
+            if output == OutputFormat.RICH:
+                ui.print_response(model_name, cached_text, subtitle=note, border_style="dim")
+                ui.console.print("[dim]Fetching a fresh answer...[/]")
+
+    session = _open_session(cfg, model_name, temp, system_prompt)
+    _check_session_model(session)
 
     if cfg.verbose:
         ui.console.print(f"[dim]Model: {model_name}[/]")
@@ -119,27 +615,57 @@ def ask(
         if system_prompt:
             ui.console.print("[dim]System prompt loaded[/]")
 
+    attachments = _resolve_attachments(session, attach)
+
     try:
-        response = api.call_api_with_retry(client, model_name, prompt_text, system_prompt, temp)
-        response_text = api.handle_response(response, model_name)
+        reply = session.ask(
+            prompt_text,
+            schema=schema,
+            attachments=attachments,
+            tools=registry,
+            on_tool_result=_print_tool_result,
+            history=not no_history,
+            prompt_digest=prompt_digest,
+        )
     except api.SafetyError as e:
         ui.print_error("Safety Blocked", str(e))
         raise typer.Exit(code=1)
+    except tools_module.ToolError as e:
+        ui.print_error("Tool Error", str(e))
+        raise typer.Exit(code=1)
+    except structured.SchemaError as e:
+        ui.print_error("Invalid Structured Response", str(e))
+        raise typer.Exit(code=1)
     except Exception as exc:
         ui.print_error("API Error", f"Request failed:\n{exc}")
         raise typer.Exit(code=1)
 
-    # Display response
-    ui.print_response(model_name, response_text)
+    response_text, data, usage = reply.text, reply.data, reply.usage
+    if cfg.verbose and reply.latency is not None:
+        ui.console.print(f"[dim]Latency: {reply.latency:.2f}s[/]")
 
-    # Log to history
-    if cfg.enable_history and not no_history:
-        history_module.log_conversation(
-            prompt=prompt_text,
-            response=response_text,
-            model=model_name,
-            history_file=cfg.history_file,
-        )
+    # Display response
+    if output == OutputFormat.RICH:
+        if schema is not None:
+            ui.print_response(model_name, json.dumps(data, indent=2, ensure_ascii=False))
+        else:
+            ui.print_response(
+                model_name,
+                response_text,
+                markdown=cfg.render_markdown,
+                code_theme=cfg.code_theme,
+            )
+    else:
+        writer = MachineWriter(output)
+        writer.start(model_name)
+        # Structured raw/jsonl output carries the parsed document instead of the text
+        if schema is None or output == OutputFormat.JSON:
+            writer.chunk(response_text)
+        writer.usage(usage)
+        if schema is not None:
+            _finish_structured(writer, data, items_written=0)
+        else:
+            writer.end()
 
 
 @app.command(name="chat")
@@ -156,83 +682,471 @@ def chat(
         "-t",
         help="Controls randomness (0.0-2.0).",
     ),
+    template: Optional[str] = typer.Option(
+        None,
+        "--template",
+        "-T",
+        help="Named prompt template to use as the system prompt.",
+    ),
+    variables: Optional[List[str]] = typer.Option(
+        None,
+        "--var",
+        "-V",
+        help="Template variable as name=value, or name=@file to insert a file.",
+    ),
+    session_name: Optional[str] = typer.Option(
+        None,
+        "--session",
+        "-s",
+        help="Named session to start or continue.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        "-r",
+        help="Continue the most recently used session.",
+    ),
+    stream: Optional[bool] = typer.Option(
+        None,
+        "--stream/--no-stream",
+        help="Stream replies as they arrive (default: stream_by_default from config).",
+    ),
+    attach: Optional[List[Path]] = typer.Option(
+        None,
+        "--attach",
+        help="File to make available to every turn of the chat (repeatable).",
+    ),
+    use_tools: bool = typer.Option(
+        False,
+        "--tools",
+        help="Let the model call the tools listed under tools.enabled in the config.",
+    ),
+    tool_names: Optional[List[str]] = typer.Option(
+        None,
+        "--tool",
+        help="Let the model call this tool: shell, read_file, http_get or a custom one "
+        "(repeatable).",
+    ),
+    approve_all: bool = typer.Option(
+        False,
+        "--yes",
+        "-y",
+        help="Allow the built-in tool calls the model makes without confirming each one "
+        "(tools.auto_approve).",
+    ),
 ) -> None:
     """Start an interactive chat session with the AI."""
     cfg = get_config()
-    
-    try:
-        client = api.build_client()
-    except api.APIError as e:
-        ui.print_error("Initialization Error", str(e))
-        raise typer.Exit(code=1)
-
-    system_prompt = prompts.load_system_prompt()
 
     model_name = model or cfg.default_model
     temp = temperature if temperature is not None else cfg.temperature
+    session = _open_session(cfg, model_name, temp, _load_system_prompt(cfg, template, variables))
+    # Requests run on worker threads so Ctrl+C cancels the reply, not the session
+    request_runner = RequestRunner()
+    thinking = ui.console.status("[bold green]Thinking...")
+    registry = _tool_registry(cfg, use_tools, tool_names, approve_all, thinking, request_runner)
+
+    # Tool rounds need whole responses, so chats with tools do not stream
+    stream_replies = (cfg.stream_by_default if stream is None else stream) and registry is None
+    _check_session_model(session)
+
+    try:
+        chat_session = session.open_chat(session_name, resume)
+    except sessions_module.SessionError as e:
+        ui.print_error("Session Error", str(e))
+        raise typer.Exit(code=1)
 
+    attachments = _resolve_attachments(session, attach)
+
+    resumed = f" (resumed at turn {chat_session.turn})" if chat_session.turn else ""
+    attached = f"Attachments: {', '.join(path.name for path in attach)}\n" if attach else ""
     ui.console.print(
         Panel(
             f"[bold green]Chat mode activated![/]\n"
             f"Model: {model_name}\n"
+            f"Session: {chat_session.name}{resumed}\n"
+            f"{attached}"
+            f"Press [bold]Ctrl+C[/] during a reply to cancel it.\n"
             f"Type [bold]'exit'[/], [bold]'quit'[/], or press [bold]Ctrl+C[/] to exit.",
             title="AI Assistant Chat",
             border_style="blue",
         )
     )
 
-    conversation_history = []
+    if cfg.chat_prewarm:
+        request_runner.background(session.warm_up)
 
-    while True:
-        try:
-            user_input = ui.console.input("\n[bold blue]You:[/] ").strip()
+    try:
+        while True:
+            try:
+                user_input = ui.console.input("\n[bold blue]You:[/] ").strip()
+
+                if user_input.lower() in ["exit", "quit", "q"]:
+                    ui.console.print("[green]Goodbye![/]")
+                    break
+
+                if not user_input:
+                    continue
+
+                # The session sends recent turns as context and records the new one
+                try:
+                    if stream_replies:
+                        _stream_chat_reply(
+                            request_runner,
+                            session,
+                            chat_session,
+                            user_input,
+                            attachments,
+                            cfg.verbose,
+                        )
+                    else:
+                        with thinking:
+                            reply = request_runner.run(
+                                session.chat,
+                                user_input,
+                                chat_session,
+                                attachments=attachments,
+                                tools=registry,
+                                on_tool_result=_print_tool_result,
+                            )
+                        ui.console.print(f"\n[bold green]Assistant:[/] {reply.text}")
+
+                except RequestCancelledError:
+                    ui.console.print("\n[yellow]Reply cancelled.[/]")
+                    continue
+                except api.SafetyError as e:
+                    ui.print_error("Safety Blocked", str(e))
+                    continue
+                except api.StreamInterruptedError as e:
+                    ui.print_warning(
+                        "Stream Interrupted",
+                        f"The reply above is incomplete and was not saved.\n{e.__cause__ or e}",
+                    )
+                    continue
+                except Exception as exc:
+                    ui.console.print(f"[red]Error: {exc}[/]")
+                    continue
 
-            if user_input.lower() in ["exit", "quit", "q"]:
-                ui.console.print("[green]Goodbye![/]")
+            except (KeyboardInterrupt, EOFError):
+                ui.console.print("\n[green]Goodbye![/]")
                 break
+    finally:
+        request_runner.shutdown()
 
-            if not user_input:
-                continue
 
-            # Add to conversation
-            conversation_history.append({"role": "user", "content": user_input})
+@app.command(name="sessions")
+def list_sessions() -> None:
+    """List saved chat sessions."""
+    cfg = get_config()
+    index = sessions_module.load_index(sessions_module.get_session_dir(cfg.session_dir))
+
+    if not index["sessions"]:
+        ui.console.print("[yellow]No sessions found.[/]")
+        return
+
+    table = Table(title="Chat Sessions", border_style="blue")
+    table.add_column("Name", style="bold")
+    table.add_column("Turns", justify="right")
+    table.add_column("Model")
+    table.add_column("Updated", style="dim")
+    for name, meta in sorted(
+        index["sessions"].items(), key=lambda item: item[1].get("updated", ""), reverse=True
+    ):
+        marker = " *" if name == index["last"] else ""
+        table.add_row(
+            name + marker,
+            str(meta.get("turns", 0)),
+            meta.get("model") or "",
+            meta.get("updated", ""),
+        )
+    ui.console.print(table)
+
+
+jobs_app = typer.Typer(help="Submit and collect offline batch jobs.")
+app.add_typer(jobs_app, name="jobs")
+
+
+def _job_store(cfg: config_module.AssistantConfig) -> jobs_module.JobStore:
+    return jobs_module.JobStore(jobs_module.get_job_dir(cfg.job_dir))
+
 
-            # Build full context
-            full_prompt = "\n".join(
-                [f"{msg['role']}: {msg['content']}" for msg in conversation_history]
+def _get_job(store: jobs_module.JobStore, ref: str) -> jobs_module.JobRecord:
+    try:
+        return store.get(ref)
+    except jobs_module.JobError as e:
+        ui.print_error("Job Error", str(e))
+        raise typer.Exit(code=1)
+
+
+def _wait_for_job(
+    client: Any,
+    store: jobs_module.JobStore,
+    record: jobs_module.JobRecord,
+    timeout: Optional[float],
+) -> Any:
+    """Poll a job until it finishes, showing its state in a spinner."""
+    with ui.console.status(f"[bold green]Waiting for job {record.id}...") as status:
+        try:
+            return jobs_module.wait(
+                client,
+                store,
+                record,
+                timeout=timeout,
+                on_poll=lambda r: status.update(
+                    f"[bold green]Job {r.id}: {r.state.removeprefix('JOB_STATE_').lower()}"
+                ),
             )
+        except jobs_module.JobError as e:
+            ui.print_error("Job Error", str(e))
+            raise typer.Exit(code=1)
+        except Exception as exc:
+            ui.print_error("API Error", f"Polling failed:\n{exc}")
+            raise typer.Exit(code=1)
 
-            try:
-                with ui.console.status("[bold green]Thinking..."):
-                    response = api.call_api_with_retry(
-                        client, model_name, full_prompt, system_prompt, temp
-                    )
-                    response_text = api.handle_response(response, model_name)
 
-                # Add response to history
-                conversation_history.append({"role": "assistant", "content": response_text})
+@jobs_app.command(name="submit")
+def jobs_submit(
+    prompts_file: Path = typer.Option(
+        ...,
+        "--file",
+        "-f",
+        help="Prompts, one per line, or JSONL objects with a 'prompt' field.",
+    ),
+    model: Optional[str] = typer.Option(
+        None,
+        "--model",
+        "-m",
+        help="Model name to use for generation.",
+    ),
+    temperature: Optional[float] = typer.Option(
+        None,
+        "--temperature",
+        "-t",
+        help="Controls randomness (0.0-2.0).",
+    ),
+    template: Optional[str] = typer.Option(
+        None,
+        "--template",
+        "-T",
+        help="Named prompt template to use as the system prompt.",
+    ),
+    variables: Optional[List[str]] = typer.Option(
+        None,
+        "--var",
+        "-V",
+        help="Template variable as name=value, or name=@file to insert a file.",
+    ),
+    name: Optional[str] = typer.Option(
+        None,
+        "--name",
+        help="Display name for the job.",
+    ),
+    minimize: Optional[bool] = typer.Option(
+        None,
+        "--minimize/--no-minimize",
+        help="Strip control codes, repeated lines and excess whitespace from the input, "
+        "truncating its middle to minimize.max_tokens (default: minimize.enabled).",
+    ),
+) -> None:
+    """Submit prompts as an offline batch job."""
+    cfg = get_config()
+    store = _job_store(cfg)
+    system_prompt = _load_system_prompt(cfg, template, variables)
+    model_name = model or cfg.default_model
+    temp = temperature if temperature is not None else cfg.temperature
 
-                ui.console.print(f"\n[bold green]Assistant:[/] {response_text}")
+    try:
+        prompt_list = jobs_module.read_prompts(prompts_file)
+    except jobs_module.JobError as e:
+        ui.print_error("Input Error", str(e))
+        raise typer.Exit(code=1)
+    prompt_list = _minimize_prompts(cfg, prompt_list, minimize)
+
+    client = _get_client(cfg)
+    _check_model(cfg, model_name, client)
+
+    try:
+        record = jobs_module.submit(
+            client,
+            store,
+            model_name,
+            prompt_list,
+            system_prompt=system_prompt,
+            temperature=temp,
+            display_name=name,
+        )
+    except jobs_module.JobError as e:
+        ui.print_error("Job Error", str(e))
+        raise typer.Exit(code=1)
+    except Exception as exc:
+        ui.print_error("API Error", f"Job submission failed:\n{exc}")
+        raise typer.Exit(code=1)
+
+    ui.console.print(
+        f"[green]Submitted job [bold]{record.id}[/bold] with {record.count} prompts "
+        f"({record.mode}).[/]"
+    )
+    ui.console.print(f"[dim]Collect results with: ai-assistant jobs fetch {record.id} --wait[/]")
 
-                # Log to history
-                if cfg.enable_history:
-                    history_module.log_conversation(
-                        prompt=user_input,
-                        response=response_text,
-                        model=model_name,
-                        history_file=cfg.history_file,
-                    )
 
-            except api.SafetyError as e:
-                ui.print_error("Safety Blocked", str(e))
+@jobs_app.command(name="status")
+def jobs_status(
+    job: Optional[str] = typer.Argument(None, help="Job id; all tracked jobs if omitted."),
+    wait: bool = typer.Option(
+        False,
+        "--wait",
+        "-w",
+        help="Poll until the job finishes.",
+    ),
+    timeout: Optional[float] = typer.Option(
+        None,
+        "--timeout",
+        help="Give up waiting after this many seconds.",
+    ),
+) -> None:
+    """Show the state of batch jobs."""
+    cfg = get_config()
+    store = _job_store(cfg)
+
+    if job is not None:
+        records = [_get_job(store, job)]
+    else:
+        records = store.list()
+        if not records:
+            ui.console.print("[yellow]No jobs found.[/]")
+            return
+
+    pending = [record for record in records if not record.done]
+    if pending:
+        client = _get_client(cfg)
+        for record in pending:
+            if wait and job is not None:
+                _wait_for_job(client, store, record, timeout)
                 continue
+            try:
+                jobs_module.refresh(client, store, record)
             except Exception as exc:
-                ui.console.print(f"[red]Error: {exc}[/]")
-                continue
+                ui.print_warning("Refresh Failed", f"Job {record.id}: {exc}")
+
+    table = Table(title="Batch Jobs", border_style="blue")
+    table.add_column("ID", style="bold")
+    table.add_column("State")
+    table.add_column("Model")
+    table.add_column("Prompts", justify="right")
+    table.add_column("Created", style="dim")
+    table.add_column("Fetched", justify="center")
+    for record in records:
+        state = record.state.removeprefix("JOB_STATE_").lower()
+        if record.state in jobs_module.SUCCEEDED_STATES:
+            style = "green"
+        else:
+            style = "red" if record.done else "yellow"
+        table.add_row(
+            record.id,
+            f"[{style}]{state}[/]",
+            record.model,
+            str(record.count),
+            record.created[:19],
+            "✓" if record.fetched else "",
+        )
+    ui.console.print(table)
+    for record in records:
+        if record.error:
+            ui.print_error(f"Job {record.id}", record.error)
+
 
-        except (KeyboardInterrupt, EOFError):
-            ui.console.print("\n[green]Goodbye![/]")
-            break
+@jobs_app.command(name="fetch")
+def jobs_fetch(
+    job: str = typer.Argument(..., help="Job id."),
+    wait: bool = typer.Option(
+        False,
+        "--wait",
+        "-w",
+        help="Poll until the job finishes instead of failing if it is still running.",
+    ),
+    timeout: Optional[float] = typer.Option(
+        None,
+        "--timeout",
+        help="Give up waiting after this many seconds.",
+    ),
+    no_history: bool = typer.Option(
+        False,
+        "--no-history",
+        help="Don't save the results to history.",
+    ),
+    output: OutputFormat = typer.Option(
+        OutputFormat.RICH,
+        "--output",
+        "-o",
+        help="Output format: rich, raw, json or jsonl (machine formats skip Rich).",
+    ),
+) -> None:
+    """Print the results of a finished batch job and log them to history."""
+    cfg = get_config()
+    ui.use_stderr(output != OutputFormat.RICH)
+    store = _job_store(cfg)
+    record = _get_job(store, job)
+    client = _get_client(cfg)
+
+    if wait:
+        batch = _wait_for_job(client, store, record, timeout)
+    else:
+        try:
+            batch = jobs_module.refresh(client, store, record)
+        except Exception as exc:
+            ui.print_error("API Error", f"Job lookup failed:\n{exc}")
+            raise typer.Exit(code=1)
+
+    # Results are logged once; fetching again only prints them
+    log = cfg.enable_history and not no_history and not record.fetched
+    out = get_binary_stdout() if output != OutputFormat.RICH else None
+    collected = []
+    to_log: List[jobs_module.JobResult] = []
+    failures = 0
+
+    try:
+        for result in jobs_module.iter_results(client, store, record, batch):
+            failures += result.error is not None
+            if output == OutputFormat.RICH:
+                if result.error:
+                    ui.print_error(f"#{result.index + 1} failed", result.error)
+                else:
+                    ui.print_response(
+                        record.model, result.response or "", subtitle=f"#{result.index + 1}"
+                    )
+            elif output == OutputFormat.JSON:
+                collected.append(result.model_dump(exclude_none=True))
+            elif output == OutputFormat.JSONL or result.response is not None:
+                write_records(
+                    output,
+                    [result.model_dump(exclude_none=True)],
+                    text_field="response",
+                    stream=out,
+                )
+
+            if log and result.response is not None:
+                to_log.append(result)
+    except jobs_module.JobError as e:
+        ui.print_error("Job Error", str(e))
+        raise typer.Exit(code=1)
+
+    if output == OutputFormat.JSON:
+        write_records(output, collected, stream=out)
+
+    # Logged only once every result was read, so an interrupted fetch logs nothing
+    for result in to_log:
+        history_module.log_conversation(
+            prompt=result.prompt,
+            response=result.response,
+            model=record.model,
+            history_file=cfg.history_file,
+            tokens_used=result.tokens_used,
+            inline_limit=cfg.history_inline_limit,
+        )
+    record.fetched = True
+    store.save(record)
+    if failures:
+        ui.print_warning("Partial Results", f"{failures} of {record.count} requests failed.")
 
 
 @app.command(name="stream")
@@ -255,72 +1169,118 @@ def stream_ask(
         "-m",
         help="Model name to use for generation.",
     ),
+    template: Optional[str] = typer.Option(
+        None,
+        "--template",
+        "-T",
+        help="Named prompt template to use as the system prompt.",
+    ),
+    variables: Optional[List[str]] = typer.Option(
+        None,
+        "--var",
+        "-V",
+        help="Template variable as name=value, or name=@file to insert a file.",
+    ),
+    schema_spec: Optional[str] = typer.Option(
+        None,
+        "--schema",
+        help="JSON Schema file or module:Model class; array elements are emitted as they close. "
+        "Schema files are validated locally only with the 'schema' extra (jsonschema).",
+    ),
+    output: OutputFormat = typer.Option(
+        OutputFormat.RICH,
+        "--output",
+        "-o",
+        help="Output format: rich, raw, json or jsonl (machine formats skip Rich).",
+    ),
+    markdown: Optional[bool] = typer.Option(
+        None,
+        "--markdown/--plain",
+        help="Render the reply as Markdown while it streams (default: render_markdown).",
+    ),
+    minimize: Optional[bool] = typer.Option(
+        None,
+        "--minimize/--no-minimize",
+        help="Strip control codes, repeated lines and excess whitespace from the input, "
+        "truncating its middle to minimize.max_tokens (default: minimize.enabled).",
+    ),
 ) -> None:
     """Stream responses in real-time."""
     cfg = get_config()
-    
-    try:
-        client = api.build_client()
-    except api.APIError as e:
-        ui.print_error("Initialization Error", str(e))
-        raise typer.Exit(code=1)
+    ui.use_stderr(output != OutputFormat.RICH)
 
-    system_prompt = prompts.load_system_prompt()
+    model_name = model or cfg.default_model
+    session = _open_session(
+        cfg, model_name, None, _load_system_prompt(cfg, template, variables)
+    )
+    schema = _load_schema(schema_spec)
 
     # Get prompt
-    if prompt_file:
-        if not prompt_file.exists():
-            ui.console.print(f"[red]File not found: {prompt_file}[/]")
-            raise typer.Exit(code=1)
-        prompt_text = prompt_file.read_text()
-    elif prompt:
-        prompt_text = prompt
-    elif not sys.stdin.isatty():
-        prompt_text = sys.stdin.read().strip()
-        if not prompt_text:
-            ui.console.print("[red]Error: No prompt provided. Use -p, -f, or pipe input.[/]")
-            raise typer.Exit(code=1)
-    else:
-        ui.console.print("[red]Error: No prompt provided. Use -p, -f, or pipe input.[/]")
-        raise typer.Exit(code=1)
+    prompt_input = _read_prompt_input(cfg, prompt, prompt_file)
+    prompt_text = prompt_input.text
+    prompt_digest: Optional[str] = prompt_input.digest
 
-    model_name = model or cfg.default_model
+    [minimized] = _minimize_prompts(cfg, [prompt_text], minimize)
+    if minimized != prompt_text:
+        prompt_text, prompt_digest = minimized, None
+
+    _check_session_model(session)
 
     ui.console.print(f"[dim]Streaming from {model_name}...[/]\n")
 
     try:
-        config_dict = {}
-        if system_prompt:
-            config_dict["system_instruction"] = system_prompt
-
-        full_response = ""
-        for chunk in client.models.generate_content_stream(
-            model=model_name,
-            contents=prompt_text,
-            config=config_dict if config_dict else None,
-        ):
-            if hasattr(chunk, "text"):
-                ui.print_stream(chunk.text)
-                full_response += chunk.text
-
-        ui.console.print("\n")
-
-        # Log to history
-        if cfg.enable_history:
-            history_module.log_conversation(
-                prompt=prompt_text,
-                response=full_response,
-                model=model_name,
-                history_file=cfg.history_file,
-            )
+        writer = MachineWriter(output) if output != OutputFormat.RICH else None
+        if writer:
+            writer.start(model_name)
+
+        parser = structured.JSONArrayParser() if schema is not None else None
+        items_written = 0
+        render_markdown = cfg.render_markdown if markdown is None else markdown
+        # The session logs the exchange to history once the stream completes
+        stream = session.stream(prompt_text, schema=schema, prompt_digest=prompt_digest)
+        with ui.stream_printer(
+            writer is None and parser is None and render_markdown, cfg.code_theme
+        ) as printer:
+            for text in stream:
+                if writer is None:
+                    printer.feed(text)
+                elif parser is None or output == OutputFormat.JSON:
+                    writer.chunk(text, flush=True)
+                if parser is not None:
+                    for item in parser.feed(text):
+                        if writer is not None:
+                            writer.item(items_written, item)
+                        items_written += 1
+
+        data = None
+        if schema is not None and parser is not None:
+            data = schema.validate(parser.close())
+
+        if writer:
+            writer.usage(stream.usage)
+            if schema is not None:
+                _finish_structured(writer, data, items_written)
+            else:
+                writer.end()
+        else:
+            ui.console.print("\n")
+            if schema is not None and items_written:
+                ui.console.print(f"[dim]{items_written} items parsed[/]")
+        if cfg.verbose:
+            _print_stream_stats(stream.stats)
 
     except Exception as exc:
         ui.console.print(f"\n[red]Error: {exc}[/]")
         raise typer.Exit(code=1)
 
 
-@app.command(name="history")
+history_app = typer.Typer(help="Show, export and analyse conversation history.")
+app.add_typer(history_app, name="history")
+
+
+@history_app.callback(invoke_without_command=True)
 def show_history(
+    ctx: typer.Context,
     limit: int = typer.Option(
         10,
         "--limit",
@@ -333,8 +1293,17 @@ def show_history(
         "-e",
         help="Export history to a file (markdown or json).",
     ),
+    output: OutputFormat = typer.Option(
+        OutputFormat.RICH,
+        "--output",
+        "-o",
+        help="Output format: rich, raw, json or jsonl (machine formats skip Rich).",
+    ),
 ) -> None:
     """Show conversation history."""
+    if ctx.invoked_subcommand is not None:
+        return
+
     cfg = get_config()
 
     if export:
@@ -345,6 +1314,16 @@ def show_history(
 
     entries = history_module.load_history(cfg.history_file, limit=limit)
 
+    if output != OutputFormat.RICH:
+        records = []
+        for entry in entries:
+            record = entry.model_dump(exclude_none=True)
+            record["prompt"] = entry.full_prompt()
+            record["response"] = entry.full_response()
+            records.append(record)
+        write_records(output, records, text_field="response")
+        return
+
     if not entries:
         ui.console.print("[yellow]No history found.[/]")
         return
@@ -352,7 +1331,8 @@ def show_history(
     for entry in entries:
         ui.console.print(
             Panel(
-                f"[bold]Prompt:[/] {entry.prompt}\n\n[bold]Response:[/] {entry.response}",
+                f"[bold]Prompt:[/] {entry.full_prompt()}\n\n"
+                f"[bold]Response:[/] {entry.full_response()}",
                 title=f"{entry.timestamp} | {entry.model}",
                 border_style="blue",
             )
@@ -360,6 +1340,102 @@ def show_history(
         ui.console.print()
 
 
+@history_app.command(name="stats")
+def history_stats_cmd(
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Worker processes for large histories (default: CPU count).",
+    ),
+    top: int = typer.Option(
+        10,
+        "--top",
+        help="Number of repeated prompts to show.",
+    ),
+    output: OutputFormat = typer.Option(
+        OutputFormat.RICH,
+        "--output",
+        "-o",
+        help="Output format: rich, raw, json or jsonl (machine formats skip Rich).",
+    ),
+) -> None:
+    """Show usage statistics aggregated over the whole history."""
+    cfg = get_config()
+    ui.use_stderr(output != OutputFormat.RICH)
+
+    started = time.perf_counter()
+    stats = history_stats.compute_stats(
+        history_module.get_history_file(cfg.history_file), jobs=jobs
+    )
+
+    if output != OutputFormat.RICH:
+        write_records(output, history_stats.to_records(stats, top), text_field="summary")
+        return
+
+    if not stats.entries:
+        ui.console.print("[yellow]No history found.[/]")
+        return
+
+    _print_history_stats(stats, top)
+    if cfg.verbose:
+        elapsed = time.perf_counter() - started
+        ui.console.print(f"[dim]{stats.entries} entries aggregated in {elapsed:.2f}s[/]")
+
+
+def _print_history_stats(stats: history_stats.HistoryStats, top: int) -> None:
+    daily = Table(title="Requests per Day")
+    daily.add_column("Day", style="cyan")
+    daily.add_column("Model")
+    daily.add_column("Requests", justify="right")
+    for (model, day), count in sorted(stats.requests.items(), key=lambda item: item[0][::-1]):
+        daily.add_row(day, model, str(count))
+    ui.console.print(daily)
+
+    usage = Table(title="Usage by Model")
+    usage.add_column("Model", style="cyan")
+    usage.add_column("Requests", justify="right")
+    usage.add_column("Tokens", justify="right")
+    usage.add_column("Avg Tokens", justify="right")
+    for model, count in stats.model_requests.most_common():
+        tokens_used = stats.model_tokens.get(model, 0)
+        usage.add_row(model, str(count), f"{tokens_used:,}", f"{tokens_used // count:,}")
+    ui.console.print(usage)
+
+    lengths = Table(
+        title="Length Distribution (characters)",
+        caption=(
+            f"Prompt p50 ≤ {history_stats.percentile(stats.prompt_hist, 0.5):,}, "
+            f"p90 ≤ {history_stats.percentile(stats.prompt_hist, 0.9):,} | "
+            f"Response p50 ≤ {history_stats.percentile(stats.response_hist, 0.5):,}, "
+            f"p90 ≤ {history_stats.percentile(stats.response_hist, 0.9):,}"
+        ),
+    )
+    lengths.add_column("Length", style="cyan")
+    lengths.add_column("Prompts", justify="right")
+    lengths.add_column("Responses", justify="right")
+    lengths.add_column("")
+    peak = max(max(stats.prompt_hist), max(stats.response_hist))
+    for index, (prompts_count, responses_count) in enumerate(
+        zip(stats.prompt_hist, stats.response_hist)
+    ):
+        if prompts_count or responses_count:
+            low, high = history_stats.bin_bounds(index)
+            bar = "█" * max(1, round(20 * max(prompts_count, responses_count) / peak))
+            lengths.add_row(f"{low:,}-{high:,}", str(prompts_count), str(responses_count), bar)
+    ui.console.print(lengths)
+
+    repeated = stats.top_prompts(top)
+    if repeated:
+        table = Table(title="Top Repeated Prompts")
+        table.add_column("Count", justify="right", style="cyan")
+        table.add_column("Prompt")
+        for count, preview in repeated:
+            table.add_row(str(count), preview)
+        ui.console.print(table)
+
+
 @app.command(name="clear-history")
 def clear_history_cmd() -> None:
     """Clear conversation history."""
@@ -386,6 +1462,11 @@ def show_config(
         "-p",
         help="Custom path for config file.",
     ),
+    explain: bool = typer.Option(
+        False,
+        "--explain",
+        help="Show which layer (default, file, env, cli) each value came from.",
+    ),
 ) -> None:
     """Show or initialize configuration."""
     if init:
@@ -400,6 +1481,17 @@ def show_config(
         ui.console.print(f"[green]Configuration file created at {saved_path}[/]")
         return
 
+    if explain:
+        cfg, sources = config_module.resolve_config(_cli_overrides)
+        table = Table(title="Configuration Sources", border_style="blue")
+        table.add_column("Setting", style="bold")
+        table.add_column("Value")
+        table.add_column("Source", style="dim")
+        for name, value in cfg.model_dump().items():
+            table.add_row(name, str(value), sources[name])
+        ui.console.print(table)
+        return
+
     cfg = get_config()
     config_path = config_module.get_config_path()
 
@@ -421,35 +1513,56 @@ Stream by default: {cfg.stream_by_default}""",
     )
 
 
-@app.command(name="models")
-def list_models() -> None:
-    """List available models."""
-    try:
-        client = api.build_client()
-    except api.APIError as e:
-        ui.print_error("Initialization Error", str(e))
-        raise typer.Exit(code=1)
+@app.command(name="templates")
+def list_templates() -> None:
+    """List the named prompt templates available to --template."""
+    cfg = get_config()
+    registry = prompts.get_template_registry(cfg.template_dirs)
 
-    try:
-        ui.console.print("[bold]Fetching available models...[/]\n")
+    for name, path in sorted(registry.paths().items()):
+        variables = registry.get(name).variables
+        ui.console.print(f"[bold cyan]{name}[/]")
+        ui.console.print(f"  Path: {path}")
+        if variables:
+            ui.console.print(f"  Variables: {', '.join(variables)}")
 
-        # Get models
-        models = client.models.list()
 
-        ui.console.print("[bold green]Available Models:[/]\n")
+@app.command(name="models")
+def list_models(
+    refresh: bool = typer.Option(
+        False,
+        "--refresh",
+        help="Fetch the model list from the API even if the local catalog is fresh.",
+    ),
+) -> None:
+    """List available models."""
+    cfg = get_config()
+    catalog = catalog_module.load_catalog()
 
-        for model in models:
-            model_name = getattr(model, "name", "Unknown")
-            display_name = getattr(model, "display_name", model_name)
-            description = getattr(model, "description", "No description available")
+    if refresh or catalog is None or not catalog.is_fresh(cfg.model_cache_ttl):
+        client = _get_client(cfg)
+
+        try:
+            ui.console.print("[bold]Fetching available models...[/]\n")
+            catalog = catalog_module.refresh_catalog(client)
+        except Exception as exc:
+            ui.console.print(f"[red]Error fetching models: {exc}[/]")
+            raise typer.Exit(code=1)
 
-            ui.console.print(f"[bold cyan]{display_name}[/]")
-            ui.console.print(f"  Name: {model_name}")
-            ui.console.print(f"  Description: {description}\n")
+    ui.console.print("[bold green]Available Models:[/]\n")
 
-    except Exception as exc:
-        ui.console.print(f"[red]Error fetching models: {exc}[/]")
-        raise typer.Exit(code=1)
+    for info in catalog.models:
+        ui.console.print(f"[bold cyan]{info.display_name or info.name}[/]")
+        ui.console.print(f"  Name: {info.name}")
+        ui.console.print(f"  Description: {info.description or 'No description available'}")
+        if info.input_token_limit or info.output_token_limit:
+            ui.console.print(
+                f"  Token limits: {info.input_token_limit or '?'} in / "
+                f"{info.output_token_limit or '?'} out"
+            )
+        if info.supported_actions:
+            ui.console.print(f"  Supports: {', '.join(info.supported_actions)}")
+        ui.console.print()
 
 
 @app.command(name="version")
@@ -1,10 +1,66 @@
 """Configuration management for the AI assistant."""
 
+import json
+import os
+import tempfile
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 import yaml
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+
+
+class HttpSettings(BaseModel):
+    """HTTP connection settings for the Gen AI client."""
+
+    timeout: Optional[float] = Field(default=None, gt=0)
+    max_connections: int = Field(default=100, ge=1)
+    max_keepalive_connections: int = Field(default=20, ge=0)
+    keepalive_expiry: float = Field(default=30.0, ge=0)
+    http2: bool = Field(default=False)
+    proxy: Optional[str] = Field(default=None)
+
+
+class RetrySettings(BaseModel):
+    """Retry, retry budget and circuit breaker settings for API calls."""
+
+    attempts: int = Field(default=3, ge=1)
+    max_wait: float = Field(default=10.0, gt=0)
+    budget_ratio: float = Field(default=0.2, ge=0)
+    budget_reserve: int = Field(default=10, ge=0)
+    breaker_threshold: int = Field(default=5, ge=1)
+    breaker_cooldown: float = Field(default=30.0, gt=0)
+
+
+class KeyPoolSettings(BaseModel):
+    """How requests are spread over several API keys (GEMINI_API_KEYS)."""
+
+    quarantine: float = Field(default=60.0, gt=0)
+    requests_per_minute: Optional[int] = Field(default=None, ge=1)
+
+
+class ToolSettings(BaseModel):
+    """Local tools the model may call with --tools/--tool."""
+
+    enabled: List[str] = Field(default_factory=list)
+    custom: Dict[str, str] = Field(default_factory=dict)
+    timeout: float = Field(default=30.0, gt=0)
+    timeouts: Dict[str, float] = Field(default_factory=dict)
+    workers: int = Field(default=8, ge=1)
+    max_rounds: int = Field(default=8, ge=1)
+    max_output_chars: int = Field(default=20000, ge=1)
+    auto_approve: bool = Field(default=False)
+
+
+class MinimizeSettings(BaseModel):
+    """Prompt minimization applied to piped and file input with --minimize."""
+
+    enabled: bool = Field(default=False)
+    strip_control: bool = Field(default=True)
+    collapse_whitespace: bool = Field(default=True)
+    dedupe_lines: bool = Field(default=True)
+    max_block: int = Field(default=8, ge=1)
+    max_tokens: Optional[int] = Field(default=None, gt=0)
 
 
 class AssistantConfig(BaseModel):
@@ -16,39 +72,207 @@ class AssistantConfig(BaseModel):
     enable_history: bool = Field(default=True)
     history_file: str = Field(default="~/.ai_assistant_history.jsonl")
     verbose: bool = Field(default=False)
-    stream_by_default: bool = Field(default=False)
+    stream_by_default: bool = Field(default=True)
+    render_markdown: bool = Field(default=True)
+    code_theme: str = Field(default="monokai")
+    max_prompt_bytes: int = Field(default=8 * 1024 * 1024, gt=0)
+    prompt_overflow: Literal["truncate", "error"] = Field(default="truncate")
+    history_inline_limit: int = Field(default=4096, ge=0)
+    session_dir: str = Field(default="~/.ai_assistant_sessions")
+    job_dir: str = Field(default="~/.ai_assistant_jobs")
+    chat_context_turns: int = Field(default=20, ge=1)
+    chat_prewarm: bool = Field(default=True)
+    template_dirs: List[str] = Field(default_factory=lambda: ["~/.ai_assistant/prompts"])
+    model_cache_ttl: int = Field(default=24 * 60 * 60, ge=0)
+    approx_cache_threshold: float = Field(default=0.9, ge=0.0, le=1.0)
+    approx_cache_window: int = Field(default=5000, ge=1)
+    context_budget: Optional[int] = Field(default=None, gt=0)
+    http: HttpSettings = Field(default_factory=HttpSettings)
+    retry: RetrySettings = Field(default_factory=RetrySettings)
+    key_pool: KeyPoolSettings = Field(default_factory=KeyPoolSettings)
+    tools: ToolSettings = Field(default_factory=ToolSettings)
+    minimize: MinimizeSettings = Field(default_factory=MinimizeSettings)
 
 
-def get_config_path() -> Path:
-    """Get the path to the configuration file."""
-    # Check current directory first
-    local_config = Path.cwd() / ".aiassistant.yaml"
-    if local_config.exists():
-        return local_config
+CONFIG_FILENAME = ".aiassistant.yaml"
+CONFIG_ENV_VAR = "AI_ASSISTANT_CONFIG"
+ENV_PREFIX = "AI_ASSISTANT_"
 
-    # Check home directory
-    home_config = Path.home() / ".aiassistant.yaml"
-    if home_config.exists():
-        return home_config
+# Layers from lowest to highest precedence
+LAYERS = ("default", "home", "project", "env", "cli")
+
+_CACHE_VERSION = 1
+_memo: Dict[Tuple, Tuple[AssistantConfig, Dict[str, str], List[str]]] = {}
+
+
+def get_cache_dir() -> Path:
+    """Get the directory used for on-disk caches (honours ``XDG_CACHE_HOME``)."""
+    base = os.environ.get("XDG_CACHE_HOME")
+    root = Path(base) if base else Path.home() / ".cache"
+    return root / "ai_cli_assistant"
+
+
+def get_config_path() -> Path:
+    """Get the path to the most specific configuration file."""
+    for _, path in reversed(_layer_paths()):
+        if path.exists():
+            return path
 
     # Return default location (may not exist)
-    return home_config
+    return Path.home() / CONFIG_FILENAME
+
+
+def _layer_paths() -> List[Tuple[str, Path]]:
+    """Return the candidate files for the home and project layers."""
+    home_config = Path.home() / CONFIG_FILENAME
+    explicit = os.environ.get(CONFIG_ENV_VAR)
+    project_config = Path(explicit).expanduser() if explicit else Path.cwd() / CONFIG_FILENAME
+
+    paths = [("home", home_config)]
+    if project_config != home_config:
+        paths.append(("project", project_config))
+    return paths
+
+
+def load_config(overrides: Optional[Dict[str, Any]] = None) -> AssistantConfig:
+    """Load configuration, merging defaults < home < project < env vars < overrides.
+
+    ``overrides`` is the CLI layer. Invalid files are skipped rather than
+    aborting, so a broken config never prevents the assistant from starting.
+    """
+    config, _ = resolve_config(overrides)
+    return config
+
+
+def resolve_config(
+    overrides: Optional[Dict[str, Any]] = None,
+) -> Tuple[AssistantConfig, Dict[str, str]]:
+    """Resolve the layered configuration and record where each value came from.
+
+    File layers are served from a JSON snapshot keyed by file mtime and size,
+    so YAML is only parsed when a config file actually changed. The fully
+    resolved result is also memoised for the life of the process. Each
+    environment variable is applied on its own, so an invalid one is skipped
+    without dropping the others; :func:`ignored_settings` lists what was skipped.
+    """
+    config, sources, _ = _resolve(overrides)
+    return config.model_copy(deep=True), dict(sources)
 
 
-def load_config() -> AssistantConfig:
-    """Load configuration from file or return defaults."""
-    config_path = get_config_path()
+def ignored_settings(overrides: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Config files and environment variables left out because they were invalid, and why."""
+    _, _, ignored = _resolve(overrides)
+    return list(ignored)
 
-    if config_path.exists():
+
+def _resolve(
+    overrides: Optional[Dict[str, Any]],
+) -> Tuple[AssistantConfig, Dict[str, str], List[str]]:
+    files = []
+    for layer, path in _layer_paths():
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        files.append((layer, path, stat.st_mtime_ns, stat.st_size))
+
+    env = {
+        name: value
+        for name in AssistantConfig.model_fields
+        if (value := os.environ.get(ENV_PREFIX + name.upper())) is not None
+    }
+    cli = {k: v for k, v in (overrides or {}).items() if v is not None}
+
+    key = (tuple(files), tuple(sorted(env.items())), repr(sorted(cli.items())))
+    if key in _memo:
+        return _memo[key]
+
+    layers: List[Tuple[str, Dict[str, Any]]] = []
+    for layer, path, mtime_ns, size in files:
+        data = _read_layer_file(path, mtime_ns, size)
+        if data:
+            layers.append((f"{layer} ({path})", data))
+    for name, value in env.items():
+        layers.append((f"env ({ENV_PREFIX}{name.upper()})", {name: value}))
+    if cli:
+        layers.append(("cli", cli))
+
+    merged: Dict[str, Any] = {}
+    sources = {name: "default" for name in AssistantConfig.model_fields}
+    ignored: List[str] = []
+    for label, data in layers:
+        candidate = _merge(merged, data)
         try:
-            with open(config_path, "r") as f:
-                data = yaml.safe_load(f) or {}
-            return AssistantConfig(**data)
-        except Exception:
-            # If config is invalid, return defaults
-            return AssistantConfig()
+            AssistantConfig(**candidate)
+        except ValidationError as exc:
+            # If a layer is invalid, ignore it and keep the lower layers
+            error = exc.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            ignored.append(f"{label}: {location}: {error['msg']}")
+            for name in data:
+                if name in sources:
+                    sources[name] += f"; {label} ignored (invalid)"
+            continue
+        merged = candidate
+        for name in data:
+            if name in sources:
+                sources[name] = label
+
+    config = AssistantConfig(**merged)
+    _memo[key] = (config, sources, ignored)
+    return _memo[key]
+
 
-    return AssistantConfig()
+def _merge(base: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge ``update`` into a copy of ``base``, recursing into nested sections."""
+    result = dict(base)
+    for name, value in update.items():
+        if isinstance(value, dict) and isinstance(result.get(name), dict):
+            result[name] = _merge(result[name], value)
+        else:
+            result[name] = value
+    return result
+
+
+def _read_layer_file(path: Path, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """Parse a config file, reusing the cached snapshot when it is unchanged."""
+    cache_file = get_cache_dir() / "config_cache.json"
+    try:
+        cache = json.loads(cache_file.read_text(encoding="utf-8"))
+        if cache.get("version") != _CACHE_VERSION:
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+
+    entries = cache.setdefault("files", {})
+    cached = entries.get(str(path))
+    if cached and cached["mtime_ns"] == mtime_ns and cached["size"] == size:
+        return cached["data"]
+
+    try:
+        with open(path, "r") as f:
+            data = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError):
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+
+    cache["version"] = _CACHE_VERSION
+    entries[str(path)] = {"mtime_ns": mtime_ns, "size": size, "data": data}
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Written atomically: other CLI processes may be reading the cache
+        fd, tmp_name = tempfile.mkstemp(dir=cache_file.parent, prefix=".config-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(cache, f, default=str)
+            os.replace(tmp_name, cache_file)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+    except OSError:
+        pass
+    return data
 
 
 def save_default_config(path: Optional[Path] = None) -> Path:
@@ -57,6 +281,7 @@ def save_default_config(path: Optional[Path] = None) -> Path:
         path = Path.home() / ".aiassistant.yaml"
 
     config = AssistantConfig()
+    template_dirs = "".join(f"  - {d}\n" for d in config.template_dirs)
 
     config_content = f"""# AI Assistant Configuration
 # See https://github.com/patlar104/ai_cli_assistant for documentation
@@ -79,8 +304,108 @@ history_file: {config.history_file}
 # Verbose output for debugging
 verbose: {config.verbose}
 
-# Stream responses by default
+# Stream chat replies as they arrive
 stream_by_default: {config.stream_by_default}
+
+# Render replies as Markdown, with code blocks highlighted in this Pygments style
+render_markdown: {config.render_markdown}
+code_theme: {config.code_theme}
+
+# Largest prompt (in bytes) read from a file or stdin
+max_prompt_bytes: {config.max_prompt_bytes}
+
+# What to do with larger inputs: truncate (keep the head) or error
+prompt_overflow: {config.prompt_overflow}
+
+# Prompts and responses longer than this many characters go to the history blob store
+history_inline_limit: {config.history_inline_limit}
+
+# Directory holding chat session transcripts
+session_dir: {config.session_dir}
+
+# Where offline batch jobs are tracked
+job_dir: {config.job_dir}
+
+# Number of recent chat turns sent as context
+chat_context_turns: {config.chat_context_turns}
+
+# Open the API connection in the background while you type the first message
+chat_prewarm: {config.chat_prewarm}
+
+# Extra directories searched for named prompt templates (*.txt)
+template_dirs:
+{template_dirs}
+# Seconds before the cached model catalog is refreshed in the background
+model_cache_ttl: {config.model_cache_ttl}
+
+# Similarity (0-1) a history prompt needs for ask --approx-preview to show its answer
+approx_cache_threshold: {config.approx_cache_threshold}
+# Number of recent history prompts indexed for near-duplicate lookup
+approx_cache_window: {config.approx_cache_window}
+
+# Token budget for files packed with ask --context (null = the model's input limit)
+context_budget: {"null" if config.context_budget is None else config.context_budget}
+
+# HTTP connection pool shared by every request in a process
+http:
+  # Request timeout in seconds (null = SDK default)
+  timeout: {"null" if config.http.timeout is None else config.http.timeout}
+  max_connections: {config.http.max_connections}
+  max_keepalive_connections: {config.http.max_keepalive_connections}
+  # Seconds an idle connection is kept open for reuse
+  keepalive_expiry: {config.http.keepalive_expiry}
+  # Requires the h2 package: pip install "ai-cli-assistant[http2]"
+  http2: {config.http.http2}
+  # e.g. http://proxy.local:8080
+  proxy: {config.http.proxy or "null"}
+
+# Retries for transient API failures
+retry:
+  attempts: {config.retry.attempts}
+  # Longest backoff in seconds; a server-requested delay above this is not waited for
+  max_wait: {config.retry.max_wait}
+  # Retries allowed per successful request once the reserve is used up
+  budget_ratio: {config.retry.budget_ratio}
+  budget_reserve: {config.retry.budget_reserve}
+  # Consecutive failures before a model's circuit opens, and how long it stays open
+  breaker_threshold: {config.retry.breaker_threshold}
+  breaker_cooldown: {config.retry.breaker_cooldown}
+
+# Scheduling across several API keys listed in GEMINI_API_KEYS
+key_pool:
+  # Seconds a key is skipped after a quota error when the server gives no delay
+  quarantine: {config.key_pool.quarantine}
+  # Per-key quota if known (null = learn it from quota errors)
+  requests_per_minute: {config.key_pool.requests_per_minute or "null"}
+
+# Local tools the model may call (function calling)
+tools:
+  # Offered with --tools; built-ins are shell, read_file and http_get
+  enabled: {json.dumps(config.tools.enabled)}
+  # Extra tools as name: module:function
+  custom: {json.dumps(config.tools.custom)}
+  # Seconds a call may run, with per-tool overrides as name: seconds
+  timeout: {config.tools.timeout}
+  timeouts: {json.dumps(config.tools.timeouts)}
+  # Calls from one model turn run concurrently on up to this many threads
+  workers: {config.tools.workers}
+  max_rounds: {config.tools.max_rounds}
+  max_output_chars: {config.tools.max_output_chars}
+  # Allow shell, read_file and http_get calls without asking first (same as --yes)
+  auto_approve: {config.tools.auto_approve}
+
+# Shrink prompts before sending (always on, or per run with --minimize)
+minimize:
+  enabled: {config.minimize.enabled}
+  # Drop ANSI escape codes and control characters
+  strip_control: {config.minimize.strip_control}
+  # Trim trailing whitespace and fold runs of blank lines
+  collapse_whitespace: {config.minimize.collapse_whitespace}
+  # Collapse repeated lines, or repeated blocks of up to max_block lines, with a count
+  dedupe_lines: {config.minimize.dedupe_lines}
+  max_block: {config.minimize.max_block}
+  # Cut the middle of prompts still above this many tokens (null = no limit)
+  max_tokens: {config.minimize.max_tokens or "null"}
 """
 
     path.write_text(config_content)
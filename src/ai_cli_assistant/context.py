@@ -0,0 +1,424 @@
+"""Pack files from a directory or glob into a prompt, within a token budget.
+
+Directories are walked with ``.gitignore`` rules applied (including nested
+ignore files and ``!`` re-includes); binary and oversized files are skipped.
+Each file is described by a :class:`FileDigest` (SHA-256, estimated tokens and
+a Bloom filter of the terms it contains, sized to the number of terms) cached
+per root and keyed on mtime and size, so repeat runs over a large tree only
+stat unchanged files.
+Files are ranked by how many prompt terms appear in their path and content,
+then packed greedily into the budget; only the selected files are read again.
+"""
+
+import base64
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+from ai_cli_assistant.config import get_cache_dir
+from ai_cli_assistant.utils import tokens
+
+# Used when the model's input token limit is not in the catalog
+DEFAULT_BUDGET = 32_000
+MAX_FILE_BYTES = 512 * 1024
+BINARY_SNIFF_BYTES = 8192
+# About 10 bits per term keeps false positives near 2% with 3 hash functions
+BLOOM_BITS_PER_TERM = 10
+BLOOM_MIN_BITS = 64
+BLOOM_HASHES = 3
+# A prompt term in the file path counts this many times a term in the content
+PATH_WEIGHT = 3
+_CACHE_VERSION = 2
+
+HEADER = "The following files are provided as context.\n\n"
+
+_IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+_WORD_PART = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+")
+_STOPWORDS = frozenset(
+    "and are but can com does for from has have how into not now one that the then "
+    "there these this those use using was what when where which who why will with you "
+    "your".split()
+)
+
+
+class ContextError(Exception):
+    """Raised when a context path or pattern matches no usable files."""
+
+
+class FileDigest(BaseModel):
+    """Cached description of one file, valid while its mtime and size are unchanged."""
+
+    mtime_ns: int
+    size: int
+    sha256: str = ""
+    tokens: int = 0
+    terms: str = ""
+    skipped: Optional[str] = Field(default=None)  # "binary" or "too large"
+
+
+@dataclass
+class PackedContext:
+    """The files selected for a prompt and the text they render to."""
+
+    text: str = ""
+    files: List[str] = field(default_factory=list)
+    tokens: int = 0
+    candidates: int = 0
+    over_budget: int = 0
+
+
+def extract_terms(text: str) -> Set[str]:
+    """Lowercase identifiers and their camelCase/snake_case parts, minus stopwords."""
+    terms = set()
+    for identifier in _IDENTIFIER.findall(text):
+        parts = [identifier] + _WORD_PART.findall(identifier)
+        for part in parts:
+            term = part.lower()
+            if len(term) >= 3 and term not in _STOPWORDS:
+                terms.add(term)
+    return terms
+
+
+def _bloom_positions(term: str, size: int) -> Iterator[int]:
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=4 * BLOOM_HASHES).digest()
+    for i in range(BLOOM_HASHES):
+        yield int.from_bytes(digest[4 * i : 4 * i + 4], "big") % size
+
+
+def build_bloom(terms: Iterable[str]) -> str:
+    """Encode a set of terms as a base64 Bloom filter sized to hold them."""
+    terms = list(terms)
+    size = max(BLOOM_MIN_BITS, -(-len(terms) * BLOOM_BITS_PER_TERM // 8) * 8)
+    bits = bytearray(size // 8)
+    for term in terms:
+        for position in _bloom_positions(term, size):
+            bits[position >> 3] |= 1 << (position & 7)
+    return base64.b64encode(bytes(bits)).decode("ascii")
+
+
+def bloom_count(bloom: str, terms: Iterable[str]) -> int:
+    """Number of ``terms`` the filter (probably) contains."""
+    if not bloom:
+        return 0
+    bits = base64.b64decode(bloom)
+    size = len(bits) * 8
+    return sum(
+        all(bits[position >> 3] >> (position & 7) & 1 for position in _bloom_positions(term, size))
+        for term in terms
+    )
+
+
+class IgnoreRules:
+    """``.gitignore`` matching for paths below ``root``.
+
+    Ignore files are read lazily, once per directory. As in git, the last
+    matching pattern wins, and nothing inside an ignored directory can be
+    re-included.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._rules: Dict[Path, List[Tuple[re.Pattern, bool, bool]]] = {}
+
+    def _load(self, directory: Path) -> List[Tuple[re.Pattern, bool, bool]]:
+        if directory not in self._rules:
+            rules = []
+            try:
+                lines = (directory / ".gitignore").read_text(encoding="utf-8").splitlines()
+            except (OSError, UnicodeDecodeError):
+                lines = []
+            for line in lines:
+                rule = _parse_rule(line)
+                if rule is not None:
+                    rules.append(rule)
+            self._rules[directory] = rules
+        return self._rules[directory]
+
+    def _matches(self, path: Path, is_dir: bool) -> bool:
+        ignored = False
+        bases = [path.parent]
+        while bases[-1] != self.root and self.root in bases[-1].parents:
+            bases.append(bases[-1].parent)
+        for base in reversed(bases):
+            relative = path.relative_to(base).as_posix()
+            for pattern, negate, dir_only in self._load(base):
+                if dir_only and not is_dir:
+                    continue
+                if pattern.fullmatch(relative):
+                    ignored = not negate
+        return ignored
+
+    def ignored(self, path: Path, is_dir: bool = False) -> bool:
+        """Whether ``path`` (absolute, below the root) is excluded by any ignore file."""
+        if path.name == ".git":
+            return True
+        return self._matches(path, is_dir)
+
+    def ignored_with_parents(self, path: Path) -> bool:
+        """Like :meth:`ignored`, but also excluded if a parent directory is."""
+        parent = path.parent
+        while parent != self.root and self.root in parent.parents:
+            if self.ignored(parent, is_dir=True):
+                return True
+            parent = parent.parent
+        return self.ignored(path)
+
+
+def _parse_rule(line: str) -> Optional[Tuple[re.Pattern, bool, bool]]:
+    """Translate one ``.gitignore`` line to ``(regex, negate, dir_only)``."""
+    line = line.rstrip("\n")
+    if not line.endswith("\\ "):
+        line = line.rstrip(" ")
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    anchored = "/" in line
+    line = line.lstrip("/")
+    regex = ""
+    i = 0
+    while i < len(line):
+        if line.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif line.startswith("/**", i) and i + 3 == len(line):
+            regex += "/.*"
+            i += 3
+        elif line[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif line[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif line[i] == "[":
+            end = line.find("]", i + 1)
+            if end == -1:
+                regex += re.escape("[")
+                i += 1
+            else:
+                body = line[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end + 1
+        else:
+            regex += re.escape(line[i])
+            i += 1
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex), negate, dir_only
+
+
+def collect_files(spec: str, cwd: Optional[Path] = None) -> List[Path]:
+    """Resolve a directory or glob pattern to files, honouring ``.gitignore``.
+
+    Raises:
+        ContextError: If nothing matches.
+    """
+    cwd = (cwd or Path.cwd()).resolve()
+    path = (cwd / Path(spec).expanduser()).resolve()
+
+    if path.is_dir():
+        rules = IgnoreRules(path)
+        files = []
+        for dirpath, dirnames, filenames in os.walk(path):
+            directory = Path(dirpath)
+            dirnames[:] = sorted(
+                name for name in dirnames if not rules.ignored(directory / name, is_dir=True)
+            )
+            files.extend(
+                directory / name
+                for name in sorted(filenames)
+                if not rules.ignored(directory / name)
+            )
+    elif path.is_file():
+        files = [path]
+    else:
+        pattern = str(cwd / Path(spec).expanduser())
+        matches = sorted(Path(match).resolve() for match in glob.glob(pattern, recursive=True))
+        files = []
+        rules_by_root: Dict[Path, IgnoreRules] = {}
+        for match in matches:
+            if not match.is_file():
+                continue
+            root = cwd if cwd in match.parents else match.parent
+            rules = rules_by_root.setdefault(root, IgnoreRules(root))
+            if not rules.ignored_with_parents(match):
+                files.append(match)
+
+    if not files:
+        raise ContextError(f"No files found for context '{spec}'.")
+    return files
+
+
+def get_cache_path(root: Path) -> Path:
+    """Digest cache for files below ``root``."""
+    key = hashlib.sha256(str(root).encode("utf-8")).hexdigest()[:16]
+    return get_cache_dir() / "context" / f"{key}.json"
+
+
+class DigestCache:
+    """File digests for one root, stored as a JSON object keyed by absolute path."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, FileDigest] = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path) -> "DigestCache":
+        cache = cls(path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") == _CACHE_VERSION:
+                cache.entries = {
+                    name: FileDigest.model_validate(entry) for name, entry in data["files"].items()
+                }
+        except (OSError, ValueError, KeyError, TypeError, ValidationError):
+            pass
+        return cache
+
+    def digest(self, path: Path) -> FileDigest:
+        """Return the digest of ``path``, reading the file only if it changed."""
+        stat = path.stat()
+        key = str(path)
+        entry = self.entries.get(key)
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            return entry
+
+        entry = FileDigest(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        if stat.st_size > MAX_FILE_BYTES:
+            entry.skipped = "too large"
+        else:
+            data = path.read_bytes()
+            if b"\0" in data[:BINARY_SNIFF_BYTES]:
+                entry.skipped = "binary"
+            else:
+                text = data.decode("utf-8", "replace")
+                entry.sha256 = hashlib.sha256(data).hexdigest()
+                entry.tokens = tokens.estimate_tokens(text)
+                entry.terms = build_bloom(extract_terms(text))
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+
+    def prune(self, keep: Set[str]) -> None:
+        """Forget files that were not seen in a full scan of the root."""
+        stale = set(self.entries) - keep
+        for key in stale:
+            del self.entries[key]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=".context-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": _CACHE_VERSION,
+                    "files": {
+                        name: entry.model_dump(exclude_defaults=True)
+                        for name, entry in self.entries.items()
+                    },
+                },
+                f,
+            )
+        os.replace(tmp_name, self.path)
+        self.dirty = False
+
+
+def _display_path(path: Path, cwd: Path) -> str:
+    try:
+        return path.relative_to(cwd).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def _section(name: str, text: str) -> str:
+    return f"==> {name} <==\n{text.rstrip()}\n\n"
+
+
+def pack_context(
+    specs: List[str],
+    prompt: str,
+    budget: int,
+    cwd: Optional[Path] = None,
+) -> PackedContext:
+    """Select and render the files most relevant to ``prompt`` within ``budget`` tokens.
+
+    Files are ranked by weighted prompt-term matches in their path and content
+    (smaller files first on ties) and added greedily; a file that does not fit
+    is skipped and smaller, lower-ranked files are still tried.
+
+    Raises:
+        ContextError: If a spec matches no files.
+    """
+    cwd = (cwd or Path.cwd()).resolve()
+    prompt_terms = extract_terms(prompt)
+
+    candidates: Dict[Path, Tuple[str, FileDigest]] = {}
+    for spec in specs:
+        files = collect_files(spec, cwd)
+        spec_path = (cwd / Path(spec).expanduser()).resolve()
+        is_root = spec_path.is_dir()
+        root = spec_path if is_root else cwd
+        cache = DigestCache.load(get_cache_path(root))
+        for path in files:
+            if path in candidates:
+                continue
+            try:
+                entry = cache.digest(path)
+            except OSError:
+                continue
+            if entry.skipped is None:
+                candidates[path] = (_display_path(path, cwd), entry)
+        if is_root:
+            cache.prune({str(path) for path in files})
+        cache.save()
+
+    def rank(item: Tuple[Path, Tuple[str, FileDigest]]) -> Tuple[int, int, str]:
+        _, (name, entry) = item
+        path_terms = extract_terms(name.replace("/", " ").replace(".", " "))
+        score = PATH_WEIGHT * len(prompt_terms & path_terms)
+        score += bloom_count(entry.terms, prompt_terms)
+        return -score, entry.tokens, name
+
+    packed = PackedContext(candidates=len(candidates))
+    remaining = budget - tokens.estimate_tokens(HEADER)
+    sections = []
+    for path, (name, entry) in sorted(candidates.items(), key=rank):
+        cost = entry.tokens + tokens.estimate_tokens(_section(name, ""))
+        if cost > remaining:
+            packed.over_budget += 1
+            continue
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        sections.append(_section(name, text))
+        packed.files.append(name)
+        remaining -= cost
+        packed.tokens += cost
+
+    if sections:
+        packed.text = HEADER + "".join(sections)
+        packed.tokens += tokens.estimate_tokens(HEADER)
+    return packed
@@ -1,21 +1,59 @@
 """Conversation history management."""
 
 import json
+import textwrap
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+from ai_cli_assistant.blobs import BlobNotFoundError, BlobStore
+
+# Number of leading characters kept inline when a body is moved to the blob store
+PREVIEW_CHARS = 512
 
 
 class ConversationEntry(BaseModel):
-    """A single conversation entry."""
+    """A single conversation entry.
+
+    Bodies longer than the inline limit live in the history blob store; for
+    those, ``prompt``/``response`` hold a short preview and the ``*_sha256``
+    field is the blob key. Use :meth:`full_prompt` and :meth:`full_response` to
+    resolve the complete text when it is actually displayed.
+    """
 
     timestamp: str
     model: str
     prompt: str
     response: str
     tokens_used: Optional[int] = None
+    prompt_sha256: Optional[str] = None
+    prompt_chars: Optional[int] = None
+    response_sha256: Optional[str] = None
+    response_chars: Optional[int] = None
+    session_id: Optional[str] = None
+    turn: Optional[int] = None
+    settings_sha256: Optional[str] = None
+
+    _blobs: Optional[BlobStore] = PrivateAttr(default=None)
+
+    def full_prompt(self) -> str:
+        """Return the complete prompt, loading it from the blob store if needed."""
+        return self._resolve(self.prompt, self.prompt_sha256)
+
+    def full_response(self) -> str:
+        """Return the complete response, loading it from the blob store if needed."""
+        return self._resolve(self.response, self.response_sha256)
+
+    def _resolve(self, preview: str, digest: Optional[str]) -> str:
+        if digest is None or self._blobs is None:
+            return preview
+        try:
+            return self._blobs.get(digest)
+        except BlobNotFoundError:
+            return preview
 
 
 def get_history_file(config_path: Optional[str] = None) -> Path:
@@ -30,57 +68,154 @@ def get_history_file(config_path: Optional[str] = None) -> Path:
     return path
 
 
+def get_blob_store(history_file: Optional[str] = None) -> BlobStore:
+    """Get the blob store that sits next to the history file."""
+    return BlobStore(get_history_file(history_file).with_suffix(".blobs"))
+
+
 def log_conversation(
     prompt: str,
     response: str,
     model: str,
     history_file: Optional[str] = None,
     tokens_used: Optional[int] = None,
+    prompt_digest: Optional[str] = None,
+    inline_limit: Optional[int] = None,
+    session_id: Optional[str] = None,
+    turn: Optional[int] = None,
+    settings_digest: Optional[str] = None,
 ) -> None:
-    """Log a conversation to the history file."""
+    """Log a conversation to the history file.
+
+    Prompts and responses longer than ``inline_limit`` characters are written
+    once to the deduplicated blob store and referenced by hash, keeping each
+    JSONL record small regardless of the size of the exchange. Chat turns
+    carry ``session_id`` and ``turn`` so sessions can be reconstructed.
+    ``settings_digest`` identifies the system prompt and temperature, so the
+    near-duplicate cache only reuses answers given under the same settings.
+    """
+    fields = {"prompt": prompt, "response": response}
+    if inline_limit is not None:
+        blobs = None
+        for name, body, digest in (
+            ("prompt", prompt, prompt_digest),
+            ("response", response, None),
+        ):
+            if len(body) > inline_limit:
+                blobs = blobs or get_blob_store(history_file)
+                fields[name] = body[:PREVIEW_CHARS]
+                fields[f"{name}_sha256"] = blobs.put(body, digest)
+                fields[f"{name}_chars"] = len(body)
+
     entry = ConversationEntry(
         timestamp=datetime.now().isoformat(),
         model=model,
-        prompt=prompt,
-        response=response,
         tokens_used=tokens_used,
+        session_id=session_id,
+        turn=turn,
+        settings_sha256=settings_digest,
+        **fields,
     )
 
     file_path = get_history_file(history_file)
 
     with open(file_path, "a", encoding="utf-8") as f:
-        f.write(entry.model_dump_json() + "\n")
+        f.write(entry.model_dump_json(exclude_none=True) + "\n")
+
+
+def iter_history(history_file: Optional[str] = None) -> Iterator[ConversationEntry]:
+    """Yield conversation entries from the history file, oldest first."""
+    file_path = get_history_file(history_file)
+
+    if not file_path.exists():
+        return
+
+    blobs = get_blob_store(history_file)
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from _parse_lines(f, blobs)
+
+
+def iter_history_from(
+    offset: int = 0,
+    history_file: Optional[str] = None,
+) -> Iterator[Tuple[int, ConversationEntry]]:
+    """Yield ``(byte_offset, entry)`` pairs for records starting at ``offset``.
+
+    Offsets can be passed back to :func:`read_entry_at`, which lets indexes
+    over the history pick up only records appended since their last update.
+    """
+    file_path = get_history_file(history_file)
+
+    if not file_path.exists():
+        return
+
+    blobs = get_blob_store(history_file)
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        position = offset
+        for raw in f:
+            start, position = position, position + len(raw)
+            if not raw.endswith(b"\n"):
+                # A record still being written
+                return
+            for entry in _parse_lines([raw.decode("utf-8", "replace")], blobs):
+                yield start, entry
+
+
+def read_entry_at(offset: int, history_file: Optional[str] = None) -> Optional[ConversationEntry]:
+    """Read the single record starting at ``offset``, or ``None`` if it is not valid."""
+    file_path = get_history_file(history_file)
+    try:
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            line = f.readline().decode("utf-8", "replace")
+    except OSError:
+        return None
+    return next(_parse_lines([line], get_blob_store(history_file)), None)
 
 
 def load_history(
     history_file: Optional[str] = None,
     limit: Optional[int] = None,
 ) -> List[ConversationEntry]:
-    """Load conversation history from file."""
+    """Load conversation history from file.
+
+    With ``limit`` only the last ``limit`` lines are parsed. Large bodies are
+    not loaded; see :meth:`ConversationEntry.full_prompt`.
+    """
+    if not limit:
+        return list(iter_history(history_file))
+
     file_path = get_history_file(history_file)
 
     if not file_path.exists():
         return []
 
-    entries = []
     with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                data = json.loads(line.strip())
-                entries.append(ConversationEntry(**data))
-            except (json.JSONDecodeError, ValueError):
-                continue
+        tail = deque(f, maxlen=limit)
+    return list(_parse_lines(tail, get_blob_store(history_file)))
+
 
-    if limit:
-        return entries[-limit:]
-    return entries
+def _parse_lines(lines: Iterable[str], blobs: BlobStore) -> Iterator[ConversationEntry]:
+    """Parse JSONL records, skipping malformed lines."""
+    for line in lines:
+        try:
+            data = json.loads(line.strip())
+            entry = ConversationEntry(**data)
+        except (json.JSONDecodeError, ValueError, TypeError):
+            continue
+        entry._blobs = blobs
+        yield entry
 
 
 def clear_history(history_file: Optional[str] = None) -> None:
-    """Clear the conversation history."""
+    """Clear the conversation history, its blob store and any index files."""
     file_path = get_history_file(history_file)
     if file_path.exists():
         file_path.unlink()
+    get_blob_store(history_file).clear()
+    for index_file in file_path.parent.glob(f"{file_path.stem}.*.idx"):
+        index_file.unlink()
 
 
 def export_history(
@@ -88,18 +223,28 @@ def export_history(
     history_file: Optional[str] = None,
     format: str = "markdown",
 ) -> None:
-    """Export history to a file."""
-    entries = load_history(history_file)
-
-    if format == "markdown":
-        content = "# AI Assistant Conversation History\n\n"
-        for entry in entries:
-            content += f"## {entry.timestamp}\n"
-            content += f"**Model:** {entry.model}\n\n"
-            content += f"**Prompt:**\n{entry.prompt}\n\n"
-            content += f"**Response:**\n{entry.response}\n\n"
-            content += "---\n\n"
-    else:  # json
-        content = json.dumps([e.model_dump() for e in entries], indent=2)
-
-    output_file.write_text(content, encoding="utf-8")
+    """Export history to a file.
+
+    Entries are written one at a time, so at most one resolved body is held in
+    memory during the export.
+    """
+    with open(output_file, "w", encoding="utf-8") as out:
+        if format == "markdown":
+            out.write("# AI Assistant Conversation History\n\n")
+            for entry in iter_history(history_file):
+                out.write(f"## {entry.timestamp}\n")
+                out.write(f"**Model:** {entry.model}\n\n")
+                out.write(f"**Prompt:**\n{entry.full_prompt()}\n\n")
+                out.write(f"**Response:**\n{entry.full_response()}\n\n")
+                out.write("---\n\n")
+        else:  # json
+            separator = "\n"
+            out.write("[")
+            for entry in iter_history(history_file):
+                data = entry.model_dump()
+                data["prompt"] = entry.full_prompt()
+                data["response"] = entry.full_response()
+                out.write(separator)
+                out.write(textwrap.indent(json.dumps(data, indent=2), "  "))
+                separator = ",\n"
+            out.write("]" if separator == "\n" else "\n]")
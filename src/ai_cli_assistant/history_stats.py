@@ -0,0 +1,244 @@
+"""Aggregate statistics over the conversation history.
+
+The JSONL file is split into byte ranges aligned to line boundaries and each
+range is aggregated independently, in a process pool for large files. Partial
+results hold counters and fixed-bin (power of two) length histograms rather
+than raw values, so they are cheap to send back and merge. Bodies in the blob
+store are never loaded: lengths come from the ``*_chars`` fields.
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without the extra
+    np = None
+
+# Histogram bin ``i`` counts lengths ``n`` with ``n.bit_length() == i``,
+# i.e. 0, 1, 2-3, 4-7, ... up to 2**(HISTOGRAM_BINS - 1) and beyond
+HISTOGRAM_BINS = 33
+PREVIEW_CHARS = 80
+# Below this size the file is aggregated in-process; a pool would only add startup time
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+RANGES_PER_WORKER = 4
+
+
+@dataclass
+class HistoryStats:
+    """Mergeable aggregates for a slice of the history."""
+
+    entries: int = 0
+    requests: Counter = field(default_factory=Counter)  # (model, day) -> count
+    model_requests: Counter = field(default_factory=Counter)
+    model_tokens: Counter = field(default_factory=Counter)
+    prompt_hist: List[int] = field(default_factory=lambda: [0] * HISTOGRAM_BINS)
+    response_hist: List[int] = field(default_factory=lambda: [0] * HISTOGRAM_BINS)
+    prompt_counts: Counter = field(default_factory=Counter)  # digest -> count
+    prompt_previews: Dict[str, str] = field(default_factory=dict)
+
+    def merge(self, other: "HistoryStats") -> "HistoryStats":
+        """Add ``other`` into this aggregate and return it."""
+        self.entries += other.entries
+        self.requests.update(other.requests)
+        self.model_requests.update(other.model_requests)
+        self.model_tokens.update(other.model_tokens)
+        self.prompt_hist = [a + b for a, b in zip(self.prompt_hist, other.prompt_hist)]
+        self.response_hist = [a + b for a, b in zip(self.response_hist, other.response_hist)]
+        self.prompt_counts.update(other.prompt_counts)
+        for digest, preview in other.prompt_previews.items():
+            self.prompt_previews.setdefault(digest, preview)
+        return self
+
+    def top_prompts(self, limit: int = 10) -> List[Tuple[int, str]]:
+        """The most repeated prompts as ``(count, preview)``, most frequent first."""
+        return [
+            (count, self.prompt_previews.get(digest, ""))
+            for digest, count in self.prompt_counts.most_common(limit)
+            if count > 1
+        ]
+
+
+def split_ranges(path: Path, parts: int) -> List[Tuple[int, int]]:
+    """Split a file into about ``parts`` byte ranges that start and end on line boundaries."""
+    size = path.stat().st_size
+    if size == 0:
+        return []
+    parts = max(1, min(parts, size))
+
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(size * i // parts)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _histogram(lengths: List[int]) -> List[int]:
+    if np is not None:
+        values = np.asarray(lengths, dtype=np.int64)
+        bins = np.zeros(values.shape, dtype=np.int64)
+        positive = values > 0
+        bins[positive] = np.floor(np.log2(values[positive])).astype(np.int64) + 1
+        counts = np.bincount(np.minimum(bins, HISTOGRAM_BINS - 1), minlength=HISTOGRAM_BINS)
+        return counts.tolist()
+
+    counts = [0] * HISTOGRAM_BINS
+    for length in lengths:
+        counts[min(length.bit_length(), HISTOGRAM_BINS - 1)] += 1
+    return counts
+
+
+def aggregate_range(path: str, start: int, end: int) -> HistoryStats:
+    """Aggregate the records in ``[start, end)``; runs in worker processes."""
+    stats = HistoryStats()
+    prompt_lengths: List[int] = []
+    response_lengths: List[int] = []
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            try:
+                record = json.loads(line)
+                model = record["model"]
+                prompt = record["prompt"]
+            except (ValueError, KeyError, TypeError):
+                continue
+
+            stats.entries += 1
+            day = str(record.get("timestamp", ""))[:10]
+            stats.requests[(model, day)] += 1
+            stats.model_requests[model] += 1
+            tokens = record.get("tokens_used")
+            if isinstance(tokens, int):
+                stats.model_tokens[model] += tokens
+
+            prompt_lengths.append(record.get("prompt_chars") or len(prompt))
+            response_lengths.append(record.get("response_chars") or len(record.get("response", "")))
+
+            if record.get("session_id") is None:
+                digest = (
+                    record.get("prompt_sha256")
+                    or hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+                )
+                stats.prompt_counts[digest] += 1
+                if digest not in stats.prompt_previews:
+                    stats.prompt_previews[digest] = " ".join(prompt.split())[:PREVIEW_CHARS]
+
+    stats.prompt_hist = _histogram(prompt_lengths)
+    stats.response_hist = _histogram(response_lengths)
+    return stats
+
+
+def compute_stats(path: Path, jobs: Optional[int] = None) -> HistoryStats:
+    """Aggregate the whole history file, in parallel when it is large enough.
+
+    Args:
+        path: The history JSONL file.
+        jobs: Worker processes (default: CPU count). ``1`` disables the pool.
+    """
+    total = HistoryStats()
+    if not path.exists():
+        return total
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or path.stat().st_size < PARALLEL_MIN_BYTES:
+        for start, end in split_ranges(path, 1):
+            total.merge(aggregate_range(str(path), start, end))
+        return total
+
+    ranges = split_ranges(path, jobs * RANGES_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(aggregate_range, str(path), start, end) for start, end in ranges]
+        for future in futures:
+            total.merge(future.result())
+    return total
+
+
+def bin_bounds(index: int) -> Tuple[int, int]:
+    """Inclusive length range counted by histogram bin ``index``."""
+    if index == 0:
+        return 0, 0
+    return 2 ** (index - 1), 2**index - 1
+
+
+def percentile(histogram: List[int], fraction: float) -> int:
+    """Approximate percentile: the upper bound of the bin it falls into."""
+    total = sum(histogram)
+    if total == 0:
+        return 0
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= total * fraction:
+            return bin_bounds(index)[1]
+    return bin_bounds(len(histogram) - 1)[1]
+
+
+def to_records(stats: HistoryStats, top: int = 10) -> List[Dict[str, Any]]:
+    """Flatten the aggregates into records for machine-readable output.
+
+    Each record has a ``kind`` (``daily``, ``model``, ``length`` or ``prompt``)
+    and a tab-separated ``summary`` used by raw output.
+    """
+    records: List[Dict[str, Any]] = []
+    for (model, day), count in sorted(stats.requests.items(), key=lambda item: item[0][::-1]):
+        records.append(
+            {
+                "kind": "daily",
+                "day": day,
+                "model": model,
+                "requests": count,
+                "summary": f"{day}\t{model}\t{count}",
+            }
+        )
+    for model, count in stats.model_requests.most_common():
+        tokens = stats.model_tokens.get(model, 0)
+        records.append(
+            {
+                "kind": "model",
+                "model": model,
+                "requests": count,
+                "tokens": tokens,
+                "summary": f"{model}\t{count}\t{tokens}",
+            }
+        )
+    for name, histogram in (("prompt", stats.prompt_hist), ("response", stats.response_hist)):
+        for index, count in enumerate(histogram):
+            if count:
+                low, high = bin_bounds(index)
+                records.append(
+                    {
+                        "kind": "length",
+                        "field": name,
+                        "min": low,
+                        "max": high,
+                        "count": count,
+                        "summary": f"{name}\t{low}-{high}\t{count}",
+                    }
+                )
+    for count, preview in stats.top_prompts(top):
+        records.append(
+            {
+                "kind": "prompt",
+                "count": count,
+                "prompt": preview,
+                "summary": f"{count}\t{preview}",
+            }
+        )
+    return records
@@ -0,0 +1,156 @@
+"""Prompt ingestion from the command line, files and stdin.
+
+Files are memory-mapped and stdin is read in bounded chunks, so a prompt is
+materialised exactly once as the string handed to the SDK, no matter how large
+the input is. Inputs above the configured size cap are either truncated on a
+UTF-8 character boundary or rejected, depending on the overflow policy.
+"""
+
+import hashlib
+import mmap
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional, TextIO
+
+DEFAULT_MAX_PROMPT_BYTES = 8 * 1024 * 1024
+STDIN_CHUNK_SIZE = 64 * 1024
+
+OVERFLOW_TRUNCATE = "truncate"
+OVERFLOW_ERROR = "error"
+
+_WHITESPACE = b" \t\n\r\x0b\x0c"
+
+
+class PromptInputError(Exception):
+    """Raised when no usable prompt could be read."""
+
+
+@dataclass
+class PromptInput:
+    """A prompt ready to be sent to the model."""
+
+    text: str
+    source: str
+    size: int
+    truncated: bool
+    digest: str
+
+
+def read_prompt(
+    prompt: Optional[str] = None,
+    prompt_file: Optional[Path] = None,
+    stdin: Optional[TextIO] = None,
+    max_bytes: int = DEFAULT_MAX_PROMPT_BYTES,
+    overflow: str = OVERFLOW_TRUNCATE,
+) -> PromptInput:
+    """Read the prompt from a file, the ``-p`` option or piped stdin, in that order.
+
+    Raises:
+        PromptInputError: If the file is missing, no prompt was given, or the
+            input exceeds ``max_bytes`` with the ``error`` overflow policy.
+    """
+    if prompt_file:
+        return read_file(prompt_file, max_bytes, overflow)
+
+    if prompt:
+        data = prompt.encode("utf-8")
+        return PromptInput(
+            text=prompt,
+            source="option",
+            size=len(data),
+            truncated=False,
+            digest=hashlib.sha256(data).hexdigest(),
+        )
+
+    stream = stdin if stdin is not None else sys.stdin
+    if stream is not None and not stream.isatty():
+        result = read_stream(stream, max_bytes, overflow)
+        if result.text:
+            return result
+
+    raise PromptInputError("No prompt provided. Use -p, -f, or pipe input.")
+
+
+def read_file(
+    path: Path,
+    max_bytes: int = DEFAULT_MAX_PROMPT_BYTES,
+    overflow: str = OVERFLOW_TRUNCATE,
+) -> PromptInput:
+    """Read a prompt file through a read-only memory map."""
+    if not path.exists():
+        raise PromptInputError(f"File not found: {path}")
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return _decode(b"", "file", 0, max_bytes, overflow)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                return _decode(view, "file", size, max_bytes, overflow)
+
+
+def read_stream(
+    stream: TextIO,
+    max_bytes: int = DEFAULT_MAX_PROMPT_BYTES,
+    overflow: str = OVERFLOW_TRUNCATE,
+) -> PromptInput:
+    """Read piped input in bounded chunks, stopping one byte past the cap."""
+    raw: Optional[BinaryIO] = getattr(stream, "buffer", None)
+    buffer = bytearray()
+
+    while len(buffer) <= max_bytes:
+        want = min(STDIN_CHUNK_SIZE, max_bytes + 1 - len(buffer))
+        if raw is not None:
+            chunk = raw.read(want)
+        else:
+            chunk = stream.read(want).encode("utf-8")
+        if not chunk:
+            break
+        buffer += chunk
+
+    with memoryview(buffer) as view:
+        return _decode(view, "stdin", len(buffer), max_bytes, overflow)
+
+
+def _decode(
+    data: "bytes | memoryview",
+    source: str,
+    size: int,
+    max_bytes: int,
+    overflow: str,
+) -> PromptInput:
+    """Apply the size cap, trim surrounding whitespace and decode once."""
+    end = len(data)
+    truncated = end > max_bytes
+    if truncated:
+        if overflow == OVERFLOW_ERROR:
+            raise PromptInputError(
+                f"Input from {source} exceeds the {max_bytes} byte limit "
+                "(set max_prompt_bytes or prompt_overflow: truncate)."
+            )
+        end = _char_boundary(data, max_bytes)
+
+    start = 0
+    while start < end and data[start] in _WHITESPACE:
+        start += 1
+    while end > start and data[end - 1] in _WHITESPACE:
+        end -= 1
+
+    with memoryview(data)[start:end] as body:
+        try:
+            text = str(body, "utf-8")
+            digest = hashlib.sha256(body).hexdigest()
+        except UnicodeDecodeError:
+            # Invalid bytes become U+FFFD, so hash the text that is kept, not the input
+            text = str(body, "utf-8", "replace")
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return PromptInput(text=text, source=source, size=size, truncated=truncated, digest=digest)
+
+
+def _char_boundary(data: "bytes | memoryview", limit: int) -> int:
+    """Move ``limit`` back so it does not split a multi-byte UTF-8 sequence."""
+    while limit > 0 and (data[limit] & 0xC0) == 0x80:
+        limit -= 1
+    return limit
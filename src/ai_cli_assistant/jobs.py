@@ -0,0 +1,346 @@
+"""Offline batch jobs using the Gen AI batch API.
+
+Prompts are submitted as one provider batch job, either inline or, above
+``INLINE_LIMIT_BYTES``, as an uploaded JSONL file. Each job is tracked in the
+job directory as ``<id>.json`` (metadata) plus ``<id>.prompts.jsonl`` (the
+prompts, so results can be logged to history next to them). Polling backs off
+exponentially with jitter; results are yielded one at a time.
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from ai_cli_assistant import api
+
+# The batch API rejects inline requests above 20 MB; leave room for encoding
+INLINE_LIMIT_BYTES = 19 * 1024 * 1024
+POLL_INITIAL = 5.0
+POLL_MAX = 60.0
+POLL_FACTOR = 1.5
+
+SUCCEEDED_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+TERMINAL_STATES = SUCCEEDED_STATES | {
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+
+class JobError(Exception):
+    """Raised when a job cannot be submitted, found or fetched."""
+
+
+class JobRecord(BaseModel):
+    """Local metadata for a submitted batch job."""
+
+    name: str
+    model: str
+    created: str
+    state: str = "JOB_STATE_PENDING"
+    count: int = 0
+    mode: str = "inline"
+    display_name: Optional[str] = None
+    error: Optional[str] = None
+    fetched: bool = Field(default=False)
+
+    @property
+    def id(self) -> str:
+        """Short id: the provider name without its ``batches/`` prefix."""
+        return self.name.rsplit("/", 1)[-1]
+
+    @property
+    def done(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+
+class JobResult(BaseModel):
+    """The outcome of one request in a job."""
+
+    index: int
+    prompt: str
+    response: Optional[str] = None
+    error: Optional[str] = None
+    tokens_used: Optional[int] = None
+
+
+def get_job_dir(config_path: Optional[str] = None) -> Path:
+    """Get the job directory, creating it if needed."""
+    path = Path(config_path or "~/.ai_assistant_jobs").expanduser()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class JobStore:
+    """Job metadata and prompts kept in the job directory."""
+
+    def __init__(self, job_dir: Path):
+        self.job_dir = job_dir
+
+    def _meta_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.json"
+
+    def prompts_path(self, record: JobRecord) -> Path:
+        return self.job_dir / f"{record.id}.prompts.jsonl"
+
+    def save(self, record: JobRecord) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self.job_dir, prefix=".job-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(record.model_dump_json(indent=2))
+        os.replace(tmp_name, self._meta_path(record.id))
+
+    def get(self, ref: str) -> JobRecord:
+        """Look a job up by short id or full ``batches/...`` name.
+
+        Raises:
+            JobError: If there is no such job.
+        """
+        job_id = ref.rsplit("/", 1)[-1]
+        try:
+            return JobRecord.model_validate_json(
+                self._meta_path(job_id).read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError) as exc:
+            raise JobError(f"No job '{ref}' in {self.job_dir}.") from exc
+
+    def list(self) -> List[JobRecord]:
+        """All tracked jobs, newest first."""
+        records = []
+        for path in self.job_dir.glob("*.json"):
+            try:
+                records.append(JobRecord.model_validate_json(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return sorted(records, key=lambda record: record.created, reverse=True)
+
+    def write_prompts(self, record: JobRecord, prompts: List[str]) -> None:
+        with open(self.prompts_path(record), "w", encoding="utf-8") as f:
+            for prompt in prompts:
+                f.write(json.dumps({"prompt": prompt}, ensure_ascii=False) + "\n")
+
+    def iter_prompts(self, record: JobRecord) -> Iterator[str]:
+        path = self.prompts_path(record)
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)["prompt"]
+
+
+def read_prompts(path: Path) -> List[str]:
+    """Read prompts: one per line, or JSONL objects with a ``prompt`` field.
+
+    Raises:
+        JobError: If the file cannot be read or a JSONL line has no prompt.
+    """
+    jsonl = path.suffix in (".jsonl", ".ndjson")
+    prompts = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                if not jsonl:
+                    prompts.append(line.rstrip("\n"))
+                    continue
+                try:
+                    prompts.append(str(json.loads(line)["prompt"]))
+                except (ValueError, KeyError, TypeError) as exc:
+                    raise JobError(
+                        f"{path}:{number}: expected an object with a 'prompt' field"
+                    ) from exc
+    except OSError as exc:
+        raise JobError(f"Cannot read {path}: {exc}") from exc
+    return prompts
+
+
+def _file_request(
+    prompt: str,
+    system_prompt: Optional[str],
+    temperature: Optional[float],
+) -> Dict[str, Any]:
+    """A request in the REST format used by batch input files."""
+    request: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    if system_prompt:
+        request["system_instruction"] = {"parts": [{"text": system_prompt}]}
+    if temperature is not None:
+        request["generation_config"] = {"temperature": temperature}
+    return request
+
+
+def submit(
+    client: Any,
+    store: JobStore,
+    model: str,
+    prompts: List[str],
+    system_prompt: Optional[str] = None,
+    temperature: Optional[float] = None,
+    display_name: Optional[str] = None,
+) -> JobRecord:
+    """Create a batch job for ``prompts`` and start tracking it.
+
+    Raises:
+        JobError: If there are no prompts.
+    """
+    if not prompts:
+        raise JobError("No prompts to submit.")
+
+    config = api.build_generation_config(system_prompt, temperature)
+    size = sum(len(prompt.encode("utf-8")) for prompt in prompts)
+    job_config = {"display_name": display_name} if display_name else None
+
+    if size < INLINE_LIMIT_BYTES:
+        mode = "inline"
+        src: Any = [{"contents": prompt, "config": config} for prompt in prompts]
+    else:
+        mode = "file"
+        fd, tmp_name = tempfile.mkstemp(suffix=".jsonl", dir=store.job_dir, prefix=".src-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for index, prompt in enumerate(prompts):
+                    line = {
+                        "key": str(index),
+                        "request": _file_request(prompt, system_prompt, temperature),
+                    }
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            uploaded = client.files.upload(file=tmp_name, config={"mime_type": "jsonl"})
+        finally:
+            os.unlink(tmp_name)
+        src = uploaded.name
+
+    job = client.batches.create(model=model, src=src, config=job_config)
+    record = JobRecord(
+        name=job.name,
+        model=model,
+        created=datetime.now().isoformat(),
+        state=api.enum_name(getattr(job, "state", None) or "JOB_STATE_PENDING"),
+        count=len(prompts),
+        mode=mode,
+        display_name=display_name,
+    )
+    store.save(record)
+    store.write_prompts(record, prompts)
+    return record
+
+
+def refresh(client: Any, store: JobStore, record: JobRecord) -> Any:
+    """Fetch the provider's view of the job, update the local record and return the job."""
+    job = client.batches.get(name=record.name)
+    record.state = api.enum_name(job.state) if getattr(job, "state", None) else record.state
+    error = getattr(job, "error", None)
+    record.error = str(getattr(error, "message", None) or error) if error else None
+    store.save(record)
+    return job
+
+
+def wait(
+    client: Any,
+    store: JobStore,
+    record: JobRecord,
+    timeout: Optional[float] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+    on_poll: Optional[Callable[[JobRecord], None]] = None,
+) -> Any:
+    """Poll until the job reaches a terminal state, backing off between polls.
+
+    The interval starts at ``POLL_INITIAL`` seconds and grows by ``POLL_FACTOR``
+    up to ``POLL_MAX``, with jitter so many waiting clients do not poll in step.
+
+    Raises:
+        JobError: If ``timeout`` seconds pass first.
+    """
+    deadline = clock() + timeout if timeout is not None else None
+    interval = POLL_INITIAL
+    while True:
+        job = refresh(client, store, record)
+        if on_poll is not None:
+            on_poll(record)
+        if record.done:
+            return job
+        delay = random.uniform(interval / 2, interval)
+        if deadline is not None:
+            remaining = deadline - clock()
+            if remaining <= 0:
+                raise JobError(f"Job {record.id} is still {record.state} after {timeout:.0f}s.")
+            delay = min(delay, remaining)
+        sleep(delay)
+        interval = min(POLL_MAX, interval * POLL_FACTOR)
+
+
+def _result(index: int, prompt: str, response: Any, error: Any) -> JobResult:
+    if error:
+        message = getattr(error, "message", None) or (
+            error.get("message") if isinstance(error, dict) else None
+        )
+        return JobResult(index=index, prompt=prompt, error=str(message or error))
+    try:
+        parsed = api.parse_response(response, "")
+    except api.APIError as exc:
+        return JobResult(index=index, prompt=prompt, error=str(exc))
+    return JobResult(
+        index=index,
+        prompt=prompt,
+        response=parsed.text,
+        tokens_used=parsed.usage.get("total_token_count"),
+    )
+
+
+def iter_results(
+    client: Any,
+    store: JobStore,
+    record: JobRecord,
+    job: Any,
+) -> Iterator[JobResult]:
+    """Yield the result of each request, in submission order for inline jobs.
+
+    Raises:
+        JobError: If the job has not succeeded.
+    """
+    state = api.enum_name(job.state) if getattr(job, "state", None) else record.state
+    if state not in SUCCEEDED_STATES:
+        raise JobError(f"Job {record.id} is {state}; results are not available.")
+
+    prompts = store.iter_prompts(record)
+    dest = getattr(job, "dest", None)
+
+    inlined = getattr(dest, "inlined_responses", None)
+    if inlined:
+        for index, (item, prompt) in enumerate(zip(inlined, prompts)):
+            yield _result(
+                index, prompt, getattr(item, "response", None), getattr(item, "error", None)
+            )
+        return
+
+    file_name = getattr(dest, "file_name", None)
+    if not file_name:
+        raise JobError(f"Job {record.id} has no results.")
+
+    all_prompts = list(prompts)
+    # The SDK streams the download to the file in chunks; results are then read
+    # a line at a time, so memory does not grow with the size of the job output
+    fd, tmp_name = tempfile.mkstemp(suffix=".jsonl", dir=store.job_dir, prefix=".results-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            client.files.download(file=file_name, destination=f)
+        with open(tmp_name, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                index = int(data.get("key", 0))
+                prompt = all_prompts[index] if index < len(all_prompts) else ""
+                response = data.get("response")
+                if response is not None:
+                    response = types.GenerateContentResponse.model_validate(response)
+                yield _result(index, prompt, response, data.get("error"))
+    finally:
+        os.unlink(tmp_name)
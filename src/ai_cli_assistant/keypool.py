@@ -0,0 +1,236 @@
+"""Spread requests over several API keys.
+
+With more than one key in ``GEMINI_API_KEYS``, :func:`api.build_client` returns
+a :class:`PooledClient`: one SDK client per key behind the subset of the client
+interface this package uses. Each generation request goes to the key with the
+most headroom, i.e. the fewest requests in the last minute relative to what
+that key is known to sustain (keys without a known limit are assumed to match
+the best known one). A quota error (429) quarantines the key for the
+server's suggested delay, or ``quarantine`` seconds, lowers its learned
+capacity to what it had just carried, and the request moves to the next key.
+Capacity grows back by one request for each success at the limit, up to
+``requests_per_minute`` when that is configured.
+
+Files and batch jobs belong to the project of the key that created them, so
+they (and requests referring to uploaded files) always use the first key.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ai_cli_assistant import resilience
+from ai_cli_assistant.config import KeyPoolSettings
+
+# Requests are counted over this sliding window, matching per-minute quotas
+WINDOW = 60.0
+
+
+class KeyPoolError(Exception):
+    """Raised when a request has already been tried on every key."""
+
+
+@dataclass
+class KeyState:
+    """Load and quota feedback for one key."""
+
+    label: str
+    client: Any
+    capacity: float = float("inf")
+    in_flight: int = 0
+    requests: int = 0
+    quota_errors: int = 0
+    quarantined_until: float = 0.0
+    sent: Deque[float] = field(default_factory=deque)
+
+    def used(self, now: float) -> int:
+        """Requests sent in the last ``WINDOW`` seconds, finished or still running."""
+        while self.sent and self.sent[0] <= now - WINDOW:
+            self.sent.popleft()
+        return len(self.sent)
+
+    def headroom(self, now: float, assumed: float) -> float:
+        """Spare requests in the window; ``assumed`` stands in for an unknown capacity."""
+        capacity = assumed if self.capacity == float("inf") else self.capacity
+        return capacity - self.used(now)
+
+
+class KeyPool:
+    """Thread-safe scheduling of requests onto keys."""
+
+    def __init__(
+        self,
+        clients: Sequence[Tuple[str, Any]],
+        settings: Optional[KeyPoolSettings] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.settings = settings or KeyPoolSettings()
+        # A configured quota is the most a key is trusted with; learned limits stay below it
+        self._ceiling = float(self.settings.requests_per_minute or "inf")
+        self.keys = [KeyState(label, client, capacity=self._ceiling) for label, client in clients]
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude: Sequence[KeyState] = ()) -> KeyState:
+        """Reserve the key with the most headroom among those not in ``exclude``.
+
+        Quarantined keys are only used when every other key is quarantined too,
+        and then the one released soonest is chosen.
+
+        Raises:
+            KeyPoolError: If every key is excluded.
+        """
+        with self._lock:
+            now = self._clock()
+            candidates = [state for state in self.keys if state not in exclude]
+            if not candidates:
+                raise KeyPoolError(f"All {len(self.keys)} keys were already tried.")
+            available = [state for state in candidates if state.quarantined_until <= now]
+            if available:
+                # Keys of one account usually share a quota, so a key that has not
+                # hit a limit yet is assumed to sustain as much as the best known one.
+                # Ties go to fewer requests still running, then fewer in the window
+                known = [s.capacity for s in self.keys if s.capacity != float("inf")]
+                assumed = max(known, default=float("inf"))
+                state = max(
+                    available,
+                    key=lambda s: (s.headroom(now, assumed), -s.in_flight, -s.used(now)),
+                )
+            else:
+                state = min(candidates, key=lambda s: s.quarantined_until)
+            state.in_flight += 1
+            state.requests += 1
+            state.sent.append(now)
+            return state
+
+    def release(self, state: KeyState, exc: Optional[BaseException] = None) -> None:
+        """Finish a request on ``state``, applying quota feedback from ``exc``."""
+        with self._lock:
+            now = self._clock()
+            state.in_flight -= 1
+            if exc is not None and resilience.classify_error(exc) is resilience.ErrorKind.QUOTA:
+                state.quota_errors += 1
+                state.capacity = float(max(1, min(state.capacity, state.used(now))))
+                delay = resilience.server_delay(exc)
+                state.quarantined_until = now + (
+                    delay if delay is not None else self.settings.quarantine
+                )
+            elif (
+                exc is None and state.used(now) >= state.capacity and state.capacity < self._ceiling
+            ):
+                state.capacity += 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Per-key counters, for diagnostics."""
+        with self._lock:
+            now = self._clock()
+            return [
+                {
+                    "key": state.label,
+                    "requests": state.requests,
+                    "quota_errors": state.quota_errors,
+                    "recent": state.used(now),
+                    "capacity": None if state.capacity == float("inf") else state.capacity,
+                    "quarantined_for": max(0.0, state.quarantined_until - now),
+                }
+                for state in self.keys
+            ]
+
+
+def _references_files(contents: Any) -> bool:
+    """Whether request contents point at uploaded files."""
+    if isinstance(contents, (list, tuple)):
+        return any(_references_files(item) for item in contents)
+    if getattr(contents, "file_data", None) is not None:
+        return True
+    parts = getattr(contents, "parts", None)
+    return isinstance(parts, list) and _references_files(parts)
+
+
+def _should_fail_over(exc: BaseException, pool: KeyPool, tried: List[KeyState]) -> bool:
+    if len(tried) >= len(pool.keys):
+        return False
+    return resilience.classify_error(exc) is resilience.ErrorKind.QUOTA
+
+
+class _PooledModels:
+    """``client.models`` with generation calls spread over the pool."""
+
+    def __init__(self, pool: KeyPool):
+        self._pool = pool
+        self._primary = pool.keys[0].client.models
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._primary, name)
+
+    def _call(self, method: str, kwargs: Dict[str, Any]) -> Any:
+        if _references_files(kwargs.get("contents")):
+            return getattr(self._primary, method)(**kwargs)
+        tried: List[KeyState] = []
+        while True:
+            state = self._pool.acquire(exclude=tried)
+            tried.append(state)
+            try:
+                result = getattr(state.client.models, method)(**kwargs)
+            except Exception as exc:
+                self._pool.release(state, exc)
+                if _should_fail_over(exc, self._pool, tried):
+                    continue
+                raise
+            self._pool.release(state)
+            return result
+
+    def generate_content(self, **kwargs: Any) -> Any:
+        return self._call("generate_content", kwargs)
+
+    def count_tokens(self, **kwargs: Any) -> Any:
+        return self._call("count_tokens", kwargs)
+
+    def embed_content(self, **kwargs: Any) -> Any:
+        return self._call("embed_content", kwargs)
+
+    def generate_content_stream(self, **kwargs: Any) -> Iterator[Any]:
+        """Stream from one key; a quota error before the first chunk moves to the next."""
+        if _references_files(kwargs.get("contents")):
+            yield from self._primary.generate_content_stream(**kwargs)
+            return
+        tried: List[KeyState] = []
+        while True:
+            state = self._pool.acquire(exclude=tried)
+            tried.append(state)
+            started = False
+            try:
+                for chunk in state.client.models.generate_content_stream(**kwargs):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                self._pool.release(state)
+                raise
+            except Exception as exc:
+                self._pool.release(state, exc)
+                if not started and _should_fail_over(exc, self._pool, tried):
+                    continue
+                raise
+            self._pool.release(state)
+            return
+
+
+class PooledClient:
+    """Stand-in for ``genai.Client`` that spreads generation over several keys.
+
+    Anything other than ``models`` (files, batches, ...) uses the first key.
+    """
+
+    def __init__(self, pool: KeyPool):
+        self.pool = pool
+        self.models = _PooledModels(pool)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool.keys[0].client, name)
+
+
+def key_label(key: str) -> str:
+    """A non-secret name for a key: its last four characters."""
+    return f"…{key[-4:]}"
@@ -0,0 +1,165 @@
+"""Shrink prompts before they are sent.
+
+Piped logs and files often spend most of their tokens on noise. The pipeline
+removes it in four steps, each of which can be turned off in config:
+
+1. ``strip_control``: drop ANSI escape sequences and other control characters.
+   A line redrawn with carriage returns (a progress bar) keeps only its last
+   state.
+2. ``collapse_whitespace``: trim trailing whitespace and fold runs of blank
+   lines into one. Indentation is kept.
+3. ``dedupe_lines``: collapse consecutive repeats of a line, or of a block of
+   up to ``max_block`` lines such as recursive stack frames. One copy is kept,
+   followed by a note with the repeat count.
+4. ``max_tokens``: if the prompt is still over budget, cut from the middle.
+   Both the head and the tail are kept, since that is where the question and
+   the most recent output usually are.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ai_cli_assistant.config import MinimizeSettings
+from ai_cli_assistant.utils import tokens
+
+_ANSI = re.compile(r"\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\-_])")
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+# Room left for the omission note when truncating
+NOTE_CHARS = 80
+# Even a tiny budget keeps this much of the head and tail, or nothing but the note would remain
+MIN_KEEP_CHARS = 200
+
+
+@dataclass
+class MinimizeResult:
+    """A minimized prompt and the estimated tokens each step saved."""
+
+    text: str
+    original_tokens: int
+    tokens: int
+    saved_by_step: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+def strip_control(text: str) -> str:
+    """Remove escape sequences and control characters, keeping tabs and newlines."""
+    text = _ANSI.sub("", text).replace("\r\n", "\n")
+    if "\r" in text:
+        lines = []
+        for line in text.split("\n"):
+            states = [state for state in line.split("\r") if state]
+            lines.append(states[-1] if states else "")
+        text = "\n".join(lines)
+    return _CONTROL.sub("", text)
+
+
+def collapse_whitespace(text: str) -> str:
+    """Trim trailing whitespace and fold runs of blank lines into one."""
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_RUNS.sub("\n\n", text).strip("\n")
+
+
+def _repeat_note(lines: int, times: int) -> str:
+    what = "line" if lines == 1 else f"{lines} lines"
+    return f"[previous {what} repeated {times} more time{'s' if times > 1 else ''}]"
+
+
+def dedupe_lines(text: str, max_block: int = 8) -> str:
+    """Collapse consecutive repeats of a line or a block of up to ``max_block`` lines.
+
+    At each position the block size covering the most repeated lines wins.
+    Repeats are only collapsed when the note is shorter than what it replaces.
+    """
+    lines = text.split("\n")
+    out: List[str] = []
+    i = 0
+    while i < len(lines):
+        best_size, best_count = 0, 1
+        for size in range(1, max_block + 1):
+            if i + 2 * size > len(lines):
+                break
+            block = lines[i : i + size]
+            count = 1
+            while lines[i + count * size : i + (count + 1) * size] == block:
+                count += 1
+            if count > 1 and size * count > best_size * best_count:
+                best_size, best_count = size, count
+
+        if best_count > 1:
+            block = lines[i : i + best_size]
+            note = _repeat_note(best_size, best_count - 1)
+            repeated = sum(len(line) + 1 for line in block) * (best_count - 1)
+            if len(note) < repeated:
+                out.extend(block)
+                out.append(note)
+                i += best_size * best_count
+                continue
+        out.append(lines[i])
+        i += 1
+    return "\n".join(out)
+
+
+def truncate_middle(text: str, max_tokens: int) -> str:
+    """Cut the middle of ``text`` so it fits in about ``max_tokens`` tokens.
+
+    Cuts fall on line breaks where possible, and the omitted part is replaced
+    by a note giving its size. At least ``MIN_KEEP_CHARS`` characters are kept,
+    so a very small budget can be exceeded.
+    """
+    if tokens.estimate_tokens(text) <= max_tokens:
+        return text
+    keep = max(MIN_KEEP_CHARS, tokens.chars_for_tokens(max_tokens) - NOTE_CHARS)
+    if keep >= len(text):
+        return text
+    head_end = keep // 2
+    tail_start = len(text) - (keep - head_end)
+
+    newline = text.rfind("\n", 0, head_end)
+    if newline > head_end // 2:
+        head_end = newline + 1
+    newline = text.find("\n", tail_start)
+    if newline != -1 and newline - tail_start < (len(text) - tail_start) // 2:
+        tail_start = newline + 1
+
+    omitted = text[head_end:tail_start]
+    note = (
+        f"[... {omitted.count(chr(10)) + 1:,} lines "
+        f"(~{tokens.estimate_tokens(omitted):,} tokens) omitted ...]"
+    )
+    return f"{text[:head_end]}{note}\n{text[tail_start:]}"
+
+
+def minimize(
+    text: str,
+    settings: Optional[MinimizeSettings] = None,
+    max_tokens: Optional[int] = None,
+) -> MinimizeResult:
+    """Run the enabled steps over ``text``; ``max_tokens`` overrides the configured budget."""
+    settings = settings or MinimizeSettings()
+    budget = max_tokens if max_tokens is not None else settings.max_tokens
+    steps = [
+        ("strip_control", settings.strip_control, strip_control),
+        ("collapse_whitespace", settings.collapse_whitespace, collapse_whitespace),
+        (
+            "dedupe_lines",
+            settings.dedupe_lines,
+            lambda value: dedupe_lines(value, settings.max_block),
+        ),
+        ("truncate_middle", budget is not None, lambda value: truncate_middle(value, budget)),
+    ]
+
+    original = current = tokens.estimate_tokens(text)
+    saved: Dict[str, int] = {}
+    for name, enabled, step in steps:
+        if not enabled:
+            continue
+        text = step(text)
+        after = tokens.estimate_tokens(text)
+        saved[name] = current - after
+        current = after
+    return MinimizeResult(text, original, current, saved)
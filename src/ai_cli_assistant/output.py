@@ -0,0 +1,119 @@
+"""Machine-readable output that bypasses Rich rendering.
+
+``raw`` writes the response text as-is, ``json`` writes one object once the
+response is complete, and ``jsonl`` writes one event per line (``start``,
+``chunk``, ``item``, ``usage``, ``end``). Structured responses can emit parsed
+``item`` values, which ``raw`` writes as one compact JSON document per line.
+Everything goes straight to the binary ``sys.stdout.buffer`` so the CLI can sit
+in high-throughput shell pipelines.
+"""
+
+import json
+import sys
+from enum import Enum
+from typing import Any, BinaryIO, Dict, List, Optional
+
+
+class OutputFormat(str, Enum):
+    """Output formats accepted by ``--output``."""
+
+    RICH = "rich"
+    RAW = "raw"
+    JSON = "json"
+    JSONL = "jsonl"
+
+
+def _encode(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def get_binary_stdout() -> BinaryIO:
+    """Return the buffered binary stdout, flushing any pending text output first."""
+    sys.stdout.flush()
+    return sys.stdout.buffer
+
+
+class MachineWriter:
+    """Emit a single response in one of the machine-readable formats."""
+
+    def __init__(self, fmt: OutputFormat, stream: Optional[BinaryIO] = None):
+        if fmt == OutputFormat.RICH:
+            raise ValueError("MachineWriter does not render Rich output.")
+        self.format = fmt
+        self.stream = stream if stream is not None else get_binary_stdout()
+        self._parts: List[str] = []
+        self._fields: Dict[str, Any] = {}
+        self._wrote_text = False
+
+    def start(self, model: str, **fields: Any) -> None:
+        """Begin a response."""
+        self._fields = {"model": model, **fields}
+        if self.format == OutputFormat.JSONL:
+            self.stream.write(_encode({"event": "start", **self._fields}))
+
+    def chunk(self, text: str, flush: bool = False) -> None:
+        """Write a piece of response text."""
+        if self.format == OutputFormat.RAW:
+            self.stream.write(text.encode("utf-8"))
+            self._wrote_text = True
+        elif self.format == OutputFormat.JSONL:
+            self.stream.write(_encode({"event": "chunk", "text": text}))
+        else:
+            self._parts.append(text)
+        if flush:
+            self.stream.flush()
+
+    def item(self, index: int, data: Any, flush: bool = True) -> None:
+        """Write one parsed value of a structured response as soon as it is complete.
+
+        ``json`` output ignores items; pass the parsed document to :meth:`end`.
+        """
+        if self.format == OutputFormat.RAW:
+            self.stream.write(json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n")
+        elif self.format == OutputFormat.JSONL:
+            self.stream.write(_encode({"event": "item", "index": index, "data": data}))
+        else:
+            return
+        if flush:
+            self.stream.flush()
+
+    def usage(self, usage: Dict[str, int]) -> None:
+        """Record token usage for the response."""
+        if not usage:
+            return
+        if self.format == OutputFormat.JSONL:
+            self.stream.write(_encode({"event": "usage", **usage}))
+        else:
+            self._fields["usage"] = usage
+
+    def end(self, **fields: Any) -> None:
+        """Finish the response and flush stdout."""
+        if self.format == OutputFormat.RAW:
+            if self._wrote_text:
+                self.stream.write(b"\n")
+        elif self.format == OutputFormat.JSONL:
+            self.stream.write(_encode({"event": "end", **fields}))
+        else:
+            data = {**self._fields, "response": "".join(self._parts), **fields}
+            self.stream.write(_encode(data))
+        self.stream.flush()
+
+
+def write_records(
+    fmt: OutputFormat,
+    records: List[Dict[str, Any]],
+    text_field: Optional[str] = None,
+    stream: Optional[BinaryIO] = None,
+) -> None:
+    """Write a list of records: a JSON array, JSONL lines, or raw ``text_field`` values."""
+    out = stream if stream is not None else get_binary_stdout()
+    if fmt == OutputFormat.JSON:
+        out.write(json.dumps(records, ensure_ascii=False, indent=2).encode("utf-8") + b"\n")
+    elif fmt == OutputFormat.JSONL:
+        for record in records:
+            out.write(_encode(record))
+    else:
+        for record in records:
+            value = record.get(text_field, "") if text_field else ""
+            out.write(str(value).encode("utf-8") + b"\n")
+    out.flush()
@@ -0,0 +1,245 @@
+"""Profile a CLI command for performance bug reports.
+
+``--profile`` wraps the invoked command in one of three profilers. Each writes
+a raw profile next to a plain-text top-N summary:
+
+- ``cpu`` runs cProfile on the main thread and writes a ``.prof`` file that
+  ``pstats``, snakeviz and similar tools can read.
+- ``mem`` traces allocations with tracemalloc. It writes a snapshot that
+  ``tracemalloc.Snapshot.load`` can read, and reports peak memory.
+- ``sample`` records the stacks of every thread at a fixed interval from a
+  background thread. It measures wall-clock time, so waits on the network and
+  on worker threads show up. Its cost does not grow with the number of calls,
+  which suits long ``chat`` sessions and batch jobs. Stacks are written in the
+  folded format read by flamegraph.pl and speedscope.
+"""
+
+import abc
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from types import FrameType
+from typing import Dict, List, Optional
+
+DEFAULT_TOP = 20
+DEFAULT_INTERVAL = 0.005
+MEMORY_FRAMES = 10
+
+
+class ProfileMode(str, Enum):
+    """Profilers accepted by ``--profile``."""
+
+    CPU = "cpu"
+    MEM = "mem"
+    SAMPLE = "sample"
+
+
+@dataclass
+class ProfileReport:
+    """Where a profile was written and its top-N summary."""
+
+    mode: ProfileMode
+    elapsed: float
+    summary: str
+    files: List[Path] = field(default_factory=list)
+
+
+class Profiler(abc.ABC):
+    """Base class: call :meth:`start`, run the work, then :meth:`stop`."""
+
+    mode: ProfileMode
+    suffix: str
+
+    def __init__(self, directory: Path, name: str, top: int = DEFAULT_TOP):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.base = directory / f"ai-assistant-{name}-{stamp}"
+        self.top = top
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._start()
+
+    def stop(self) -> ProfileReport:
+        """Stop profiling and write the profile and its summary."""
+        elapsed = time.perf_counter() - self._started
+        self._stop()
+        self.base.parent.mkdir(parents=True, exist_ok=True)
+        data_path = self.base.with_suffix(self.suffix)
+        summary = self._write(data_path)
+        header = f"{self.mode.value} profile, {elapsed:.3f}s wall clock\n\n"
+        summary_path = self.base.with_suffix(".txt")
+        summary_path.write_text(header + summary, encoding="utf-8")
+        return ProfileReport(self.mode, elapsed, header + summary, [data_path, summary_path])
+
+    @abc.abstractmethod
+    def _start(self) -> None:
+        """Begin collecting."""
+
+    @abc.abstractmethod
+    def _stop(self) -> None:
+        """Stop collecting."""
+
+    @abc.abstractmethod
+    def _write(self, path: Path) -> str:
+        """Write the raw profile to ``path`` and return the summary text."""
+
+
+class CpuProfiler(Profiler):
+    """Deterministic cProfile profile of the main thread."""
+
+    mode = ProfileMode.CPU
+    suffix = ".prof"
+
+    def _start(self) -> None:
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def _stop(self) -> None:
+        self._profile.disable()
+
+    def _write(self, path: Path) -> str:
+        self._profile.dump_stats(str(path))
+        out = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        return out.getvalue().strip() + "\n"
+
+
+class MemoryProfiler(Profiler):
+    """Allocations still live at the end of the command, and the peak."""
+
+    mode = ProfileMode.MEM
+    suffix = ".tracemalloc"
+
+    def _start(self) -> None:
+        self._was_tracing = tracemalloc.is_tracing()
+        if not self._was_tracing:
+            tracemalloc.start(MEMORY_FRAMES)
+        tracemalloc.reset_peak()
+
+    def _stop(self) -> None:
+        self._current, self._peak = tracemalloc.get_traced_memory()
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ]
+        )
+        if not self._was_tracing:
+            tracemalloc.stop()
+
+    def _write(self, path: Path) -> str:
+        self._snapshot.dump(str(path))
+        lines = [
+            f"Current: {self._current / 1024:.1f} KiB, peak: {self._peak / 1024:.1f} KiB",
+            "",
+            f"Top {self.top} allocation sites:",
+        ]
+        for stat in self._snapshot.statistics("lineno")[: self.top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  "
+                f"{frame.filename}:{frame.lineno}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler(Profiler):
+    """Wall-clock stack samples of every thread, taken from a background thread."""
+
+    mode = ProfileMode.SAMPLE
+    suffix = ".folded"
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        top: int = DEFAULT_TOP,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        super().__init__(directory, name, top)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="ai-assistant-sampler", daemon=True)
+        self._thread.start()
+
+    def _stop(self) -> None:
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._done.wait(self.interval):
+            self.sample(exclude=me)
+
+    def sample(self, exclude: Optional[int] = None) -> None:
+        """Record the current stack of every thread but ``exclude``."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == exclude:
+                continue
+            stack = []
+            current: Optional[FrameType] = frame
+            while current is not None:
+                stack.append(_label(current))
+                current = current.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _write(self, path: Path) -> str:
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()),
+            encoding="utf-8",
+        )
+        inclusive: Dict[str, int] = Counter()
+        exclusive: Dict[str, int] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            for name in set(frames):
+                inclusive[name] += count
+            if frames:
+                exclusive[frames[-1]] += count
+
+        total = sum(self.stacks.values()) or 1
+        lines = [f"{self.samples} samples every {self.interval * 1000:g}ms", ""]
+        for title, counts in (("Total (incl. callees)", inclusive), ("Self", exclusive)):
+            lines.append(f"Top {self.top} by {title.lower()}:")
+            for name, count in Counter(counts).most_common(self.top):
+                lines.append(f"{count:8d} {count / total:6.1%}  {name}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+_PROFILERS = {
+    ProfileMode.CPU: CpuProfiler,
+    ProfileMode.MEM: MemoryProfiler,
+    ProfileMode.SAMPLE: SamplingProfiler,
+}
+
+
+def start(mode: ProfileMode, directory: Path, name: str, top: int = DEFAULT_TOP) -> Profiler:
+    """Create and start the profiler for ``mode``; files are named after ``name``."""
+    profiler = _PROFILERS[mode](directory, name, top)
+    profiler.start()
+    return profiler
@@ -0,0 +1,208 @@
+"""Incremental Markdown rendering for streamed replies.
+
+Re-rendering the whole reply on every chunk costs time quadratic in its
+length. Instead, :class:`BlockSplitter` cuts the text into top-level Markdown
+blocks as chunks arrive: paragraphs, headings, lists, quotes and fenced code.
+A block is complete once something after it starts a new block. Completed blocks
+are rendered once and printed above the live region, where they stay frozen.
+Only the trailing open block is re-rendered, at most ``refresh_per_second``
+times a second. Fenced code is highlighted with Pygments, guessing the
+language when the fence does not name one.
+
+Because blocks are rendered separately, reference-style links whose definition
+comes later in the reply are shown as written.
+"""
+
+import re
+from typing import Any, List, Optional
+
+from pygments.lexers import get_lexer_by_name, guess_lexer
+from pygments.util import ClassNotFound
+from rich.console import Console, Group, RenderableType
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.syntax import Syntax
+from rich.text import Text
+
+DEFAULT_CODE_THEME = "monokai"
+
+_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})\s*([^`\s]*)")
+_HEADING = re.compile(r"^ {0,3}#{1,6}(\s|$)")
+
+
+def _closes(line: str, fence: str) -> bool:
+    stripped = line.strip()
+    return (
+        stripped.startswith(fence)
+        and set(stripped) == {fence[0]}
+        and len(line) - len(line.lstrip(" ")) <= 3
+    )
+
+
+class BlockSplitter:
+    """Split streamed Markdown into top-level blocks as soon as they are complete.
+
+    A blank line does not end a block by itself: the block ends when the next
+    non-blank line is not indented. Until then, an indented line may still
+    continue a list item or code block. Headings and code fences end the block
+    before them right away.
+    """
+
+    def __init__(self) -> None:
+        self._partial = ""
+        self._lines: List[str] = []
+        self._fence: Optional[str] = None
+
+    @property
+    def tail(self) -> str:
+        """The open block, including any incomplete last line."""
+        return "".join(self._lines) + self._partial
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return the blocks it completed."""
+        done: List[str] = []
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line + "\n", done)
+        # The first character of the next line is enough to know the block ended
+        if self._ends_block(self._partial):
+            self._flush(done)
+        return done
+
+    def close(self) -> List[str]:
+        """End of the stream: return whatever is still open as final blocks."""
+        done: List[str] = []
+        if self._partial:
+            self._line(self._partial, done)
+            self._partial = ""
+        self._flush(done)
+        return done
+
+    def _flush(self, done: List[str]) -> None:
+        block = "".join(self._lines).rstrip("\n")
+        if block.strip():
+            done.append(block)
+        self._lines = []
+
+    def _ends_block(self, line: str) -> bool:
+        return (
+            self._fence is None
+            and bool(self._lines)
+            and not self._lines[-1].strip()
+            and line[:1].strip() != ""
+        )
+
+    def _line(self, line: str, done: List[str]) -> None:
+        if self._fence is not None:
+            self._lines.append(line)
+            if _closes(line, self._fence):
+                self._fence = None
+                self._flush(done)
+            return
+
+        if not line.strip():
+            if self._lines:
+                self._lines.append(line)
+            return
+
+        if self._ends_block(line):
+            self._flush(done)
+
+        fence = _FENCE.match(line)
+        if fence:
+            self._flush(done)
+            self._fence = fence.group(1)
+            self._lines.append(line)
+        elif _HEADING.match(line):
+            self._flush(done)
+            self._lines.append(line)
+            self._flush(done)
+        else:
+            self._lines.append(line)
+
+
+def render_block(block: str, code_theme: str = DEFAULT_CODE_THEME) -> RenderableType:
+    """Render one Markdown block; fenced code goes straight to Pygments."""
+    fence = _FENCE.match(block)
+    if not fence:
+        return Markdown(block, code_theme=code_theme)
+
+    lines = block.split("\n")[1:]
+    if lines and _closes(lines[-1], fence.group(1)):
+        lines.pop()
+    code = "\n".join(lines)
+    language = fence.group(2)
+    try:
+        lexer = get_lexer_by_name(language) if language else guess_lexer(code)
+    except ClassNotFound:
+        lexer = get_lexer_by_name("text")
+    return Syntax(code, lexer, theme=code_theme, word_wrap=True, padding=(0, 1))
+
+
+class _Tail:
+    """Renders the splitter's open block lazily, when Live refreshes."""
+
+    def __init__(self, splitter: BlockSplitter, code_theme: str):
+        self._splitter = splitter
+        self._code_theme = code_theme
+        self._text = ""
+        self._rendered: RenderableType = Text()
+
+    def __rich__(self) -> RenderableType:
+        text = self._splitter.tail
+        if text != self._text:
+            self._text = text
+            self._rendered = render_block(text, self._code_theme) if text.strip() else Text()
+        return self._rendered
+
+
+class LiveMarkdown:
+    """Print streamed Markdown with completed blocks frozen and the tail live.
+
+    Use as a context manager and pass each chunk to :meth:`feed`.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        code_theme: str = DEFAULT_CODE_THEME,
+        refresh_per_second: float = 8,
+    ):
+        self.console = console
+        self.code_theme = code_theme
+        self.blocks = 0
+        self._splitter = BlockSplitter()
+        self._live = Live(
+            _Tail(self._splitter, code_theme),
+            console=console,
+            refresh_per_second=refresh_per_second,
+            transient=True,
+            vertical_overflow="visible",
+        )
+
+    def __enter__(self) -> "LiveMarkdown":
+        self._live.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        try:
+            self._freeze(self._splitter.close())
+        finally:
+            self._live.stop()
+
+    def feed(self, text: str) -> None:
+        """Add a chunk of the reply."""
+        self._freeze(self._splitter.feed(text))
+
+    def _freeze(self, blocks: List[str]) -> None:
+        if not blocks:
+            return
+        renderables: List[RenderableType] = []
+        for block in blocks:
+            if self.blocks:
+                renderables.append(Text())
+            renderables.append(render_block(block, self.code_theme))
+            self.blocks += 1
+        # Printed above the live region, so these are rendered exactly once
+        self._live.console.print(Group(*renderables))
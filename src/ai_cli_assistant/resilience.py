@@ -0,0 +1,305 @@
+"""Error classification, backoff, retry budget and circuit breakers for API calls.
+
+Failures are sorted into three kinds: *retryable* (server errors, dropped
+connections, timeouts), *quota* (HTTP 429, retried only when the server's
+suggested delay is short enough) and *fatal*, which are never retried. Fatal
+covers bad requests, auth failures and safety blocks, and any exception not
+known to be transient, such as a bug in the calling code.
+
+Two process-wide guards keep retries from piling onto a degraded backend: a
+retry budget that allows retries only in proportion to successful requests,
+and a per-model circuit breaker that fails fast after repeated failures.
+"""
+
+import random
+import re
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from google.genai import errors as genai_errors
+
+from ai_cli_assistant.config import RetrySettings
+
+RETRYABLE_STATUS_CODES = {408, 500, 502, 503, 504}
+TRANSIENT_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError)
+QUOTA_STATUS = "RESOURCE_EXHAUSTED"
+_RETRY_INFO_TYPE = "type.googleapis.com/google.rpc.RetryInfo"
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)s\s*$")
+
+
+class ErrorKind(str, Enum):
+    """How a failed call should be treated."""
+
+    RETRYABLE = "retryable"
+    QUOTA = "quota"
+    FATAL = "fatal"
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while a model's circuit breaker is open."""
+
+    def __init__(self, model: str, retry_in: float):
+        super().__init__(
+            f"Requests to '{model}' are failing; not retrying for another {retry_in:.0f}s."
+        )
+        self.model = model
+        self.retry_in = retry_in
+
+
+def classify_error(exc: BaseException) -> ErrorKind:
+    """Classify an exception raised by an API call.
+
+    Only SDK errors with a retryable status and the transport errors in
+    ``TRANSIENT_ERRORS`` are retried; anything else is fatal.
+    """
+    if isinstance(exc, genai_errors.APIError):
+        if exc.code == 429 or exc.status == QUOTA_STATUS:
+            return ErrorKind.QUOTA
+        if exc.code in RETRYABLE_STATUS_CODES or (exc.code or 0) >= 500:
+            return ErrorKind.RETRYABLE
+        return ErrorKind.FATAL
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return ErrorKind.RETRYABLE
+    return ErrorKind.FATAL
+
+
+def server_delay(exc: BaseException) -> Optional[float]:
+    """Return the delay in seconds the server asked for, if any.
+
+    Checks a ``Retry-After`` header first, then a ``RetryInfo`` detail
+    (``"retryDelay": "37s"``) in the error body.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            value = headers.get("retry-after")
+        except Exception:
+            value = None
+        if value:
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                pass
+
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict):
+        error = details.get("error", details)
+        details = error.get("details") if isinstance(error, dict) else None
+    for detail in details if isinstance(details, list) else []:
+        if isinstance(detail, dict) and detail.get("@type") == _RETRY_INFO_TYPE:
+            match = _DURATION.match(str(detail.get("retryDelay", "")))
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def backoff_delay(
+    attempt: int,
+    exc: BaseException,
+    max_wait: float,
+    rng: Callable[[float, float], float] = random.uniform,
+) -> Optional[float]:
+    """Seconds to wait before retry number ``attempt``, or ``None`` to give up.
+
+    A server hint is followed (plus up to 10% jitter) when it is within
+    ``max_wait``; a longer hint means waiting here would not help. Otherwise
+    the delay is exponential with equal jitter, so concurrent clients spread
+    out instead of retrying in lockstep. Quota errors without a hint are not
+    retried.
+    """
+    hint = server_delay(exc)
+    if hint is not None:
+        if hint > max_wait:
+            return None
+        return hint + rng(0.0, hint * 0.1)
+    if classify_error(exc) is ErrorKind.QUOTA:
+        return None
+
+    ceiling = min(max_wait, float(2 ** (attempt - 1)))
+    return rng(ceiling / 2, ceiling)
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of successful requests.
+
+    Starts with ``reserve`` tokens; each success adds ``ratio`` (up to the
+    reserve) and each retry spends one. When the backend is failing there
+    are no successes to refill it, so retries stop instead of multiplying
+    the load.
+    """
+
+    def __init__(self, ratio: float = 0.2, reserve: int = 10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._tokens = min(float(self.reserve), self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry token, returning ``False`` if the budget is empty."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for one model.
+
+    ``threshold`` consecutive retryable failures open the circuit; calls then
+    fail immediately for ``cooldown`` seconds, after which one probe call is
+    let through. Its success closes the circuit, its failure reopens it, and
+    if it ends without an outcome (e.g. Ctrl+C) the next call probes instead.
+    Quota and fatal errors mean the backend answered, so they count as healthy.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        model: str,
+        threshold: int = 5,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.model = model
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def before_call(self) -> None:
+        """Admit a call or reject it.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe
+                already in flight.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.cooldown - self._clock()
+            if self._state == self.OPEN and remaining <= 0:
+                self._state = self.HALF_OPEN
+                return
+            raise CircuitOpenError(self.model, max(remaining, 0.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_abandoned(self) -> None:
+        """A call ended without an outcome; a probe in flight frees its slot."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+                self._opened_at = self._clock() - self.cooldown
+
+    def record_failure(self, kind: ErrorKind) -> None:
+        with self._lock:
+            if kind is not ErrorKind.RETRYABLE:
+                # The backend answered, so it is up.
+                self._state = self.CLOSED
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+_lock = threading.Lock()
+_settings = RetrySettings()
+_budget = RetryBudget(_settings.budget_ratio, _settings.budget_reserve)
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def configure(settings: RetrySettings) -> None:
+    """Apply new settings, resetting the budget and breakers if they changed."""
+    global _settings
+    with _lock:
+        changed = settings != _settings
+        _settings = settings
+    if changed:
+        reset()
+
+
+def get_settings() -> RetrySettings:
+    return _settings
+
+
+def get_budget() -> RetryBudget:
+    """Return the retry budget shared by every call in the process."""
+    return _budget
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """Return the circuit breaker for ``model``, creating it on first use."""
+    with _lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(model, _settings.breaker_threshold, _settings.breaker_cooldown)
+            _breakers[model] = breaker
+        return breaker
+
+
+def reset() -> None:
+    """Refill the retry budget and close every circuit."""
+    global _budget
+    with _lock:
+        _budget = RetryBudget(_settings.budget_ratio, _settings.budget_reserve)
+        _breakers.clear()
+
+
+def guarded_call(model: str, fn: Callable[[], Any]) -> Any:
+    """Call ``fn`` through ``model``'s circuit breaker and record the outcome.
+
+    Raises:
+        CircuitOpenError: If the circuit is open.
+    """
+    breaker = get_breaker(model)
+    breaker.before_call()
+    try:
+        result = fn()
+    except Exception as exc:
+        breaker.record_failure(classify_error(exc))
+        raise
+    except BaseException:
+        breaker.record_abandoned()
+        raise
+    breaker.record_success()
+    get_budget().record_success()
+    return result
+
+
+def should_retry(exc: BaseException, attempt: int) -> bool:
+    """Decide whether to retry after ``exc`` on ``attempt``, spending budget if so."""
+    if attempt >= _settings.attempts:
+        return False
+    if classify_error(exc) is ErrorKind.FATAL:
+        return False
+    if backoff_delay(attempt, exc, _settings.max_wait, rng=lambda low, high: low) is None:
+        return False
+    return get_budget().try_spend()
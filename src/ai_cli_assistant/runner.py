@@ -0,0 +1,171 @@
+"""Background execution of API calls so in-flight requests can be cancelled.
+
+Blocking SDK calls run on a worker thread while the main thread waits in short
+intervals, which keeps it responsive to Ctrl+C. Cancelling abandons a plain
+request (its result is discarded when it finishes) and stops a stream at the
+next chunk, closing the underlying response.
+
+A request that needs the terminal, for instance to ask the user to approve a
+tool call, hands that step back to the waiting thread with
+:meth:`RequestRunner.on_caller_thread`, so prompts never read stdin from a
+worker. Cancelling answers any such step with its default.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_ITEM = "item"
+_ERROR = "error"
+_DONE = "done"
+
+
+class RequestCancelledError(Exception):
+    """Raised in the caller when an in-flight request is cancelled with Ctrl+C."""
+
+
+@dataclass
+class _CallerStep:
+    """A call a worker waits on while the thread waiting in :meth:`RequestRunner.run` makes it."""
+
+    fn: Callable[..., Any]
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+    done: threading.Event
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class RequestRunner:
+    """Run API calls and streams on worker threads, cancellable with Ctrl+C."""
+
+    def __init__(self, max_workers: int = 4, poll_interval: float = 0.1):
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ai-assistant",
+        )
+        # The step queue and cancel flag of the request a worker is running
+        self._request = threading.local()
+
+    def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``fn`` on a worker thread and wait for its result.
+
+        While waiting, this thread makes the calls ``fn`` hands back with
+        :meth:`on_caller_thread`.
+
+        Raises:
+            RequestCancelledError: If interrupted while waiting.
+        """
+        steps: "queue.Queue[_CallerStep]" = queue.Queue()
+        cancelled = threading.Event()
+
+        def work() -> T:
+            self._request.steps, self._request.cancelled = steps, cancelled
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._request.steps = self._request.cancelled = None
+
+        future = self._executor.submit(work)
+        try:
+            while True:
+                try:
+                    return future.result(timeout=self.poll_interval)
+                except FutureTimeoutError:
+                    pass
+                try:
+                    step = steps.get_nowait()
+                except queue.Empty:
+                    continue
+                try:
+                    step.result = step.fn(*step.args, **step.kwargs)
+                except KeyboardInterrupt:
+                    raise
+                except Exception as exc:
+                    step.error = exc
+                step.done.set()
+        except KeyboardInterrupt:
+            # Steps still waiting, or handed back later, get their default
+            cancelled.set()
+            future.cancel()
+            raise RequestCancelledError("Request cancelled.") from None
+
+    def on_caller_thread(self, fn: Callable[..., T], *args: Any, default: T, **kwargs: Any) -> T:
+        """From inside :meth:`run`, call ``fn`` on the thread waiting for the request.
+
+        Outside a request run by this runner, ``fn`` is called directly. If the
+        request is cancelled before the call is made, ``default`` is returned
+        instead.
+        """
+        steps = getattr(self._request, "steps", None)
+        if steps is None:
+            return fn(*args, **kwargs)
+        cancelled = self._request.cancelled
+        step = _CallerStep(fn, args, kwargs, threading.Event())
+        steps.put(step)
+        while not step.done.wait(self.poll_interval):
+            if cancelled.is_set():
+                return default
+        if step.error is not None:
+            raise step.error
+        return step.result
+
+    def iterate(self, factory: Callable[[], Iterable[T]]) -> Iterator[T]:
+        """Consume the iterable returned by ``factory`` on a worker thread.
+
+        Items are handed over through a queue as they arrive. If the consumer
+        is interrupted, or stops early, the worker stops at the next item.
+
+        Raises:
+            RequestCancelledError: If interrupted while waiting for the next item.
+        """
+        items: "queue.Queue[tuple]" = queue.Queue()
+        cancel = threading.Event()
+
+        def pump() -> None:
+            try:
+                iterator = iter(factory())
+                try:
+                    for item in iterator:
+                        if cancel.is_set():
+                            break
+                        items.put((_ITEM, item))
+                finally:
+                    close = getattr(iterator, "close", None)
+                    if close is not None:
+                        close()
+            except BaseException as exc:
+                items.put((_ERROR, exc))
+                return
+            items.put((_DONE, None))
+
+        self._executor.submit(pump)
+        try:
+            while True:
+                try:
+                    kind, value = items.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    continue
+                if kind == _DONE:
+                    return
+                if kind == _ERROR:
+                    raise value
+                yield value
+        except KeyboardInterrupt:
+            raise RequestCancelledError("Request cancelled.") from None
+        finally:
+            cancel.set()
+
+    def background(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "Future[Any]":
+        """Start ``fn`` without waiting; failures are kept on the returned future."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        """Stop accepting work and drop queued tasks without waiting for running ones."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,195 @@
+"""Persistent, resumable chat sessions.
+
+Each session is an append-only JSONL transcript (one message per line) in the
+session directory, next to an ``index.json`` holding per-session metadata and
+the name of the most recently used session. Resuming reads only the tail of
+the transcript needed for the context window, not the whole file.
+"""
+
+import json
+import os
+import re
+import tempfile
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from ai_cli_assistant.utils import tokens
+
+INDEX_FILENAME = "index.json"
+_TAIL_BLOCK_SIZE = 64 * 1024
+_VALID_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class SessionError(Exception):
+    """Raised when a session cannot be created or resumed."""
+
+
+def get_session_dir(config_path: Optional[str] = None) -> Path:
+    """Get the session directory, creating it if needed."""
+    path = Path(config_path or "~/.ai_assistant_sessions").expanduser()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def load_index(session_dir: Path) -> Dict[str, Any]:
+    """Load the session index, returning an empty one if it is missing or corrupt."""
+    try:
+        data = json.loads((session_dir / INDEX_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"last": None, "sessions": {}}
+    data.setdefault("last", None)
+    data.setdefault("sessions", {})
+    return data
+
+
+def _save_index(session_dir: Path, index: Dict[str, Any]) -> None:
+    fd, tmp_name = tempfile.mkstemp(dir=session_dir, prefix=".index-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_name, session_dir / INDEX_FILENAME)
+
+
+def tail_lines(path: Path, count: int) -> List[str]:
+    """Return the last ``count`` non-empty lines of a file by reading backwards."""
+    if count <= 0:
+        return []
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(_TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    lines = [line for line in data.decode("utf-8", "replace").splitlines() if line.strip()]
+    return lines[-count:]
+
+
+class ChatSession:
+    """A named chat session backed by an append-only transcript.
+
+    ``messages`` holds only the most recent ``window`` turns (a turn is one
+    user message and the assistant reply), which is what gets sent to the
+    model as context.
+    """
+
+    def __init__(
+        self,
+        session_dir: Path,
+        name: str,
+        session_id: str,
+        turn: int = 0,
+        window: int = 20,
+        messages: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.session_dir = session_dir
+        self.name = name
+        self.session_id = session_id
+        self.turn = turn
+        self.window = window
+        self.messages: Deque[Dict[str, Any]] = deque(messages or [], maxlen=window * 2)
+
+    @property
+    def transcript_path(self) -> Path:
+        return self.session_dir / f"{self.name}.jsonl"
+
+    @classmethod
+    def open(
+        cls,
+        session_dir: Path,
+        name: Optional[str] = None,
+        resume: bool = False,
+        window: int = 20,
+        model: Optional[str] = None,
+    ) -> "ChatSession":
+        """Create a session, or continue an existing one.
+
+        With ``resume`` and no ``name`` the most recently used session is
+        continued. An unknown ``name`` starts a new session with that name.
+
+        Raises:
+            SessionError: If the name is invalid or there is nothing to resume.
+        """
+        index = load_index(session_dir)
+
+        if name is None and resume:
+            name = index["last"]
+            if name is None:
+                raise SessionError("No previous session to resume.")
+        if name is None:
+            name = datetime.now().strftime("chat-%Y%m%d-%H%M%S")
+        if not _VALID_NAME.match(name):
+            raise SessionError(
+                f"Invalid session name '{name}'. Use letters, digits, '.', '_' or '-'."
+            )
+
+        meta = index["sessions"].get(name)
+        if meta is None:
+            session = cls(session_dir, name, uuid.uuid4().hex[:12], window=window)
+            now = datetime.now().isoformat()
+            index["sessions"][name] = {
+                "id": session.session_id,
+                "created": now,
+                "updated": now,
+                "model": model,
+                "turns": 0,
+            }
+        else:
+            session = cls(session_dir, name, meta["id"], turn=meta.get("turns", 0), window=window)
+            if session.transcript_path.exists():
+                for line in tail_lines(session.transcript_path, window * 2):
+                    try:
+                        session.messages.append(json.loads(line))
+                    except ValueError:
+                        continue
+
+        index["last"] = name
+        _save_index(session_dir, index)
+        return session
+
+    def add_turn(self, user: str, assistant: str, model: Optional[str] = None) -> int:
+        """Append a completed turn to the transcript and return its number."""
+        self.turn += 1
+        now = datetime.now().isoformat()
+        records = [
+            {"turn": self.turn, "role": "user", "content": user, "timestamp": now},
+            {"turn": self.turn, "role": "assistant", "content": assistant, "timestamp": now},
+        ]
+        with open(self.transcript_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.messages.extend(records)
+
+        index = load_index(self.session_dir)
+        meta = index["sessions"].setdefault(self.name, {"id": self.session_id, "created": now})
+        meta.update({"updated": now, "turns": self.turn})
+        if model:
+            meta["model"] = model
+        index["last"] = self.name
+        _save_index(self.session_dir, index)
+        return self.turn
+
+    def build_prompt(self, user_input: str, max_tokens: Optional[int] = None) -> str:
+        """Render the context window plus the new message as a single prompt.
+
+        With ``max_tokens`` the oldest messages are dropped until the estimated
+        size fits; the new message is always kept.
+        """
+        lines = [f"{msg['role']}: {msg['content']}" for msg in self.messages]
+        lines.append(f"user: {user_input}")
+
+        if max_tokens is not None:
+            budget = tokens.chars_for_tokens(max_tokens)
+            size = sum(len(line) + 1 for line in lines)
+            start = 0
+            while size > budget and start < len(lines) - 1:
+                size -= len(lines[start]) + 1
+                start += 1
+            lines = lines[start:]
+        return "\n".join(lines)
@@ -0,0 +1,203 @@
+"""Structured (JSON) responses constrained by a schema.
+
+A schema comes either from a JSON Schema file or from a pydantic model given
+as ``module:Model``. It is sent with the request so the model answers in
+JSON, and the answer is validated locally as well: with pydantic for a model,
+and with ``jsonschema`` for a schema file when the ``schema`` extra is
+installed. Without it, answers to a schema file are only checked to be JSON.
+:class:`JSONArrayParser` parses streamed output incrementally and hands back
+each top-level array element as soon as it is complete.
+"""
+
+import importlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+try:
+    import jsonschema
+except ImportError:  # pragma: no cover - exercised only without the extra
+    jsonschema = None
+
+
+class SchemaError(Exception):
+    """Raised when a schema cannot be loaded or a response does not match it."""
+
+
+@dataclass
+class ResponseSchema:
+    """A JSON schema, and the pydantic model it came from if any."""
+
+    json_schema: Dict[str, Any]
+    source: str
+    model: Optional[Type[BaseModel]] = None
+
+    def __post_init__(self) -> None:
+        self._validator: Any = None
+        if self.model is None and jsonschema is not None:
+            cls = jsonschema.validators.validator_for(self.json_schema)
+            self._validator = cls(self.json_schema)
+
+    @property
+    def validates(self) -> bool:
+        """Whether responses are checked against the schema, not only parsed as JSON."""
+        return self.model is not None or self._validator is not None
+
+    def parse(self, text: str) -> Any:
+        """Parse a complete response, validating it against the model if there is one.
+
+        Raises:
+            SchemaError: If the text is not valid JSON or fails validation.
+        """
+        try:
+            data = json.loads(text)
+        except ValueError as exc:
+            raise SchemaError(f"Response is not valid JSON: {exc}") from exc
+        return self.validate(data)
+
+    def validate(self, data: Any) -> Any:
+        """Validate already parsed data; returns it unchanged.
+
+        Raises:
+            SchemaError: If the data does not match the model or JSON Schema.
+        """
+        if self.model is not None:
+            try:
+                self.model.model_validate(data)
+            except ValidationError as exc:
+                raise SchemaError(f"Response does not match {self.source}:\n{exc}") from exc
+        elif self._validator is not None:
+            error = jsonschema.exceptions.best_match(self._validator.iter_errors(data))
+            if error is not None:
+                location = "/".join(str(part) for part in error.absolute_path) or "(root)"
+                raise SchemaError(
+                    f"Response does not match {self.source} at {location}: {error.message}"
+                )
+        return data
+
+
+def load_schema(spec: str) -> ResponseSchema:
+    """Load a schema from a JSON file path or a ``module:Model`` pydantic reference.
+
+    Raises:
+        SchemaError: If the file or model cannot be loaded.
+    """
+    path = Path(spec).expanduser()
+    if path.is_file():
+        try:
+            schema = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise SchemaError(f"Cannot read schema file {spec}: {exc}") from exc
+        if not isinstance(schema, dict):
+            raise SchemaError(f"Schema file {spec} must contain a JSON object.")
+        if jsonschema is not None:
+            try:
+                jsonschema.validators.validator_for(schema).check_schema(schema)
+            except jsonschema.SchemaError as exc:
+                raise SchemaError(
+                    f"Schema file {spec} is not a valid JSON Schema: {exc.message}"
+                ) from exc
+        return ResponseSchema(schema, source=path.name)
+
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise SchemaError(f"Schema '{spec}' is neither a file nor a module:Model reference.")
+    try:
+        model = getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError) as exc:
+        raise SchemaError(f"Cannot import {spec}: {exc}") from exc
+    if not (isinstance(model, type) and issubclass(model, BaseModel)):
+        raise SchemaError(f"{spec} is not a pydantic model.")
+    return ResponseSchema(model.model_json_schema(), source=attr, model=model)
+
+
+class JSONArrayParser:
+    """Incremental parser emitting the elements of a top-level JSON array.
+
+    Feed text as it arrives; :meth:`feed` returns the elements completed by
+    that text. Only string and bracket state is tracked, so each character is
+    looked at once and each element is decoded once, when it closes. If the
+    document is not an array, nothing is emitted until :meth:`close`.
+    """
+
+    def __init__(self) -> None:
+        self._text: List[str] = []
+        self._element: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._is_array: Optional[bool] = None
+        self.count = 0
+
+    def feed(self, text: str) -> List[Any]:
+        """Consume ``text`` and return the array elements it completed.
+
+        Raises:
+            SchemaError: If a completed element is not valid JSON.
+        """
+        self._text.append(text)
+        if self._is_array is False:
+            return []
+
+        items = []
+        for char in text:
+            if self._is_array is None:
+                if char.isspace():
+                    continue
+                self._is_array = char == "["
+                if not self._is_array:
+                    return []
+                self._depth = 1
+                continue
+
+            if self._in_string:
+                self._element.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(items)
+                    continue
+            elif char == "," and self._depth == 1:
+                self._emit(items)
+                continue
+
+            if self._depth >= 1:
+                self._element.append(char)
+        return items
+
+    def close(self) -> Any:
+        """Parse and return the whole document once the stream has ended.
+
+        Raises:
+            SchemaError: If the complete text is not valid JSON.
+        """
+        try:
+            return json.loads("".join(self._text))
+        except ValueError as exc:
+            raise SchemaError(f"Response is not valid JSON: {exc}") from exc
+
+    def _emit(self, items: List[Any]) -> None:
+        raw = "".join(self._element).strip()
+        self._element = []
+        if not raw:
+            return
+        try:
+            items.append(json.loads(raw))
+        except ValueError as exc:
+            raise SchemaError(f"Array element {self.count} is not valid JSON: {exc}") from exc
+        self.count += 1
@@ -0,0 +1,422 @@
+"""Local tools the model can call (function calling).
+
+A :class:`ToolRegistry` holds the tools enabled for a request: built-ins
+(``shell``, ``read_file``, ``http_get``) and custom Python callables declared
+in config as ``module:function``. Their declarations are sent with the request;
+when the model asks for one or more calls, they run concurrently on daemon
+threads, each with its own timeout, and all results go back in a single
+follow-up request. A call that times out is abandoned, so a hung tool cannot
+keep the process alive. HTTP goes through a replaceable :class:`HttpAdapter` so
+it can be stubbed in tests or routed elsewhere.
+
+The built-in tools act with the user's permissions on whatever the model
+chooses, and that choice can be steered by text the model has read (a fetched
+page, a context file): ``shell`` runs any command, ``read_file`` opens any file
+(keys, ``.env``) and ``http_get`` can send what was read to any host. Each call
+to them therefore needs approval: from the ``approve`` callback given to the
+registry (the CLI asks on the terminal), or from ``tools.auto_approve``.
+Without either, those calls are refused.
+"""
+
+import importlib
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from google.genai import types
+
+from ai_cli_assistant import api
+from ai_cli_assistant.config import ToolSettings
+
+
+class ToolError(Exception):
+    """Raised when a tool cannot be loaded or the tool loop does not finish."""
+
+
+class HttpAdapter:
+    """Performs ``http_get`` requests; replace with :func:`set_http_adapter`."""
+
+    def get(self, url: str, timeout: float) -> Tuple[int, str]:
+        """Fetch ``url`` and return ``(status_code, body_text)``."""
+        response = httpx.get(url, timeout=timeout, follow_redirects=True)
+        return response.status_code, response.text
+
+
+_http_adapter: HttpAdapter = HttpAdapter()
+
+
+def set_http_adapter(adapter: HttpAdapter) -> HttpAdapter:
+    """Route ``http_get`` through ``adapter``; returns the previous adapter."""
+    global _http_adapter
+    previous, _http_adapter = _http_adapter, adapter
+    return previous
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n[... {len(text) - limit} more characters truncated]"
+
+
+@dataclass
+class Tool:
+    """A function declaration and the local handler that implements it.
+
+    The handler receives the call arguments and the tool's timeout in seconds.
+    Calls to a tool with ``confirm`` set run only once approved.
+    """
+
+    declaration: types.FunctionDeclaration
+    handler: Callable[[Dict[str, Any], float], Any]
+    timeout: float
+    confirm: bool = False
+
+    @property
+    def name(self) -> str:
+        return self.declaration.name or ""
+
+
+@dataclass
+class ToolResult:
+    """The outcome of one function call."""
+
+    name: str
+    args: Dict[str, Any]
+    call_id: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    def to_part(self) -> types.Part:
+        """The function response sent back to the model."""
+        response = {"error": self.error} if self.error else {"result": self.result}
+        return types.Part(
+            function_response=types.FunctionResponse(
+                id=self.call_id, name=self.name, response=response
+            )
+        )
+
+
+def _kill_group(process: subprocess.Popen) -> None:
+    """Kill a process started in its own session, with everything it spawned."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+# Built-in tools that need approval for each call: together, reading local files
+# and fetching URLs could leak secrets as easily as a shell command
+CONFIRMED_TOOLS = frozenset({"shell", "read_file", "http_get"})
+
+
+def _builtin_tools(settings: ToolSettings) -> Dict[str, Tuple[types.FunctionDeclaration, Any]]:
+    limit = settings.max_output_chars
+
+    def shell(args: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        # A session of its own, so a timeout kills the command's children too
+        with subprocess.Popen(
+            args["command"],
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        ) as process:
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill_group(process)
+                raise
+        return {
+            "exit_code": process.returncode,
+            "stdout": _truncate(stdout, limit),
+            "stderr": _truncate(stderr, limit),
+        }
+
+    def read_file(args: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        path = Path(args["path"]).expanduser()
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read(limit + 1)
+        return {"path": str(path), "content": _truncate(text, limit)}
+
+    def http_get(args: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        status, body = _http_adapter.get(args["url"], timeout)
+        return {"status": status, "body": _truncate(body, limit)}
+
+    def declaration(name: str, description: str, **properties: str) -> types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=name,
+            description=description,
+            parameters_json_schema={
+                "type": "object",
+                "properties": {
+                    key: {"type": "string", "description": text} for key, text in properties.items()
+                },
+                "required": list(properties),
+            },
+        )
+
+    return {
+        "shell": (
+            declaration(
+                "shell",
+                "Run a shell command on the user's machine and return its exit code and output.",
+                command="The command line to run.",
+            ),
+            shell,
+        ),
+        "read_file": (
+            declaration(
+                "read_file",
+                "Read a text file from the user's machine.",
+                path="Path of the file to read.",
+            ),
+            read_file,
+        ),
+        "http_get": (
+            declaration(
+                "http_get",
+                "Fetch a URL with HTTP GET and return the status code and body.",
+                url="The URL to fetch.",
+            ),
+            http_get,
+        ),
+    }
+
+
+def _load_custom(name: str, spec: str) -> Tuple[types.FunctionDeclaration, Any]:
+    module_name, _, attr = spec.partition(":")
+    try:
+        func = getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError, ValueError) as exc:
+        raise ToolError(f"Cannot import tool '{name}' from {spec}: {exc}") from exc
+    if not callable(func):
+        raise ToolError(f"Tool '{name}' ({spec}) is not callable.")
+    try:
+        declaration = types.FunctionDeclaration.from_callable_with_api_option(callable=func)
+    except Exception as exc:
+        raise ToolError(f"Cannot describe tool '{name}' ({spec}): {exc}") from exc
+    declaration.name = name
+    return declaration, lambda args, timeout: func(**args)
+
+
+class ToolRegistry:
+    """The tools offered for a request, and how their calls are run.
+
+    ``approve`` is asked about each call to a tool with ``confirm`` set, before
+    it runs; with ``auto_approve`` those calls run without asking.
+    """
+
+    def __init__(
+        self,
+        tools: List[Tool],
+        workers: int = 8,
+        approve: Optional[Callable[[ToolResult], bool]] = None,
+        auto_approve: bool = False,
+    ):
+        self.tools = {tool.name: tool for tool in tools}
+        self.workers = workers
+        self.approve = approve
+        self.auto_approve = auto_approve
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: ToolSettings,
+        names: List[str],
+        approve: Optional[Callable[[ToolResult], bool]] = None,
+    ) -> "ToolRegistry":
+        """Build a registry with the named built-in and custom tools.
+
+        Raises:
+            ToolError: If a name is unknown or a custom tool cannot be loaded.
+        """
+        builtins = _builtin_tools(settings)
+        tools = []
+        for name in dict.fromkeys(names):
+            if name in settings.custom:
+                declaration, handler = _load_custom(name, settings.custom[name])
+                confirm = False
+            elif name in builtins:
+                declaration, handler = builtins[name]
+                confirm = name in CONFIRMED_TOOLS
+            else:
+                available = ", ".join(sorted({*builtins, *settings.custom}))
+                raise ToolError(f"Unknown tool '{name}'. Available: {available}")
+            timeout = settings.timeouts.get(name, settings.timeout)
+            tools.append(Tool(declaration, handler, timeout, confirm))
+        return cls(
+            tools,
+            workers=settings.workers,
+            approve=approve,
+            auto_approve=settings.auto_approve,
+        )
+
+    def declarations(self) -> List[types.Tool]:
+        """The ``tools`` entry for the generation config."""
+        return [
+            types.Tool(function_declarations=[tool.declaration for tool in self.tools.values()])
+        ]
+
+    def _refusal(self, result: ToolResult) -> Optional[str]:
+        """Why a call to a tool that needs approval may not run, if it may not."""
+        if self.auto_approve:
+            return None
+        if self.approve is None:
+            return (
+                f"'{result.name}' calls need the user's approval, and none could be asked "
+                "for. Set tools.auto_approve to allow them."
+            )
+        if not self.approve(result):
+            return "The user declined this call."
+        return None
+
+    def execute(self, calls: List[types.FunctionCall]) -> List[ToolResult]:
+        """Run the calls concurrently and return their results in call order.
+
+        Calls that need approval are checked first, one at a time. Up to
+        ``workers`` calls run at once, each on a daemon thread; further calls
+        wait for a slot, and a call's timeout starts when it does. A call that
+        outlives its timeout is reported as an error and abandoned, freeing
+        its slot: the thread does not keep the process alive.
+        """
+        results = [
+            ToolResult(name=call.name or "", args=dict(call.args or {}), call_id=call.id)
+            for call in calls
+        ]
+        runnable: List[Tuple[ToolResult, Tool]] = []
+        for result in results:
+            tool = self.tools.get(result.name)
+            if tool is None:
+                result.error = f"Unknown tool '{result.name}'."
+            elif tool.confirm and (refusal := self._refusal(result)) is not None:
+                result.error = refusal
+            else:
+                runnable.append((result, tool))
+
+        # At most ``workers`` calls count as running; each one's clock starts when
+        # it does, and a call that is abandoned frees its slot for the next
+        queued = deque(range(len(runnable)))
+        running: Dict[int, Tuple[float, float]] = {}  # index -> (started, deadline)
+        outcomes: Dict[int, Tuple[Any, Optional[BaseException]]] = {}
+        finished: "queue.Queue[int]" = queue.Queue()
+
+        def run(index: int, tool: Tool, args: Dict[str, Any]) -> None:
+            try:
+                outcomes[index] = (tool.handler(args, tool.timeout), None)
+            except BaseException as exc:
+                outcomes[index] = (None, exc)
+            finished.put(index)
+
+        def settle(index: int) -> None:
+            result, tool = runnable[index]
+            started, _ = running.pop(index)
+            outcome = outcomes.get(index)
+            if outcome is None or isinstance(outcome[1], subprocess.TimeoutExpired):
+                result.error = f"Timed out after {tool.timeout:g}s."
+            elif outcome[1] is not None:
+                result.error = f"{type(outcome[1]).__name__}: {outcome[1]}"
+            else:
+                result.result = outcome[0]
+            result.elapsed = time.monotonic() - started
+
+        while queued or running:
+            while queued and len(running) < max(1, self.workers):
+                index = queued.popleft()
+                result, tool = runnable[index]
+                thread = threading.Thread(
+                    target=run,
+                    args=(index, tool, result.args),
+                    name=f"tool-{tool.name}",
+                    daemon=True,
+                )
+                try:
+                    thread.start()
+                except RuntimeError as exc:
+                    result.error = f"Not started: {exc}."
+                    continue
+                now = time.monotonic()
+                running[index] = (now, now + tool.timeout)
+            if not running:
+                continue
+            due = min(deadline for _, deadline in running.values())
+            try:
+                index = finished.get(timeout=max(0.0, due - time.monotonic()))
+            except queue.Empty:
+                now = time.monotonic()
+                for index in [i for i, (_, deadline) in running.items() if deadline <= now]:
+                    settle(index)
+            else:
+                # Calls abandoned earlier may still report in; they were settled then
+                if index in running:
+                    settle(index)
+        return results
+
+
+def run_with_tools(
+    client: Any,
+    model: str,
+    prompt: str,
+    system_prompt: Optional[str],
+    temperature: Optional[float],
+    registry: ToolRegistry,
+    max_rounds: int = 8,
+    on_result: Optional[Callable[[ToolResult], None]] = None,
+    attachments: Optional[List[Any]] = None,
+    **request_options: Any,
+) -> Any:
+    """Call the model, running requested tools until it answers without calls.
+
+    Each round sends the whole exchange so far: the prompt, every function
+    call turn and the function responses for it.
+
+    Raises:
+        ToolError: If the model still requests tools after ``max_rounds`` rounds.
+    """
+    contents: List[Any] = [
+        types.Content(
+            role="user",
+            parts=[*(attachments or []), types.Part.from_text(text=prompt)],
+        )
+    ]
+    for _ in range(max_rounds):
+        response = api.call_api_with_retry(
+            client,
+            model,
+            contents,
+            system_prompt,
+            temperature,
+            tools=registry.declarations(),
+            **request_options,
+        )
+        calls = response.function_calls
+        if not calls:
+            return response
+
+        contents.append(response.candidates[0].content)
+        results = registry.execute(calls)
+        if on_result is not None:
+            for result in results:
+                on_result(result)
+        contents.append(types.Content(role="user", parts=[r.to_part() for r in results]))
+
+    raise ToolError(f"The model was still calling tools after {max_rounds} rounds.")
+
+
+def describe_call(result: ToolResult) -> str:
+    """One-line summary of a call for display."""
+    args = ", ".join(f"{key}={value!r}" for key, value in result.args.items())
+    outcome = f"error: {result.error}" if result.error else "ok"
+    return f"{result.name}({args}) → {outcome} ({result.elapsed:.2f}s)"
@@ -1,11 +1,22 @@
 """User interface utilities using Rich."""
 
-from typing import Optional
+from typing import Any, Optional, Union
 
 from rich.console import Console
+from rich.markdown import Markdown
 from rich.panel import Panel
 
+from ai_cli_assistant import render
+
 console = Console()
+_stdout_console = console
+_stderr_console = Console(stderr=True)
+
+
+def use_stderr(enabled: bool = True) -> None:
+    """Route Rich output to stderr so stdout carries only machine-readable output."""
+    global console
+    console = Console(stderr=True) if enabled else _stdout_console
 
 
 def print_error(title: str, message: str) -> None:
@@ -30,17 +41,52 @@ def print_warning(title: str, message: str) -> None:
     )
 
 
-def print_response(model: str, text: str) -> None:
-    """Print the AI response in a green panel."""
+def print_notice(message: str) -> None:
+    """Print a one-line warning to stderr, which never carries machine-readable output."""
+    _stderr_console.print(f"[yellow]Warning:[/] {message}")
+
+
+def print_response(
+    model: str,
+    text: str,
+    subtitle: Optional[str] = None,
+    border_style: str = "green",
+    markdown: bool = False,
+    code_theme: str = render.DEFAULT_CODE_THEME,
+) -> None:
+    """Print the AI response in a green panel, optionally rendered as Markdown."""
     console.print(
         Panel(
-            text,
+            Markdown(text, code_theme=code_theme) if markdown else text,
             title=f"Model: {model}",
-            border_style="green",
+            subtitle=subtitle,
+            border_style=border_style,
         )
     )
 
 
 def print_stream(text: str) -> None:
     """Print streaming text."""
-    console.print(text, end="")
+    console.print(text, end="", markup=False, highlight=False)
+
+
+class _PlainStream:
+    """Stream printer that writes chunks as they arrive."""
+
+    def __enter__(self) -> "_PlainStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def feed(self, text: str) -> None:
+        print_stream(text)
+
+
+def stream_printer(
+    markdown: bool, code_theme: str = render.DEFAULT_CODE_THEME
+) -> Union[render.LiveMarkdown, _PlainStream]:
+    """Printer for a streamed reply: live Markdown, or raw text as it arrives."""
+    if markdown:
+        return render.LiveMarkdown(console, code_theme)
+    return _PlainStream()
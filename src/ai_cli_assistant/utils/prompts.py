@@ -1,15 +1,184 @@
 """Utilities for loading and managing prompts."""
 
+import os
+from dataclasses import dataclass
 from pathlib import Path
+from string import Template
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from ai_cli_assistant import ingest
+
+# Go up two levels from utils/prompts.py to ai_cli_assistant/
+PACKAGE_PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+
+# Prefix marking a variable value as a file to read, e.g. ``-V code=@main.py``
+FILE_VALUE_PREFIX = "@"
+
+_file_cache: Dict[Path, Tuple[int, str]] = {}
+
+
+class TemplateError(Exception):
+    """Raised when a template cannot be found or rendered."""
+
+
+def _read_cached(path: Path) -> Optional[str]:
+    """Read a prompt file, reusing the cached text while its mtime is unchanged."""
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _file_cache.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+
+    text = path.read_text(encoding="utf-8").strip()
+    _file_cache[path] = (mtime_ns, text)
+    return text
 
 
 def load_system_prompt() -> str:
     """Load the base system prompt from file."""
-    # Assumes prompts are installed relative to the package root
-    # Go up two levels from utils/prompts.py to ai_cli_assistant/
-    package_root = Path(__file__).parent.parent
-    prompt_path = package_root / "prompts" / "base_prompt.txt"
-    
-    if prompt_path.exists():
-        return prompt_path.read_text(encoding="utf-8").strip()
-    return ""
+    return _read_cached(PACKAGE_PROMPTS_DIR / "base_prompt.txt") or ""
+
+
+@dataclass
+class PromptTemplate:
+    """A named prompt template compiled with :class:`string.Template`."""
+
+    name: str
+    path: Path
+    mtime_ns: int
+    template: Template
+
+    @property
+    def variables(self) -> List[str]:
+        """Names of the ``$variables`` used by the template."""
+        return self.template.get_identifiers()
+
+    def render(self, variables: Optional[Mapping[str, str]] = None) -> str:
+        """Substitute variables into the template.
+
+        Raises:
+            TemplateError: If a variable used by the template was not given.
+        """
+        values = dict(variables or {})
+        missing = [name for name in self.variables if name not in values]
+        if missing:
+            raise TemplateError(
+                f"Template '{self.name}' needs variables: {', '.join(missing)} "
+                "(pass them with -V name=value)."
+            )
+        try:
+            return self.template.substitute(values)
+        except ValueError as exc:
+            raise TemplateError(f"Template '{self.name}' is malformed: {exc}") from exc
+
+
+class TemplateRegistry:
+    """Named prompt templates discovered from the package and user directories.
+
+    Templates are ``*.txt`` files; the file stem is the template name. Later
+    directories win on name clashes, so user templates can shadow packaged
+    ones. Each template is compiled once and recompiled only when its file
+    changes, so a long-running process pays the parsing cost a single time.
+    """
+
+    def __init__(self, directories: Iterable[Path]):
+        self.directories = [Path(d).expanduser() for d in directories]
+        self._compiled: Dict[str, PromptTemplate] = {}
+
+    def paths(self) -> Dict[str, Path]:
+        """Map every available template name to its file."""
+        found: Dict[str, Path] = {}
+        for directory in self.directories:
+            if directory.is_dir():
+                for path in sorted(directory.glob("*.txt")):
+                    found[path.stem] = path
+        return found
+
+    def resolve(self, name: str) -> Path:
+        """Find a template by exact name or by a unique ``_``-separated part.
+
+        ``review`` matches ``code_review`` as long as no other template also
+        contains a ``review`` part.
+
+        Raises:
+            TemplateError: If no template, or more than one, matches.
+        """
+        paths = self.paths()
+        if name in paths:
+            return paths[name]
+
+        matches = [stem for stem in paths if name in stem.split("_")]
+        if len(matches) == 1:
+            return paths[matches[0]]
+        if matches:
+            raise TemplateError(
+                f"Template '{name}' is ambiguous: {', '.join(sorted(matches))}."
+            )
+        available = ", ".join(sorted(paths)) or "none"
+        raise TemplateError(f"Template '{name}' not found. Available: {available}.")
+
+    def get(self, name: str) -> PromptTemplate:
+        """Return the compiled template, recompiling only if the file changed."""
+        path = self.resolve(name)
+        mtime_ns = path.stat().st_mtime_ns
+
+        compiled = self._compiled.get(path.stem)
+        if compiled and compiled.path == path and compiled.mtime_ns == mtime_ns:
+            return compiled
+
+        compiled = PromptTemplate(
+            name=path.stem,
+            path=path,
+            mtime_ns=mtime_ns,
+            template=Template(_read_cached(path) or ""),
+        )
+        self._compiled[path.stem] = compiled
+        return compiled
+
+    def render(self, name: str, variables: Optional[Mapping[str, str]] = None) -> str:
+        """Render a named template."""
+        return self.get(name).render(variables)
+
+
+_registries: Dict[Tuple[str, ...], TemplateRegistry] = {}
+
+
+def get_template_registry(extra_dirs: Iterable[str] = ()) -> TemplateRegistry:
+    """Get the process-wide registry for the packaged and given template directories."""
+    directories = (
+        str(PACKAGE_PROMPTS_DIR),
+        str(PACKAGE_PROMPTS_DIR / "examples"),
+        *(os.path.expanduser(d) for d in extra_dirs),
+    )
+    if directories not in _registries:
+        _registries[directories] = TemplateRegistry(Path(d) for d in directories)
+    return _registries[directories]
+
+
+def parse_variables(
+    assignments: Iterable[str],
+    max_file_bytes: int = ingest.DEFAULT_MAX_PROMPT_BYTES,
+) -> Dict[str, str]:
+    """Parse ``name=value`` pairs; ``name=@path`` substitutes a file's contents.
+
+    Files are read through :func:`ingest.read_file`, so their contents are
+    decoded once from a memory map straight into the substitution value.
+
+    Raises:
+        TemplateError: If an assignment is malformed or a file is missing.
+    """
+    variables: Dict[str, str] = {}
+    for assignment in assignments:
+        name, sep, value = assignment.partition("=")
+        if not sep or not name.isidentifier():
+            raise TemplateError(f"Invalid variable '{assignment}', expected name=value.")
+        if value.startswith(FILE_VALUE_PREFIX):
+            try:
+                value = ingest.read_file(Path(value[1:]), max_file_bytes).text
+            except ingest.PromptInputError as exc:
+                raise TemplateError(str(exc)) from exc
+        variables[name] = value
+    return variables
@@ -0,0 +1,14 @@
+"""Cheap token estimates for budgeting without a network round trip."""
+
+# Rough average for English text and code with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in ``text``."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def chars_for_tokens(tokens: int) -> int:
+    """Approximate number of characters that fit in ``tokens`` tokens."""
+    return max(0, tokens) * CHARS_PER_TOKEN
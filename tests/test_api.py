@@ -1,6 +1,8 @@
 import pytest
 from unittest.mock import Mock, MagicMock
-from ai_cli_assistant import api
+from google.genai import errors as genai_errors
+from ai_cli_assistant import api, resilience
+from ai_cli_assistant.config import HttpSettings
 
 class DummyClient:
     """Lightweight stand-in for the real SDK client."""
@@ -13,6 +15,13 @@ def mock_client():
     client.models.generate_content.return_value = Mock(text="Response text")
     return client
 
+@pytest.fixture(autouse=True)
+def reset_resilience(monkeypatch):
+    monkeypatch.setattr(api.call_api_with_retry.retry, "sleep", lambda seconds: None)
+    resilience.reset()
+    yield
+    resilience.reset()
+
 @pytest.fixture(autouse=True)
 def disable_dotenv(monkeypatch):
     """Prevent .env contents from affecting API key resolution in tests."""
@@ -51,6 +60,11 @@ def test_call_api_with_config(mock_client):
     assert kwargs["config"]["system_instruction"] == "sys"
     assert kwargs["config"]["temperature"] == 0.5
 
+def test_call_api_with_attachments(mock_client):
+    part = Mock()
+    api.call_api_with_retry(mock_client, "model", "prompt", attachments=[part])
+    assert mock_client.models.generate_content.call_args.kwargs["contents"] == [part, "prompt"]
+
 def test_handle_response_success():
     mock_response = Mock(text="  Hello  ")
     result = api.handle_response(mock_response, "model")
@@ -85,3 +99,149 @@ def test_handle_response_empty():
     with pytest.raises(api.APIError) as exc:
         api.handle_response(mock_response, "model")
     assert "No text returned" in str(exc.value)
+
+def test_parse_response_fast_path_with_sdk_types():
+    from google.genai import types
+
+    response = types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=[types.Part(text=" Hi ")]),
+                finish_reason=types.FinishReason.STOP,
+                safety_ratings=[
+                    types.SafetyRating(
+                        category=types.HarmCategory.HARM_CATEGORY_HARASSMENT,
+                        probability=types.HarmProbability.NEGLIGIBLE,
+                    )
+                ],
+            )
+        ],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(total_token_count=7),
+    )
+
+    result = api.parse_response(response, "model", latency=0.5)
+    assert result.text == "Hi"
+    assert result.finish_reason == "STOP"
+    assert result.safety_ratings == [
+        api.SafetyRating("HARM_CATEGORY_HARASSMENT", "NEGLIGIBLE")
+    ]
+    assert result.usage == {"total_token_count": 7}
+    assert result.latency == 0.5
+
+def test_safety_error_is_structured():
+    mock_response = Mock(text=None)
+    mock_response.prompt_feedback.block_reason = "SAFETY"
+    mock_response.prompt_feedback.safety_ratings = [
+        Mock(category="HARM_CATEGORY_HATE_SPEECH", probability="HIGH")
+    ]
+    candidate = Mock(finish_reason="SAFETY", safety_ratings=[])
+    mock_response.candidates = [candidate]
+
+    with pytest.raises(api.SafetyError) as exc:
+        api.parse_response(mock_response, "model")
+    blocks = exc.value.blocks
+    assert [(b.source, b.reason, b.candidate_index) for b in blocks] == [
+        ("prompt", "SAFETY", None),
+        ("candidate", "SAFETY", 1),
+    ]
+    assert exc.value.categories == ["HARM_CATEGORY_HATE_SPEECH"]
+    assert "Candidate 1 blocked for safety" in str(exc.value)
+
+def test_stream_with_retry_reconnects_before_first_token(mock_client, monkeypatch):
+    monkeypatch.setattr(api.time, "sleep", lambda seconds: None)
+
+    def flaky_stream(**kwargs):
+        if mock_client.models.generate_content_stream.call_count == 1:
+            raise ConnectionError("reset")
+        return iter([Mock(text="Hi", usage_metadata=None)])
+
+    mock_client.models.generate_content_stream.side_effect = flaky_stream
+    stats = api.StreamStats()
+    chunks = list(api.stream_with_retry(mock_client, "model", "prompt", stats=stats))
+
+    assert [c.text for c in chunks] == ["Hi"]
+    assert mock_client.models.generate_content_stream.call_count == 2
+    assert stats.ttft is not None
+
+def test_stream_with_retry_surfaces_partial_output(mock_client):
+    def broken_stream():
+        yield Mock(text="partial ", usage_metadata=None)
+        raise ConnectionError("reset")
+
+    mock_client.models.generate_content_stream.return_value = broken_stream()
+
+    with pytest.raises(api.StreamInterruptedError) as exc:
+        list(api.stream_with_retry(mock_client, "model", "prompt"))
+    assert exc.value.partial_text == "partial "
+    assert mock_client.models.generate_content_stream.call_count == 1
+
+def test_build_client_with_http_settings(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    captured = {}
+
+    def fake_client(**kwargs):
+        captured.update(kwargs)
+        return DummyClient()
+
+    monkeypatch.setattr(api.genai, "Client", fake_client)
+    api.build_client(HttpSettings(timeout=30, max_connections=5, proxy="http://proxy:8080"))
+
+    options = captured["http_options"]
+    assert options.timeout == 30000
+    assert options.client_args["limits"].max_connections == 5
+    assert options.client_args["proxy"] == "http://proxy:8080"
+
+def test_http2_requires_h2(monkeypatch):
+    monkeypatch.setattr(api.importlib.util, "find_spec", lambda name: None)
+    options = api.build_http_options(HttpSettings(http2=True))
+    assert options.client_args["http2"] is False
+
+def test_get_client_is_shared(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(api.genai, "Client", lambda **kwargs: DummyClient())
+    api.reset_client()
+
+    first = api.get_client(HttpSettings())
+    assert api.get_client(HttpSettings()) is first
+    assert api.get_client(HttpSettings(max_connections=1)) is not first
+    api.reset_client()
+
+def test_call_api_retries_transient_errors(mock_client):
+    mock_client.models.generate_content.side_effect = [
+        ConnectionError("reset"),
+        Mock(text="Recovered"),
+    ]
+    response = api.call_api_with_retry(mock_client, "model", "prompt")
+    assert response.text == "Recovered"
+    assert mock_client.models.generate_content.call_count == 2
+
+def test_call_api_does_not_retry_fatal_errors(mock_client):
+    error = genai_errors.ClientError(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT"}})
+    mock_client.models.generate_content.side_effect = error
+    with pytest.raises(genai_errors.ClientError):
+        api.call_api_with_retry(mock_client, "model", "prompt")
+    assert mock_client.models.generate_content.call_count == 1
+
+def test_call_api_fails_fast_when_circuit_open(mock_client):
+    breaker = resilience.get_breaker("model")
+    for _ in range(breaker.threshold):
+        breaker.record_failure(resilience.ErrorKind.RETRYABLE)
+    with pytest.raises(resilience.CircuitOpenError):
+        api.call_api_with_retry(mock_client, "model", "prompt")
+    mock_client.models.generate_content.assert_not_called()
+
+def test_build_client_with_key_pool(monkeypatch):
+    from ai_cli_assistant import keypool
+
+    monkeypatch.setenv("GEMINI_API_KEYS", "key-aaaa, key-bbbb,key-aaaa")
+    keys = []
+
+    def fake_client(api_key, **kwargs):
+        keys.append(api_key)
+        return Mock()
+
+    monkeypatch.setattr(api.genai, "Client", fake_client)
+    client = api.build_client()
+    assert isinstance(client, keypool.PooledClient)
+    assert keys == ["key-aaaa", "key-bbbb"]
+    assert [state.label for state in client.pool.keys] == ["…aaaa", "…bbbb"]
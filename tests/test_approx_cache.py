@@ -0,0 +1,93 @@
+from ai_cli_assistant import approx_cache
+from ai_cli_assistant import history as history_module
+
+SETTINGS = approx_cache.settings_digest(None, 0.7)
+
+
+def log(history_file, prompt, response, model="gemini-2.5-flash", **kwargs):
+    kwargs.setdefault("settings_digest", SETTINGS)
+    history_module.log_conversation(prompt, response, model, history_file=history_file, **kwargs)
+
+
+def test_normalize_masks_volatile_tokens():
+    a = approx_cache.normalize_prompt(
+        "Summarize  the log from 2025-01-02T10:11:12Z\nrun 3f9a2c1d7e"
+    )
+    b = approx_cache.normalize_prompt("summarize the log from 2025-03-04 09:00:00 run 77aa00bb11")
+    assert a == b
+
+
+def test_simhash_similarity():
+    base = "Explain the difference between a process and a thread in operating systems."
+    near = "Explain the difference between a process and a thread in operating systems!"
+    other = "Write a haiku about autumn leaves falling on a quiet pond."
+
+    assert approx_cache.similarity(approx_cache.simhash(base), approx_cache.simhash(base)) == 1.0
+    near_score = approx_cache.similarity(approx_cache.simhash(base), approx_cache.simhash(near))
+    other_score = approx_cache.similarity(approx_cache.simhash(base), approx_cache.simhash(other))
+    assert near_score > other_score
+    assert near_score >= 0.85
+
+
+def test_index_finds_near_duplicates(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    log(history_file, "What time is it in Tokyo at 10:30 UTC?", "19:30 JST")
+    log(history_file, "Write a haiku about autumn", "Leaves drift...")
+    log(history_file, "chat context", "reply", session_id="abc", turn=1)
+
+    index = approx_cache.PromptIndex.load(history_file)
+    assert len(index.records) == 2
+
+    match = index.find("what time is it in tokyo at 11:45 utc?", "gemini-2.5-flash", SETTINGS, 0.9)
+    assert match is not None
+    assert match.entry.full_response() == "19:30 JST"
+    assert (
+        index.find("What time is it in Tokyo at 10:30 UTC?", "other-model", SETTINGS, 0.5) is None
+    )
+
+
+def test_index_requires_same_settings(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    prompt = "Translate the release notes for version 2.1"
+    log(history_file, prompt, "translated", settings_digest=approx_cache.settings_digest("tr", 0.7))
+    log(history_file, prompt, "no settings", settings_digest=None)
+    index = approx_cache.PromptIndex.load(history_file)
+
+    model = "gemini-2.5-flash"
+    reviewer = approx_cache.settings_digest("Review this", 0.7)
+    assert index.find(prompt, model, reviewer, 0.5) is None
+    assert index.find(prompt, model, approx_cache.settings_digest("tr", 0.2), 0.5) is None
+    match = index.find(prompt, model, approx_cache.settings_digest("tr", 0.7), 0.5)
+    assert match.entry.full_response() == "translated"
+
+
+def test_index_updates_incrementally(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    log(history_file, "first prompt about caching", "one")
+    first = approx_cache.PromptIndex.load(history_file)
+    offset = first.offset
+
+    log(history_file, "second prompt about indexing", "two")
+    second = approx_cache.PromptIndex.load(history_file)
+    assert second.offset > offset
+    assert [record[3] for record in second.records][0] == 0
+    assert len(second.records) == 2
+
+
+def test_index_resets_after_clear(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    log(history_file, "a prompt that will be cleared", "gone")
+    approx_cache.PromptIndex.load(history_file)
+    assert approx_cache.get_index_path(history_file).exists()
+
+    history_module.clear_history(history_file)
+    assert not approx_cache.get_index_path(history_file).exists()
+    assert approx_cache.PromptIndex.load(history_file).records == []
+
+
+def test_index_window(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    for i in range(5):
+        log(history_file, f"prompt number {i} " * 3, str(i))
+    index = approx_cache.PromptIndex.load(history_file, window=2)
+    assert len(index.records) == 2
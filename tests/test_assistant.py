@@ -1,3 +1,5 @@
+from unittest.mock import Mock
+
 import pytest
 import typer
 
@@ -59,3 +61,126 @@ def test_build_client_raises_error_when_no_keys_found(monkeypatch):
         api.build_client()
 
     assert "GEMINI_API_KEY" in str(excinfo.value)
+
+
+def make_session(tmp_path, **overrides):
+    from ai_cli_assistant import AssistantSession
+    from ai_cli_assistant.config import AssistantConfig
+
+    config = AssistantConfig(
+        history_file=str(tmp_path / "history.jsonl"),
+        session_dir=str(tmp_path / "sessions"),
+        **overrides,
+    )
+    client = Mock()
+    client.models.generate_content.return_value = Mock(
+        text="Hi there", usage_metadata=None, function_calls=None
+    )
+    client.models.generate_content_stream.side_effect = lambda **kwargs: iter(
+        [Mock(text="Hel", usage_metadata=None), Mock(text="lo", usage_metadata=None)]
+    )
+    return AssistantSession(config, system_prompt="Be brief.", client=client)
+
+
+def test_session_is_exported_lazily():
+    import ai_cli_assistant
+    from ai_cli_assistant import assistant
+
+    assert ai_cli_assistant.AssistantSession is assistant.AssistantSession
+    with pytest.raises(AttributeError):
+        ai_cli_assistant.NoSuchThing
+
+
+def test_session_ask_logs_history(tmp_path):
+    from ai_cli_assistant import history
+
+    session = make_session(tmp_path)
+    reply = session.ask("Hello")
+
+    assert reply.text == "Hi there" and reply.model == session.model
+    assert reply.latency is not None and reply.latency >= 0
+    kwargs = session.client.models.generate_content.call_args.kwargs
+    assert kwargs["config"]["system_instruction"] == "Be brief."
+    entries = history.load_history(str(tmp_path / "history.jsonl"))
+    assert [(e.prompt, e.response) for e in entries] == [("Hello", "Hi there")]
+
+    session.ask("Again", history=False)
+    assert len(history.load_history(str(tmp_path / "history.jsonl"))) == 1
+
+
+def test_session_is_safe_to_share_between_threads(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from ai_cli_assistant import history
+
+    session = make_session(tmp_path)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        replies = list(pool.map(lambda i: session.ask(f"q{i}"), range(32)))
+
+    assert all(reply.text == "Hi there" for reply in replies)
+    entries = history.load_history(str(tmp_path / "history.jsonl"))
+    assert sorted(e.prompt for e in entries) == sorted(f"q{i}" for i in range(32))
+
+
+def test_session_stream_and_chat(tmp_path):
+    session = make_session(tmp_path)
+    stream = session.stream("Hello", history=False)
+    assert list(stream) == ["Hel", "lo"]
+    assert stream.text == "Hello" and stream.finished
+
+    chat = session.open_chat("demo")
+    assert session.chat("First", chat).turn == 1
+    stream = session.chat_stream("Second", chat)
+    assert "".join(stream) == "Hello" and stream.turn == 2
+    prompt = session.client.models.generate_content_stream.call_args.kwargs["contents"]
+    assert prompt == "user: First\nassistant: Hi there\nuser: Second"
+
+
+def test_session_async_methods(tmp_path):
+    import asyncio
+
+    session = make_session(tmp_path, enable_history=False)
+
+    async def run():
+        replies = await asyncio.gather(*(session.aask(f"q{i}") for i in range(4)))
+        chunks = [text async for text in session.astream("Hello")]
+        reply = await session.achat("Hi")
+        return replies, chunks, reply
+
+    replies, chunks, reply = asyncio.run(run())
+    assert [r.text for r in replies] == ["Hi there"] * 4
+    assert chunks == ["Hel", "lo"]
+    assert reply.turn == 1
+
+
+def test_session_attach_uploads_without_holding_the_lock(tmp_path, monkeypatch):
+    import threading
+
+    from google.genai import types
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    path = tmp_path / "notes.txt"
+    path.write_text("hello", encoding="utf-8")
+    session = make_session(tmp_path)
+    free_during_upload = []
+
+    def upload(file, config):
+        # Another thread can still use the session while the upload runs
+        def use_session():
+            acquired = session._lock.acquire(timeout=1)
+            free_during_upload.append(acquired)
+            if acquired:
+                session._lock.release()
+
+        worker = threading.Thread(target=use_session)
+        worker.start()
+        worker.join()
+        return types.File(name="files/n", uri="https://example.test/files/n", state="ACTIVE")
+
+    session.client.files.upload.side_effect = upload
+    first = session.attach(path)
+    assert first.uploaded and free_during_upload == [True]
+
+    second = session.attach(path)
+    assert not second.uploaded and second.handle == first.handle
+    assert session.client.files.upload.call_count == 1
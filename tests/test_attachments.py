@@ -0,0 +1,126 @@
+import io
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+from google.genai import types
+
+from ai_cli_assistant import attachments
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.7 " + b"x" * 5000)
+    return path
+
+
+def uploaded_file(name="files/abc", state="ACTIVE", expires_in=timedelta(hours=48)):
+    return types.File(
+        name=name,
+        uri=f"https://example.test/{name}",
+        mime_type="application/pdf",
+        state=state,
+        expiration_time=datetime.now(timezone.utc) + expires_in,
+    )
+
+
+@pytest.fixture
+def client():
+    client = Mock()
+    seen = []
+
+    def upload(file, config):
+        assert isinstance(file, io.BufferedReader)
+        seen.append(config.mime_type)
+        return uploaded_file()
+
+    client.files.upload.side_effect = upload
+    client.seen_mime_types = seen
+    return client
+
+
+def test_guess_mime_type():
+    assert attachments.guess_mime_type(Path("a.PDF")) == "application/pdf"
+    assert attachments.guess_mime_type(Path("notes.md")) == "text/markdown"
+    assert attachments.guess_mime_type(Path("blob.unknownext")) == "application/octet-stream"
+
+
+def test_upload_once_and_reuse_across_runs(client, pdf):
+    cache = attachments.UploadCache.load()
+    first = attachments.resolve(client, pdf, cache)
+    cache.save()
+    assert first.uploaded
+    assert client.seen_mime_types == ["application/pdf"]
+
+    cache = attachments.UploadCache.load()
+    second = attachments.resolve(client, pdf, cache)
+    assert not second.uploaded
+    assert second.handle.uri == first.handle.uri
+    assert client.files.upload.call_count == 1
+
+    part = second.handle.to_part()
+    assert part.file_data.file_uri == first.handle.uri
+
+
+def test_same_content_at_another_path_is_reused(client, pdf, tmp_path):
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(pdf.read_bytes())
+    cache = attachments.UploadCache.load()
+    attachments.resolve(client, pdf, cache)
+    assert not attachments.resolve(client, copy, cache).uploaded
+
+
+def test_expiring_handle_is_uploaded_again(client, pdf):
+    cache = attachments.UploadCache.load()
+    client.files.upload.side_effect = None
+    client.files.upload.return_value = uploaded_file(expires_in=timedelta(minutes=5))
+    attachments.resolve(client, pdf, cache)
+    assert attachments.resolve(client, pdf, cache).uploaded
+    assert client.files.upload.call_count == 2
+
+
+def test_hash_cached_by_mtime_and_size(pdf, monkeypatch):
+    cache = attachments.UploadCache.load()
+    digest = cache.content_hash(pdf)
+    monkeypatch.setattr(attachments, "hash_file", Mock(side_effect=AssertionError("re-read")))
+    assert cache.content_hash(pdf) == digest
+
+
+def test_waits_for_processing(client, pdf):
+    client.files.upload.side_effect = None
+    client.files.upload.return_value = uploaded_file(state="PROCESSING")
+    client.files.get.side_effect = [uploaded_file(state="PROCESSING"), uploaded_file()]
+    sleeps = []
+
+    attachment = attachments.resolve(
+        client, pdf, attachments.UploadCache.load(), sleep=sleeps.append
+    )
+    assert attachment.uploaded
+    assert len(sleeps) == 2
+
+
+def test_upload_errors(client, pdf, tmp_path):
+    cache = attachments.UploadCache.load()
+    with pytest.raises(attachments.AttachmentError):
+        attachments.resolve(client, tmp_path / "missing.pdf", cache)
+
+    client.files.upload.side_effect = RuntimeError("quota")
+    with pytest.raises(attachments.AttachmentError, match="quota"):
+        attachments.resolve(client, pdf, cache)
+
+
+def test_save_drops_expired_handles(pdf):
+    cache = attachments.UploadCache.load()
+    cache.handles["old"] = attachments.FileHandle(
+        sha256="old", name="files/old", uri="u", mime_type="m", size=1, expires_at=time.time() - 1
+    )
+    cache.save()
+    assert "old" not in attachments.UploadCache.load().handles
@@ -0,0 +1,29 @@
+import pytest
+
+from ai_cli_assistant.blobs import BlobNotFoundError, BlobStore
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    digest = store.put("hello world")
+
+    assert digest in store
+    assert store.get(digest) == "hello world"
+    assert store.path_for(digest).parent.name == digest[:2]
+
+
+def test_put_is_deduplicated(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    first = store.put("x" * 10000)
+    second = store.put("x" * 10000)
+
+    assert first == second
+    assert len([p for p in store.root.rglob("*") if p.is_file()]) == 1
+    # Stored compressed
+    assert store.path_for(first).stat().st_size < 10000
+
+
+def test_get_missing(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    with pytest.raises(BlobNotFoundError):
+        store.get("ab" * 32)
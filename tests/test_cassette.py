@@ -0,0 +1,138 @@
+import gzip
+import json
+
+import pytest
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from ai_cli_assistant import api, cassette, resilience
+from ai_cli_assistant.cassette import Cassette, CassetteError, CassetteMode
+
+
+def response(text, tokens=None):
+    usage = types.GenerateContentResponseUsageMetadata(candidates_token_count=tokens)
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))
+        ],
+        usage_metadata=usage if tokens is not None else None,
+    )
+
+
+class FakeModels:
+    def __init__(self, replies=(), chunks=(), error=None):
+        self.replies = list(replies)
+        self.chunks = list(chunks)
+        self.error = error
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.replies.pop(0)
+
+    def generate_content_stream(self, **kwargs):
+        self.calls += 1
+        yield from self.chunks
+
+
+class FakeClient:
+    def __init__(self, **kwargs):
+        self.models = FakeModels(**kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_active_cassette():
+    resilience.reset()
+    yield
+    cassette.activate(None)
+    resilience.reset()
+
+
+def test_record_then_replay_generate(tmp_path):
+    client = FakeClient(replies=[response("one"), response("two")])
+    with cassette.use(Cassette(tmp_path, CassetteMode.RECORD)):
+        assert api.call_api_with_retry(client, "m", "hi", temperature=0.5).text == "one"
+        assert api.call_api_with_retry(client, "m", "hi", temperature=0.5).text == "two"
+
+    files = list(tmp_path.glob("*.json.gz"))
+    assert len(files) == 1
+    data = json.loads(gzip.decompress(files[0].read_bytes()))
+    assert data["request"]["params"]["prompt"] == "hi"
+    assert len(data["outcomes"]) == 2
+
+    with cassette.use(Cassette(tmp_path, CassetteMode.REPLAY)):
+        offline = api.get_client()
+        replies = [api.call_api_with_retry(offline, "m", "hi", temperature=0.5) for _ in range(3)]
+        assert [reply.text for reply in replies] == ["one", "two", "two"]
+        with pytest.raises(CassetteError):
+            api.call_api_with_retry(offline, "m", "something else", temperature=0.5)
+    assert client.models.calls == 2
+
+
+def test_replay_reraises_recorded_errors(tmp_path):
+    error = genai_errors.ClientError(400, {"error": {"message": "bad", "status": "INVALID"}})
+    client = FakeClient(error=error)
+    with cassette.use(Cassette(tmp_path, CassetteMode.RECORD)):
+        with pytest.raises(genai_errors.ClientError):
+            api.call_api_with_retry(client, "m", "hi")
+
+    with cassette.use(Cassette(tmp_path, CassetteMode.REPLAY)):
+        with pytest.raises(genai_errors.ClientError) as excinfo:
+            api.call_api_with_retry(cassette.OfflineClient(), "m", "hi")
+    assert excinfo.value.code == 400
+
+
+def test_stream_replay_keeps_chunks_and_timing(tmp_path, monkeypatch):
+    chunks = [response("Hel"), response("lo", tokens=2)]
+    client = FakeClient(chunks=chunks)
+    with cassette.use(Cassette(tmp_path, CassetteMode.RECORD)):
+        assert [c.text for c in api.stream_with_retry(client, "m", "hi")] == ["Hel", "lo"]
+
+    outcome = json.loads(gzip.decompress(next(tmp_path.glob("*.json.gz")).read_bytes()))
+    offsets = [record["t"] for record in outcome["outcomes"][0]["chunks"]]
+    assert offsets == sorted(offsets)
+
+    slept = []
+    monkeypatch.setattr(cassette.time, "sleep", slept.append)
+    stats = api.StreamStats()
+    with cassette.use(Cassette(tmp_path, CassetteMode.REPLAY, pace=True)):
+        replayed = list(api.stream_with_retry(cassette.OfflineClient(), "m", "hi", stats=stats))
+    assert [c.text for c in replayed] == ["Hel", "lo"]
+    assert len(slept) == 2
+    assert stats.output_tokens == 2 and stats.ttft is not None
+    assert client.models.calls == 1
+
+
+def test_offline_client_refuses_other_calls():
+    with pytest.raises(CassetteError):
+        cassette.OfflineClient().files.upload
+
+
+def test_attachments_are_keyed_by_content(tmp_path, monkeypatch):
+    from unittest.mock import Mock
+
+    from ai_cli_assistant import AssistantSession
+    from ai_cli_assistant.config import AssistantConfig
+
+    config = AssistantConfig(enable_history=False)
+    path = tmp_path / "notes.txt"
+    path.write_text("hello", encoding="utf-8")
+
+    client = FakeClient(replies=[response("Seen")])
+    client.files = Mock()
+    client.files.upload.return_value = types.File(
+        name="files/a", uri="https://example.test/files/a", state="ACTIVE"
+    )
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "record-cache"))
+    with cassette.use(Cassette(tmp_path / "tape", CassetteMode.RECORD)):
+        session = AssistantSession(config, client=client)
+        assert session.ask("Read it", attachments=[path]).text == "Seen"
+
+    # A fresh upload cache, as after the upload expired: replay neither uploads
+    # nor depends on the URI the recording saw
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "replay-cache"))
+    with cassette.use(Cassette(tmp_path / "tape", CassetteMode.REPLAY)):
+        session = AssistantSession(config, client=cassette.OfflineClient())
+        assert session.ask("Read it", attachments=[path]).text == "Seen"
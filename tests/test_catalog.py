@@ -0,0 +1,86 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from ai_cli_assistant import catalog
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+
+def fake_client():
+    client = Mock()
+    flash = Mock(
+        display_name="Gemini Flash",
+        description="Fast",
+        input_token_limit=1000,
+        output_token_limit=100,
+        supported_actions=["generateContent"],
+    )
+    flash.name = "models/gemini-2.5-flash"
+    pro = Mock(
+        display_name="Gemini Pro",
+        description="Capable",
+        input_token_limit=2000,
+        output_token_limit=200,
+        supported_actions=["generateContent", "countTokens"],
+    )
+    pro.name = "models/gemini-2.5-pro"
+    client.models.list.return_value = [flash, pro]
+    return client
+
+
+def test_refresh_and_load_catalog():
+    catalog.refresh_catalog(fake_client())
+
+    cached = catalog.load_catalog()
+    assert cached.is_fresh()
+    assert cached.get("gemini-2.5-pro").output_token_limit == 200
+    assert cached.input_token_limit("models/gemini-2.5-flash") == 1000
+
+
+def test_load_catalog_missing():
+    assert catalog.load_catalog() is None
+
+
+def test_check_model_known_and_unknown():
+    catalog.refresh_catalog(fake_client())
+
+    assert catalog.check_model("gemini-2.5-flash", fake_client) is None
+    message = catalog.check_model("gemini-2.5-flsh", fake_client)
+    assert "Unknown model" in message
+    assert "gemini-2.5-flash" in message
+
+
+def test_stale_catalog_refreshes_in_background():
+    stale = catalog.ModelCatalog(fetched_at=time.time() - 10, models=[])
+    catalog.save_catalog(stale)
+    client = fake_client()
+
+    catalog.check_model("gemini-2.5-pro", lambda: client, ttl=1)
+    assert catalog.wait_for_refresh(timeout=5)
+
+    assert catalog.load_catalog().get("gemini-2.5-pro") is not None
+
+
+def test_check_model_without_catalog_is_permissive():
+    assert catalog.check_model("anything", fake_client) is None
+    catalog.wait_for_refresh(timeout=5)
+
+
+def test_wait_for_refresh_gives_up_on_a_hung_refresh():
+    release = threading.Event()
+
+    def hung_client():
+        release.wait(5)
+        return fake_client()
+
+    catalog.refresh_in_background(hung_client)
+    assert catalog.wait_for_refresh(timeout=0.05) is False
+    release.set()
+    assert catalog.wait_for_refresh(timeout=5) is True
+    assert catalog.load_catalog() is not None
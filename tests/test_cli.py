@@ -1,3 +1,6 @@
+import json
+import time
+
 import pytest
 from typer.testing import CliRunner
 from unittest.mock import Mock, patch
@@ -6,19 +9,32 @@ from ai_cli_assistant import api
 
 runner = CliRunner()
 
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
 @pytest.fixture(autouse=True)
 def mock_dependencies():
     with patch("ai_cli_assistant.api.build_client") as mock_build, \
          patch("ai_cli_assistant.api.call_api_with_retry") as mock_call:
         mock_build.return_value = Mock()
         mock_call.return_value = Mock(text="AI Response")
+        api.reset_client()
         yield
+        api.reset_client()
 
 def test_version():
     result = runner.invoke(app, ["version"])
     assert result.exit_code == 0
     assert "AI CLI Assistant v" in result.stdout
 
+def test_profile_option_writes_profile(tmp_path):
+    result = runner.invoke(app, ["--profile", "cpu", "--profile-dir", str(tmp_path), "version"])
+    assert result.exit_code == 0
+    assert "cpu profile" in result.stdout
+    assert len(list(tmp_path.glob("ai-assistant-version-*.prof"))) == 1
+    assert len(list(tmp_path.glob("ai-assistant-version-*.txt"))) == 1
+
 def test_ask_missing_prompt():
     result = runner.invoke(app, ["ask"])
     assert result.exit_code == 1
@@ -36,7 +52,7 @@ def test_ask_api_error():
         assert "API Error" in result.stdout
 
 def test_ask_safety_error():
-    with patch("ai_cli_assistant.api.handle_response", side_effect=api.SafetyError("Blocked")):
+    with patch("ai_cli_assistant.api.parse_response", side_effect=api.SafetyError("Blocked")):
         result = runner.invoke(app, ["ask", "-p", "Hello"])
         assert result.exit_code == 1
         assert "Safety Blocked" in result.stdout
@@ -58,3 +74,384 @@ def test_clear_history_abort():
     result = runner.invoke(app, ["clear-history"], input="n\n")
     assert result.exit_code == 0
     assert "Cancelled" in result.stdout
+
+def test_config_explain():
+    result = runner.invoke(app, ["-v", "config", "--explain"])
+    assert result.exit_code == 0
+    assert "Configuration Sources" in result.stdout
+    assert "cli" in result.stdout
+
+def test_invalid_env_setting_is_reported(monkeypatch):
+    monkeypatch.setenv("AI_ASSISTANT_TEMPERATURE", "hot")
+    monkeypatch.setenv("AI_ASSISTANT_DEFAULT_MODEL", "env-model")
+    result = runner.invoke(app, ["ask", "-p", "Hello", "--no-history"])
+    assert result.exit_code == 0
+    assert "Ignored invalid setting from env (AI_ASSISTANT_TEMPERATURE)" in result.output
+    # The other environment settings still apply
+    assert api.call_api_with_retry.call_args.args[1] == "env-model"
+
+def test_ask_with_template():
+    result = runner.invoke(app, ["ask", "-p", "Hello", "--template", "review"])
+    assert result.exit_code == 0
+    args = api.call_api_with_retry.call_args.args
+    assert "code reviewer" in args[3]
+
+def test_ask_unknown_template():
+    result = runner.invoke(app, ["ask", "-p", "Hello", "--template", "nope"])
+    assert result.exit_code == 1
+    assert "Template Error" in result.stdout
+
+def test_ask_json_output():
+    result = runner.invoke(app, ["ask", "-p", "Hello", "--output", "json", "--no-history"])
+    assert result.exit_code == 0
+    data = json.loads(result.stdout)
+    assert data["response"] == "AI Response"
+    assert "╭" not in result.stdout
+
+def test_ask_jsonl_output():
+    result = runner.invoke(app, ["ask", "-p", "Hello", "-o", "jsonl", "--no-history"])
+    assert result.exit_code == 0
+    events = [json.loads(line)["event"] for line in result.stdout.splitlines()]
+    assert events == ["start", "chunk", "end"]
+
+def test_ask_raw_output():
+    result = runner.invoke(app, ["ask", "-p", "Hello", "-o", "raw", "--no-history"])
+    assert result.exit_code == 0
+    assert result.stdout == "AI Response\n"
+
+def test_chat_session_resume(monkeypatch, tmp_path):
+    monkeypatch.setenv("AI_ASSISTANT_SESSION_DIR", str(tmp_path))
+    monkeypatch.setenv("AI_ASSISTANT_ENABLE_HISTORY", "false")
+
+    result = runner.invoke(
+        app, ["chat", "--session", "demo", "--no-stream"], input="Hello\nexit\n"
+    )
+    assert result.exit_code == 0
+    assert "AI Response" in result.stdout
+
+    result = runner.invoke(app, ["chat", "--resume", "--no-stream"], input="Again\nexit\n")
+    assert result.exit_code == 0
+    assert "resumed at turn 1" in result.stdout
+    prompt = api.call_api_with_retry.call_args.args[2]
+    assert prompt == "user: Hello\nassistant: AI Response\nuser: Again"
+
+def test_chat_streams_by_default(monkeypatch, tmp_path):
+    monkeypatch.setenv("AI_ASSISTANT_SESSION_DIR", str(tmp_path))
+    monkeypatch.setenv("AI_ASSISTANT_ENABLE_HISTORY", "false")
+    client = Mock()
+    client.models.generate_content_stream.return_value = iter(
+        [Mock(text="Hel", usage_metadata=None), Mock(text="lo!", usage_metadata=None)]
+    )
+    api.build_client.return_value = client
+
+    result = runner.invoke(app, ["-v", "chat"], input="Hi\nexit\n")
+    assert result.exit_code == 0
+    assert "Hello!" in result.stdout
+    assert "TTFT" in result.stdout
+    api.call_api_with_retry.assert_not_called()
+
+def test_ask_unknown_model_rejected():
+    from ai_cli_assistant import catalog
+
+    catalog.save_catalog(
+        catalog.ModelCatalog(
+            fetched_at=time.time(),
+            models=[catalog.ModelInfo(name="models/gemini-2.5-flash")],
+        )
+    )
+    result = runner.invoke(app, ["ask", "-p", "Hello", "-m", "gemini-2.5-flsh"])
+    assert result.exit_code == 1
+    assert "Unknown Model" in result.stdout
+    assert "gemini-2.5-flash" in result.stdout
+    api.call_api_with_retry.assert_not_called()
+
+def test_ask_approx_cache_serves_similar_prompt(monkeypatch, tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    monkeypatch.setenv("AI_ASSISTANT_HISTORY_FILE", str(history_file))
+
+    result = runner.invoke(app, ["ask", "-p", "Summarize the build log from 2025-01-02 10:00"])
+    assert result.exit_code == 0
+    assert api.call_api_with_retry.call_count == 1
+
+    result = runner.invoke(
+        app,
+        ["ask", "-p", "summarize the build log from 2025-02-03 11:30", "--approx-cache", "0.9"],
+    )
+    assert result.exit_code == 0
+    assert "AI Response" in result.stdout
+    assert "similar" in result.stdout
+    assert api.call_api_with_retry.call_count == 1
+
+
+def test_ask_approx_cache_requires_same_settings(monkeypatch, tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    monkeypatch.setenv("AI_ASSISTANT_HISTORY_FILE", str(history_file))
+
+    runner.invoke(app, ["ask", "-p", "Summarize the build log"])
+    result = runner.invoke(
+        app, ["ask", "-p", "Summarize the build log", "-t", "0.1", "--approx-cache", "0.9"]
+    )
+    assert result.exit_code == 0
+    assert "similar" not in result.stdout
+    assert api.call_api_with_retry.call_count == 2
+
+def test_history_stats(monkeypatch, tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    monkeypatch.setenv("AI_ASSISTANT_HISTORY_FILE", str(history_file))
+    for _ in range(2):
+        runner.invoke(app, ["ask", "-p", "Same question"])
+
+    result = runner.invoke(app, ["history", "stats"])
+    assert result.exit_code == 0
+    assert "Usage by Model" in result.stdout
+    assert "Same question" in result.stdout
+
+    result = runner.invoke(app, ["history", "stats", "-o", "jsonl"])
+    kinds = {json.loads(line)["kind"] for line in result.stdout.splitlines()}
+    assert kinds == {"daily", "model", "length", "prompt"}
+
+    result = runner.invoke(app, ["history", "-n", "1", "-o", "json"])
+    assert json.loads(result.stdout)[0]["prompt"] == "Same question"
+
+def test_ask_with_schema(tmp_path):
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text('{"type": "array", "items": {"type": "string"}}')
+    api.call_api_with_retry.return_value = Mock(text='["red", "green"]')
+
+    result = runner.invoke(
+        app, ["ask", "-p", "Colors", "--schema", str(schema_file), "--no-history", "-o", "json"]
+    )
+    assert result.exit_code == 0
+    assert json.loads(result.stdout)["data"] == ["red", "green"]
+    schema = api.call_api_with_retry.call_args.kwargs["response_schema"]
+    assert schema["type"] == "array"
+
+def test_ask_with_schema_rejects_invalid_json(tmp_path):
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text('{"type": "object"}')
+    api.call_api_with_retry.return_value = Mock(text="not json")
+
+    result = runner.invoke(app, ["ask", "-p", "x", "--schema", str(schema_file), "--no-history"])
+    assert result.exit_code == 1
+    assert "Invalid Structured Response" in result.stdout
+
+def test_stream_with_schema_emits_items(monkeypatch, tmp_path):
+    monkeypatch.setenv("AI_ASSISTANT_ENABLE_HISTORY", "false")
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text('{"type": "array"}')
+    client = Mock()
+    client.models.generate_content_stream.return_value = iter(
+        [
+            Mock(text='[{"n": 1}, ', usage_metadata=None),
+            Mock(text='{"n": 2}]', usage_metadata=None),
+        ]
+    )
+    api.build_client.return_value = client
+
+    result = runner.invoke(app, ["stream", "-p", "x", "--schema", str(schema_file), "-o", "raw"])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == ['{"n": 1}', '{"n": 2}']
+    config = client.models.generate_content_stream.call_args.kwargs["config"]
+    assert config["response_mime_type"] == "application/json"
+
+def test_stream_record_and_replay(monkeypatch, tmp_path):
+    from google.genai import types
+
+    from ai_cli_assistant import cassette
+
+    monkeypatch.setenv("AI_ASSISTANT_ENABLE_HISTORY", "false")
+    chunk = types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(parts=[types.Part(text="Taped")]))]
+    )
+    client = Mock()
+    client.models.generate_content_stream.return_value = iter([chunk])
+    api.build_client.return_value = client
+    tape = tmp_path / "tape"
+
+    result = runner.invoke(app, ["--record", str(tape), "stream", "-p", "x", "-o", "raw"])
+    assert result.exit_code == 0
+    assert result.stdout == "Taped\n"
+    assert cassette.active() is None
+
+    api.reset_client()
+    api.build_client.side_effect = api.MissingAPIKeyError("no key")
+    result = runner.invoke(app, ["--replay", str(tape), "stream", "-p", "x", "-o", "raw"])
+    assert result.exit_code == 0
+    assert result.stdout == "Taped\n"
+    assert client.models.generate_content_stream.call_count == 1
+
+    result = runner.invoke(app, ["--record", "a", "--replay", "b", "version"])
+    assert result.exit_code == 1
+
+def test_ask_minimize_shrinks_piped_prompt(tmp_path):
+    log = tmp_path / "build.log"
+    log.write_text("\x1b[31mfailed\x1b[0m\n" + "retrying\n" * 500)
+
+    result = runner.invoke(app, ["ask", "-f", str(log), "--minimize", "--no-history"])
+    assert result.exit_code == 0
+    assert "Minimized prompt" in result.stdout
+    prompt = api.call_api_with_retry.call_args.args[2]
+    assert prompt == "failed\nretrying\n[previous line repeated 499 more times]"
+
+
+def test_jobs_submit_and_fetch(monkeypatch, tmp_path):
+    from google.genai import types
+
+    history_file = tmp_path / "history.jsonl"
+    monkeypatch.setenv("AI_ASSISTANT_JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("AI_ASSISTANT_HISTORY_FILE", str(history_file))
+    prompts = tmp_path / "prompts.txt"
+    prompts.write_text("one\ntwo\n")
+    client = Mock()
+    client.batches.create.return_value = Mock(state="JOB_STATE_PENDING")
+    client.batches.create.return_value.name = "batches/job1"
+    job = Mock(state="JOB_STATE_SUCCEEDED", error=None)
+    job.dest.inlined_responses = [
+        types.InlinedResponse(
+            response=types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(parts=[types.Part(text=t)]))]
+            )
+        )
+        for t in ("1", "2")
+    ]
+    client.batches.get.return_value = job
+    api.build_client.return_value = client
+
+    result = runner.invoke(app, ["jobs", "submit", "-f", str(prompts)])
+    assert result.exit_code == 0
+    assert "job1" in result.stdout
+
+    result = runner.invoke(app, ["jobs", "fetch", "job1", "-o", "jsonl"])
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(line["prompt"], line["response"]) for line in lines] == [("one", "1"), ("two", "2")]
+
+    runner.invoke(app, ["jobs", "fetch", "job1", "-o", "raw"])
+    assert len(history_file.read_text().splitlines()) == 2
+
+    result = runner.invoke(app, ["jobs", "status"])
+    assert "succeeded" in result.stdout
+
+
+def test_interrupted_jobs_fetch_logs_nothing(monkeypatch, tmp_path):
+    from ai_cli_assistant import jobs
+
+    history_file = tmp_path / "history.jsonl"
+    monkeypatch.setenv("AI_ASSISTANT_JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("AI_ASSISTANT_HISTORY_FILE", str(history_file))
+    (tmp_path / "jobs").mkdir()
+    store = jobs.JobStore(tmp_path / "jobs")
+    store.save(jobs.JobRecord(name="batches/job1", model="gemini-2.5-flash", created="now"))
+
+    def interrupted(*args):
+        yield jobs.JobResult(index=0, prompt="one", response="1")
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(jobs, "refresh", lambda *args: Mock())
+    monkeypatch.setattr(jobs, "iter_results", interrupted)
+    result = runner.invoke(app, ["jobs", "fetch", "job1", "-o", "raw"])
+
+    assert result.exit_code != 0
+    assert not history_file.exists()
+    assert not store.get("job1").fetched
+
+
+def test_ask_with_context(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "parser.py").write_text("def parse(): pass\n")
+    (tmp_path / "src" / "notes.log").write_text("ignored\n")
+    (tmp_path / ".gitignore").write_text("*.log\n")
+
+    result = runner.invoke(
+        app, ["ask", "-p", "Explain parse", "--context", str(tmp_path), "--no-history"]
+    )
+    assert result.exit_code == 0
+    assert "Context: 2 of 2 files" in result.stdout
+    prompt = api.call_api_with_retry.call_args.args[2]
+    assert "parser.py <==\ndef parse(): pass" in prompt
+    assert "ignored" not in prompt
+    assert prompt.endswith("Explain parse")
+
+def test_ask_with_attachment(tmp_path):
+    from google.genai import types
+
+    image = tmp_path / "chart.png"
+    image.write_bytes(b"\x89PNG\r\n")
+    client = Mock()
+    client.files.upload.return_value = types.File(
+        name="files/chart", uri="https://example.test/chart", mime_type="image/png"
+    )
+    api.build_client.return_value = client
+
+    for _ in range(2):
+        result = runner.invoke(
+            app, ["ask", "-p", "Describe", "--attach", str(image), "--no-history"]
+        )
+        assert result.exit_code == 0
+    assert "cached upload" in result.stdout
+    assert client.files.upload.call_count == 1
+    parts = api.call_api_with_retry.call_args.kwargs["attachments"]
+    assert parts[0].file_data.file_uri == "https://example.test/chart"
+
+def test_ask_with_tools(monkeypatch):
+    from google.genai import types
+
+    monkeypatch.setenv("AI_ASSISTANT_ENABLE_HISTORY", "false")
+    call = types.FunctionCall(name="shell", args={"command": "echo tool-output"})
+    responses = [
+        types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(role="model", parts=[types.Part(function_call=call)])
+                )
+            ]
+        ),
+        types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(parts=[types.Part(text="Done")]))]
+        ),
+    ]
+    api.call_api_with_retry.side_effect = responses
+
+    result = runner.invoke(app, ["ask", "-p", "Run it", "--tool", "shell", "--yes"])
+    assert result.exit_code == 0
+    assert "shell(command='echo tool-output') → ok" in result.stdout
+    assert "Done" in result.stdout
+    follow_up = api.call_api_with_retry.call_args.args[2][-1]
+    assert follow_up.parts[0].function_response.response["result"]["stdout"] == "tool-output\n"
+
+    # Without --yes the command needs a confirmation, which needs a terminal
+    api.call_api_with_retry.side_effect = responses
+    result = runner.invoke(app, ["ask", "-p", "Run it", "--tool", "shell"])
+    assert result.exit_code == 0
+    assert "Tool Call Not Run" in result.stdout
+    follow_up = api.call_api_with_retry.call_args.args[2][-1]
+    assert "declined" in follow_up.parts[0].function_response.response["error"]
+
+    result = runner.invoke(app, ["ask", "-p", "Run it", "--tools"])
+    assert result.exit_code == 1
+    assert "No tools are enabled" in result.stdout
+
+
+def test_confirm_tool_call_asks_on_a_terminal(monkeypatch):
+    from ai_cli_assistant import cli, tools
+
+    answers = []
+    monkeypatch.setattr(cli.sys.stdin, "isatty", lambda: True, raising=False)
+    monkeypatch.setattr(cli.typer, "confirm", lambda *args, **kwargs: answers.pop())
+    status = Mock()
+    result = tools.ToolResult(name="shell", args={"command": "make clean"})
+
+    answers.append(True)
+    assert cli._confirm_tool_call(result, status) is True
+    answers.append(False)
+    assert cli._confirm_tool_call(result, None) is False
+    status.stop.assert_called_once()
+    status.start.assert_called_once()
+
+    # Ctrl+C at the question cancels the request
+    def interrupt(*args, **kwargs):
+        raise cli.typer.Abort()
+
+    monkeypatch.setattr(cli.typer, "confirm", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        cli._confirm_tool_call(result, None)
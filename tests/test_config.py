@@ -2,6 +2,12 @@ import pytest
 from pathlib import Path
 from ai_cli_assistant import config
 
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
 def test_default_config():
     cfg = config.AssistantConfig()
     assert cfg.default_model == "gemini-2.5-flash"
@@ -43,3 +49,62 @@ def test_save_default_config(tmp_path):
     assert saved_path.exists()
     content = saved_path.read_text()
     assert "default_model: gemini-2.5-flash" in content
+
+def test_layer_precedence(monkeypatch, tmp_path):
+    home = tmp_path / "home"
+    project = tmp_path / "project"
+    home.mkdir()
+    project.mkdir()
+    (home / ".aiassistant.yaml").write_text(
+        "default_model: home-model\ntemperature: 0.2\nverbose: true"
+    )
+    (project / ".aiassistant.yaml").write_text("temperature: 0.3\nmax_tokens: 100")
+
+    monkeypatch.setenv("AI_ASSISTANT_MAX_TOKENS", "500")
+    monkeypatch.setattr(Path, "home", lambda: home)
+    monkeypatch.setattr(Path, "cwd", lambda: project)
+
+    cfg, sources = config.resolve_config({"verbose": False})
+    assert cfg.default_model == "home-model"
+    assert cfg.temperature == 0.3
+    assert cfg.max_tokens == 500
+    assert cfg.verbose is False
+    assert sources["default_model"].startswith("home")
+    assert sources["temperature"].startswith("project")
+    assert sources["max_tokens"] == "env (AI_ASSISTANT_MAX_TOKENS)"
+    assert sources["verbose"] == "cli"
+    assert sources["history_file"] == "default"
+
+
+def test_invalid_env_var_is_skipped_alone(monkeypatch, tmp_path):
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    monkeypatch.setattr(Path, "cwd", lambda: tmp_path)
+    monkeypatch.setenv("AI_ASSISTANT_TEMPERATURE", "hot")
+    monkeypatch.setenv("AI_ASSISTANT_MAX_TOKENS", "500")
+
+    cfg, sources = config.resolve_config()
+    assert cfg.temperature == 0.7
+    assert cfg.max_tokens == 500
+    assert sources["max_tokens"] == "env (AI_ASSISTANT_MAX_TOKENS)"
+    assert sources["temperature"] == "default; env (AI_ASSISTANT_TEMPERATURE) ignored (invalid)"
+    (problem,) = config.ignored_settings()
+    assert problem.startswith("env (AI_ASSISTANT_TEMPERATURE): temperature: ")
+
+
+def test_load_config_uses_snapshot_cache(monkeypatch, tmp_path):
+    config_file = tmp_path / ".aiassistant.yaml"
+    config_file.write_text("default_model: cached-model")
+
+    monkeypatch.setattr(Path, "cwd", lambda: tmp_path)
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    config._memo.clear()
+
+    assert config.load_config().default_model == "cached-model"
+    assert (tmp_path / "cache" / "ai_cli_assistant" / "config_cache.json").exists()
+
+    def fail_parse(*args, **kwargs):
+        raise AssertionError("YAML should not be parsed for an unchanged file")
+
+    config._memo.clear()
+    monkeypatch.setattr(config.yaml, "safe_load", fail_parse)
+    assert config.load_config().default_model == "cached-model"
@@ -0,0 +1,119 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from ai_cli_assistant import context
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "repo"
+    files = {
+        ".gitignore": "*.log\nbuild/\n!keep.log\n/top.txt\n",
+        "app/parser.py": "def parse_tokens(text):\n    return text.split()\n",
+        "app/render.py": "def render(page):\n    return page\n",
+        "app/.gitignore": "generated_*.py\n",
+        "app/generated_api.py": "x = 1\n",
+        "app/top.txt": "not anchored here\n",
+        "top.txt": "anchored\n",
+        "debug.log": "noise\n",
+        "keep.log": "kept\n",
+        "build/out.py": "compiled\n",
+        ".git/config": "[core]\n",
+    }
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    (root / "image.bin").write_bytes(b"\x89PNG\0\0data")
+    return root
+
+
+def names(paths, root):
+    return sorted(path.relative_to(root).as_posix() for path in paths)
+
+
+def test_extract_terms_splits_identifiers():
+    terms = context.extract_terms("Why does parseHTTPResponse fail in read_file?")
+    assert {"parsehttpresponse", "parse", "http", "response", "read_file", "read", "file"} <= terms
+    assert "why" not in terms and "in" not in terms
+
+
+def test_bloom_filter_grows_with_the_term_count():
+    small = context.build_bloom(["parser", "token"])
+    assert context.bloom_count(small, ["parser", "token", "missing"]) == 2
+
+    terms = [f"term{i}" for i in range(3000)]
+    bloom = context.build_bloom(terms)
+    assert context.bloom_count(bloom, terms) == 3000
+    false_positives = context.bloom_count(bloom, [f"absent{i}" for i in range(3000)])
+    assert false_positives / 3000 < 0.05
+
+
+def test_collect_files_honours_gitignore(tree):
+    files = context.collect_files(str(tree))
+    assert names(files, tree) == [
+        ".gitignore",
+        "app/.gitignore",
+        "app/parser.py",
+        "app/render.py",
+        "app/top.txt",
+        "image.bin",
+        "keep.log",
+    ]
+
+
+def test_collect_files_glob(tree):
+    files = context.collect_files("**/*.py", cwd=tree)
+    assert names(files, tree) == ["app/parser.py", "app/render.py"]
+
+    with pytest.raises(context.ContextError):
+        context.collect_files("*.rs", cwd=tree)
+
+
+def test_digest_cache_skips_unchanged_files(tree, monkeypatch):
+    reads = []
+    original = Path.read_bytes
+
+    def counting_read_bytes(self):
+        reads.append(self.name)
+        return original(self)
+
+    monkeypatch.setattr(Path, "read_bytes", counting_read_bytes)
+
+    context.pack_context([str(tree)], "parser", budget=10_000)
+    assert "parser.py" in reads and "image.bin" in reads
+
+    reads.clear()
+    context.pack_context([str(tree)], "parser", budget=10_000)
+    assert reads == []
+
+    parser = tree / "app" / "parser.py"
+    parser.write_text("def parse_tokens(text):\n    return text.split(',')\n")
+    os.utime(parser, ns=(1, 1))
+    context.pack_context([str(tree)], "parser", budget=10_000)
+    assert reads == ["parser.py"]
+
+
+def test_pack_context_ranks_and_fits_budget(tree):
+    packed = context.pack_context(["app"], "Why does parse_tokens drop text?", 10_000, cwd=tree)
+    assert packed.files[0] == "app/parser.py"
+    assert packed.text.startswith(context.HEADER)
+    assert "==> app/parser.py <==\ndef parse_tokens" in packed.text
+    assert packed.candidates == 4
+
+    tight = context.pack_context(["app"], "parse_tokens", 35, cwd=tree)
+    assert tight.files == ["app/parser.py"]
+    assert tight.over_budget == 3
+    assert tight.tokens <= 35
+
+
+def test_pack_context_skips_binary_files(tree):
+    packed = context.pack_context([str(tree)], "image", 10_000)
+    assert "image.bin" not in " ".join(packed.files)
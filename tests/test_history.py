@@ -1,4 +1,5 @@
 import pytest
+import hashlib
 import json
 from ai_cli_assistant import history
 
@@ -69,3 +70,73 @@ def test_export_history_json(tmp_path):
     data = json.loads(content)
     assert len(data) == 1
     assert data[0]["prompt"] == "p1"
+
+def test_log_conversation_large_prompt_by_reference(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    prompt = "a" * 2000
+
+    history.log_conversation(
+        prompt, "r1", "m1", str(history_file), inline_limit=1000
+    )
+
+    record = json.loads(history_file.read_text())
+    assert len(record["prompt"]) == history.PREVIEW_CHARS
+    assert record["prompt_sha256"] == hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    assert record["response"] == "r1"
+
+    entry = history.load_history(str(history_file))[0]
+    assert entry.prompt_chars == 2000
+    assert entry.full_prompt() == prompt
+
+
+def test_large_bodies_are_deduplicated(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    prompt = "same piped file\n" * 500
+
+    for _ in range(3):
+        history.log_conversation(prompt, "r" * 5000, "m1", str(history_file), inline_limit=100)
+
+    blobs = [p for p in (tmp_path / "history.blobs").rglob("*") if p.is_file()]
+    assert len(blobs) == 2
+
+    entries = history.load_history(str(history_file), limit=2)
+    assert len(entries) == 2
+    assert entries[-1].full_response() == "r" * 5000
+
+
+def test_export_history_resolves_blobs(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    history.log_conversation("p" * 300, "r1", "m1", str(history_file), inline_limit=100)
+
+    export_file = tmp_path / "export.json"
+    history.export_history(export_file, str(history_file), format="json")
+
+    data = json.loads(export_file.read_text(encoding="utf-8"))
+    assert data[0]["prompt"] == "p" * 300
+
+
+def test_clear_history_removes_blobs(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    history.log_conversation("p" * 300, "r1", "m1", str(history_file), inline_limit=100)
+
+    history.clear_history(str(history_file))
+    assert not (tmp_path / "history.blobs").exists()
+
+def test_log_conversation_session_fields(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    history.log_conversation("p1", "r1", "m1", str(history_file), session_id="abc", turn=3)
+
+    entry = history.load_history(str(history_file))[0]
+    assert entry.session_id == "abc"
+    assert entry.turn == 3
+
+
+def test_iter_history_from_and_read_entry_at(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    history.log_conversation("p1", "r1", "m", history_file=history_file)
+    history.log_conversation("p2", "r2", "m", history_file=history_file)
+
+    offsets = [offset for offset, _ in history.iter_history_from(0, history_file)]
+    assert offsets[0] == 0 and len(offsets) == 2
+    assert history.read_entry_at(offsets[1], history_file).prompt == "p2"
+    assert [e.prompt for _, e in history.iter_history_from(offsets[1], history_file)] == ["p2"]
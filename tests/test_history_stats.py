@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from ai_cli_assistant import history_stats
+
+
+def write_history(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            record = {
+                "timestamp": f"2025-01-0{1 + i % 3}T10:00:00",
+                "model": "gemini-2.5-pro" if i % 2 else "gemini-2.5-flash",
+                "prompt": "repeated question" if i % 5 == 0 else f"prompt {i}",
+                "response": "x" * i,
+                "tokens_used": 10,
+            }
+            f.write(json.dumps(record) + "\n")
+        f.write("not json\n")
+
+
+def test_split_ranges_align_to_lines(tmp_path):
+    path = tmp_path / "history.jsonl"
+    write_history(path, 50)
+    data = path.read_bytes()
+
+    ranges = history_stats.split_ranges(path, 7)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[start - 1 : start] == b"\n"
+
+
+def test_compute_stats_serial(tmp_path):
+    path = tmp_path / "history.jsonl"
+    write_history(path, 20)
+
+    stats = history_stats.compute_stats(path, jobs=1)
+    assert stats.entries == 20
+    assert stats.model_requests == {"gemini-2.5-flash": 10, "gemini-2.5-pro": 10}
+    assert stats.model_tokens["gemini-2.5-pro"] == 100
+    assert sum(stats.requests.values()) == 20
+    assert stats.top_prompts(1) == [(4, "repeated question")]
+    assert sum(stats.response_hist) == 20
+    assert stats.response_hist[0] == 1  # the empty response
+
+
+def test_parallel_matches_serial(tmp_path, monkeypatch):
+    path = tmp_path / "history.jsonl"
+    write_history(path, 200)
+    serial = history_stats.compute_stats(path, jobs=1)
+
+    monkeypatch.setattr(history_stats, "PARALLEL_MIN_BYTES", 0)
+    parallel = history_stats.compute_stats(path, jobs=2)
+
+    assert parallel.entries == serial.entries
+    assert parallel.requests == serial.requests
+    assert parallel.prompt_hist == serial.prompt_hist
+    assert parallel.top_prompts() == serial.top_prompts()
+
+
+def test_histogram_without_numpy(monkeypatch):
+    lengths = [0, 1, 2, 3, 4, 1000, 2**40]
+    with_numpy = history_stats._histogram(lengths)
+    monkeypatch.setattr(history_stats, "np", None)
+    assert history_stats._histogram(lengths) == with_numpy
+    assert with_numpy[:4] == [1, 1, 2, 1]
+    assert with_numpy[-1] == 1
+
+
+@pytest.mark.parametrize("fraction,expected", [(0.5, 3), (1.0, 7)])
+def test_percentile(fraction, expected):
+    # lengths 0, 1, 2-3 (x2), 4-7
+    histogram = [1, 1, 2, 1] + [0] * (history_stats.HISTOGRAM_BINS - 4)
+    assert history_stats.percentile(histogram, fraction) == expected
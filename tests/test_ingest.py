@@ -0,0 +1,95 @@
+import hashlib
+import io
+
+import pytest
+
+from ai_cli_assistant import ingest
+
+
+class FakeStdin(io.TextIOWrapper):
+    """Piped stdin backed by an in-memory byte buffer."""
+
+    def __init__(self, data: bytes):
+        super().__init__(io.BytesIO(data), encoding="utf-8")
+
+    def isatty(self):
+        return False
+
+
+def test_read_prompt_from_option():
+    result = ingest.read_prompt(prompt="Hello")
+    assert result.text == "Hello"
+    assert result.source == "option"
+    assert result.digest == hashlib.sha256(b"Hello").hexdigest()
+
+
+def test_read_prompt_from_file(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("  Explain mmap  \n", encoding="utf-8")
+
+    result = ingest.read_prompt(prompt_file=prompt_file)
+    assert result.text == "Explain mmap"
+    assert result.source == "file"
+    assert not result.truncated
+
+
+def test_digest_matches_the_decoded_text(tmp_path):
+    prompt_file = tmp_path / "latin1.txt"
+    prompt_file.write_bytes("café".encode("latin-1"))
+
+    result = ingest.read_prompt(prompt_file=prompt_file)
+    assert result.text == "caf\ufffd"
+    assert result.digest == hashlib.sha256(result.text.encode("utf-8")).hexdigest()
+
+
+def test_read_prompt_empty_file(tmp_path):
+    prompt_file = tmp_path / "empty.txt"
+    prompt_file.touch()
+
+    result = ingest.read_file(prompt_file)
+    assert result.text == ""
+
+
+def test_read_prompt_missing_file(tmp_path):
+    with pytest.raises(ingest.PromptInputError) as exc:
+        ingest.read_prompt(prompt_file=tmp_path / "missing.txt")
+    assert "File not found" in str(exc.value)
+
+
+def test_read_prompt_from_stdin():
+    result = ingest.read_prompt(stdin=FakeStdin(b"piped input\n"))
+    assert result.text == "piped input"
+    assert result.source == "stdin"
+
+
+def test_read_prompt_empty_stdin():
+    with pytest.raises(ingest.PromptInputError) as exc:
+        ingest.read_prompt(stdin=FakeStdin(b"   \n"))
+    assert "No prompt provided" in str(exc.value)
+
+
+def test_stdin_truncated_on_char_boundary(monkeypatch):
+    monkeypatch.setattr(ingest, "STDIN_CHUNK_SIZE", 4)
+    # "é" is two bytes; a 6 byte cap would split the third one
+    result = ingest.read_stream(FakeStdin("ééééé".encode("utf-8")), max_bytes=5)
+    assert result.truncated
+    assert result.text == "éé"
+
+
+def test_file_overflow_error(tmp_path):
+    prompt_file = tmp_path / "big.txt"
+    prompt_file.write_text("x" * 100)
+
+    with pytest.raises(ingest.PromptInputError) as exc:
+        ingest.read_file(prompt_file, max_bytes=10, overflow=ingest.OVERFLOW_ERROR)
+    assert "10 byte limit" in str(exc.value)
+
+
+def test_file_overflow_truncate(tmp_path):
+    prompt_file = tmp_path / "big.txt"
+    prompt_file.write_text("x" * 100)
+
+    result = ingest.read_file(prompt_file, max_bytes=10)
+    assert result.truncated
+    assert result.size == 100
+    assert result.text == "x" * 10
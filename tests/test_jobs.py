@@ -0,0 +1,141 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+from google.genai import types
+
+from ai_cli_assistant import jobs
+
+
+def text_response(text):
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))
+        ],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(total_token_count=3),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return jobs.JobStore(jobs.get_job_dir(str(tmp_path / "jobs")))
+
+
+@pytest.fixture
+def client():
+    client = Mock()
+    client.batches.create.return_value = Mock(state=types.JobState.JOB_STATE_PENDING)
+    client.batches.create.return_value.name = "batches/abc123"
+    return client
+
+
+def test_read_prompts(tmp_path):
+    text = tmp_path / "prompts.txt"
+    text.write_text("first\n\nsecond\n")
+    assert jobs.read_prompts(text) == ["first", "second"]
+
+    lines = tmp_path / "prompts.jsonl"
+    lines.write_text('{"prompt": "a"}\n{"prompt": "b", "id": 2}\n')
+    assert jobs.read_prompts(lines) == ["a", "b"]
+
+    lines.write_text('{"text": "a"}\n')
+    with pytest.raises(jobs.JobError):
+        jobs.read_prompts(lines)
+
+
+def test_submit_inline(store, client):
+    record = jobs.submit(client, store, "gemini-2.5-flash", ["a", "b"], system_prompt="sys")
+
+    kwargs = client.batches.create.call_args.kwargs
+    assert kwargs["model"] == "gemini-2.5-flash"
+    assert kwargs["src"][0] == {"contents": "a", "config": {"system_instruction": "sys"}}
+    assert record.id == "abc123"
+    assert record.state == "JOB_STATE_PENDING"
+    assert store.get("batches/abc123").count == 2
+    assert list(store.iter_prompts(record)) == ["a", "b"]
+
+
+def test_submit_file_mode(store, client, monkeypatch):
+    monkeypatch.setattr(jobs, "INLINE_LIMIT_BYTES", 0)
+    uploaded = {}
+
+    def upload(file, config):
+        uploaded["lines"] = [json.loads(line) for line in open(file, encoding="utf-8")]
+        uploaded_file = Mock()
+        uploaded_file.name = "files/src"
+        return uploaded_file
+
+    client.files.upload.side_effect = upload
+    record = jobs.submit(client, store, "m", ["hello"], temperature=0.2)
+
+    assert record.mode == "file"
+    assert client.batches.create.call_args.kwargs["src"] == "files/src"
+    assert uploaded["lines"][0]["key"] == "0"
+    assert uploaded["lines"][0]["request"]["generation_config"] == {"temperature": 0.2}
+    assert not list(store.job_dir.glob(".src-*"))
+
+
+def test_wait_backs_off_until_done(store, client):
+    record = jobs.submit(client, store, "m", ["a"])
+    states = iter(["JOB_STATE_PENDING", "JOB_STATE_RUNNING", "JOB_STATE_SUCCEEDED"])
+    client.batches.get.side_effect = lambda name: Mock(state=next(states), error=None)
+    delays = []
+
+    jobs.wait(client, store, record, sleep=delays.append)
+
+    assert len(delays) == 2
+    assert delays[0] <= jobs.POLL_INITIAL
+    assert delays[1] <= jobs.POLL_INITIAL * jobs.POLL_FACTOR
+    assert store.get(record.id).state == "JOB_STATE_SUCCEEDED"
+
+
+def test_wait_timeout(store, client):
+    record = jobs.submit(client, store, "m", ["a"])
+    client.batches.get.return_value = Mock(state="JOB_STATE_RUNNING", error=None)
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    with pytest.raises(jobs.JobError):
+        jobs.wait(client, store, record, timeout=20, sleep=sleep, clock=lambda: now[0])
+
+
+def test_iter_results_inline(store, client):
+    record = jobs.submit(client, store, "m", ["a", "b"])
+    job = Mock(state=types.JobState.JOB_STATE_SUCCEEDED)
+    job.dest.inlined_responses = [
+        types.InlinedResponse(response=text_response("A")),
+        types.InlinedResponse(error=types.JobError(message="quota")),
+    ]
+
+    results = list(jobs.iter_results(client, store, record, job))
+    assert (results[0].prompt, results[0].response, results[0].tokens_used) == ("a", "A", 3)
+    assert results[1].error == "quota"
+
+
+def test_iter_results_from_file(store, client):
+    record = jobs.submit(client, store, "m", ["a", "b"])
+    job = Mock(state="JOB_STATE_SUCCEEDED")
+    job.dest.inlined_responses = None
+    job.dest.file_name = "files/out"
+    lines = [
+        {"key": "1", "response": {"candidates": [{"content": {"parts": [{"text": "B"}]}}]}},
+        {"key": "0", "error": {"message": "bad"}},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines).encode()
+    client.files.download.side_effect = lambda file, destination: destination.write(body)
+
+    results = list(jobs.iter_results(client, store, record, job))
+    assert [(r.index, r.prompt, r.response, r.error) for r in results] == [
+        (1, "b", "B", None),
+        (0, "a", None, "bad"),
+    ]
+    # Downloaded to a temporary file, which is removed afterwards
+    assert not list(store.job_dir.glob(".results-*"))
+
+
+def test_iter_results_requires_success(store, client):
+    record = jobs.submit(client, store, "m", ["a"])
+    with pytest.raises(jobs.JobError):
+        list(jobs.iter_results(client, store, record, Mock(state="JOB_STATE_FAILED")))
@@ -0,0 +1,145 @@
+from unittest.mock import Mock
+
+import pytest
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from ai_cli_assistant import keypool
+from ai_cli_assistant.config import KeyPoolSettings
+
+
+def quota_error(retry_delay=None):
+    details = []
+    if retry_delay:
+        details = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": retry_delay}]
+    body = {
+        "error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "x", "details": details}
+    }
+    return genai_errors.ClientError(429, body)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_pool(clock, count=3, **settings):
+    clients = []
+    for index in range(count):
+        client = Mock()
+        client.models.generate_content.return_value = f"reply-{index}"
+        clients.append((f"key{index}", client))
+    return keypool.KeyPool(clients, KeyPoolSettings(**settings), clock=clock)
+
+
+def test_requests_spread_over_keys(clock):
+    pooled = keypool.PooledClient(make_pool(clock))
+    replies = [pooled.models.generate_content(model="m", contents="hi") for _ in range(6)]
+    assert sorted(replies) == ["reply-0", "reply-0", "reply-1", "reply-1", "reply-2", "reply-2"]
+
+
+def test_requests_go_to_key_with_most_headroom(clock):
+    pool = make_pool(clock, count=3, requests_per_minute=2)
+    pool.keys[2].capacity = 1
+    picks = []
+    for _ in range(5):
+        state = pool.acquire()
+        picks.append(state.label)
+        pool.release(state)
+    assert picks == ["key0", "key1", "key2", "key0", "key1"]
+
+
+def test_quota_error_quarantines_and_fails_over(clock):
+    pool = make_pool(clock, count=2, quarantine=30)
+    first = pool.keys[0].client
+    first.models.generate_content.side_effect = quota_error()
+    pooled = keypool.PooledClient(pool)
+
+    assert pooled.models.generate_content(model="m", contents="hi") == "reply-1"
+    assert pool.keys[0].quota_errors == 1
+    assert pool.keys[0].capacity == 1
+
+    for _ in range(3):
+        assert pooled.models.generate_content(model="m", contents="hi") == "reply-1"
+    assert first.models.generate_content.call_count == 1
+
+    clock.now += 31
+    first.models.generate_content.side_effect = None
+    replies = {pooled.models.generate_content(model="m", contents="hi") for _ in range(4)}
+    assert "reply-0" in replies
+
+
+def test_server_retry_delay_sets_quarantine(clock):
+    pool = make_pool(clock, count=1)
+    state = pool.acquire()
+    pool.release(state, quota_error("7s"))
+    assert state.quarantined_until == clock.now + 7
+
+
+def test_all_keys_exhausted_raises(clock):
+    pool = make_pool(clock, count=2)
+    for _, client in [(state.label, state.client) for state in pool.keys]:
+        client.models.generate_content.side_effect = quota_error()
+    pooled = keypool.PooledClient(pool)
+    with pytest.raises(genai_errors.ClientError):
+        pooled.models.generate_content(model="m", contents="hi")
+
+    # Once every key is quarantined, the one released first is used
+    pool.keys[1].quarantined_until -= 10
+    assert pool.acquire() is pool.keys[1]
+    with pytest.raises(keypool.KeyPoolError):
+        pool.acquire(exclude=pool.keys)
+
+
+def test_capacity_recovers_on_success(clock):
+    pool = make_pool(clock, count=1)
+    state = pool.keys[0]
+    state.capacity = 1
+    pool.release(pool.acquire())
+    assert state.capacity == 2
+
+
+def test_file_references_and_other_services_use_first_key(clock):
+    pool = make_pool(clock)
+    pooled = keypool.PooledClient(pool)
+    part = types.Part.from_uri(file_uri="https://example.test/f", mime_type="image/png")
+    content = types.Content(role="user", parts=[part, types.Part.from_text(text="hi")])
+
+    for _ in range(3):
+        assert pooled.models.generate_content(model="m", contents=[content]) == "reply-0"
+    assert pooled.files is pool.keys[0].client.files
+    assert pooled.batches is pool.keys[0].client.batches
+
+
+def test_stream_fails_over_before_first_chunk(clock):
+    pool = make_pool(clock, count=2)
+    pool.keys[0].client.models.generate_content_stream.side_effect = quota_error()
+    pool.keys[1].client.models.generate_content_stream.return_value = iter(["a", "b"])
+    pooled = keypool.PooledClient(pool)
+
+    assert list(pooled.models.generate_content_stream(model="m", contents="hi")) == ["a", "b"]
+    assert [state.in_flight for state in pool.keys] == [0, 0]
+
+
+def test_running_requests_count_once(clock):
+    pool = make_pool(clock, count=2, requests_per_minute=2)
+    first = pool.acquire()
+    assert first.used(clock.now) == 1
+    assert pool.snapshot()[0]["recent"] == 1
+
+    # A key with headroom left keeps taking requests while one is still running
+    assert pool.acquire() is pool.keys[1]
+    assert pool.acquire() is first
+    assert first.in_flight == 2
+
+    # A quota error learns the requests actually sent, not twice the running ones
+    pool.release(first, quota_error())
+    assert first.capacity == 2
@@ -0,0 +1,55 @@
+from ai_cli_assistant import minimize
+from ai_cli_assistant.config import MinimizeSettings
+
+
+def test_strip_control_removes_escapes_and_redraws():
+    text = "\x1b[1;31mERROR\x1b[0m bad\r\n\x1b]0;title\x07ok\x00\ndl 10%\rdl 55%\rdl 100%\r\n"
+    assert minimize.strip_control(text) == "ERROR bad\nok\ndl 100%\n"
+
+
+def test_collapse_whitespace_keeps_indentation():
+    text = "\n\ndef f():  \n    return 1\t\n\n\n\n\nprint(f())\n\n"
+    assert minimize.collapse_whitespace(text) == "def f():\n    return 1\n\nprint(f())"
+
+
+def test_dedupe_lines_collapses_lines_and_blocks():
+    lines = ["start"] + ["connection refused"] * 5 + ["  at a()", "  at b()"] * 4 + ["end"]
+    assert minimize.dedupe_lines("\n".join(lines)).split("\n") == [
+        "start",
+        "connection refused",
+        "[previous line repeated 4 more times]",
+        "  at a()",
+        "  at b()",
+        "[previous 2 lines repeated 3 more times]",
+        "end",
+    ]
+    # Not worth a note
+    assert minimize.dedupe_lines("a\na") == "a\na"
+
+
+def test_truncate_middle_keeps_head_and_tail():
+    text = "\n".join(f"line {i}" for i in range(1000))
+    result = minimize.truncate_middle(text, 100)
+    assert result.startswith("line 0\n") and result.endswith("line 999")
+    assert "lines (~" in result and "omitted ...]" in result
+    assert len(result) <= 100 * 4 + 40
+    assert minimize.truncate_middle("short", 100) == "short"
+
+
+def test_truncate_middle_keeps_some_text_for_tiny_budgets():
+    text = "\n".join(f"line {i}" for i in range(1000))
+    result = minimize.truncate_middle(text, 10)
+    assert result.startswith("line 0\n") and result.endswith("line 999")
+    assert "omitted ...]" in result
+
+    short = "x" * 150
+    assert minimize.truncate_middle(short, 10) == short
+
+
+def test_minimize_reports_savings_per_step():
+    text = "\x1b[32mok\x1b[0m   \n" + "same line\n" * 200
+    result = minimize.minimize(text, MinimizeSettings(dedupe_lines=False), max_tokens=50)
+    assert list(result.saved_by_step) == ["strip_control", "collapse_whitespace", "truncate_middle"]
+    assert result.tokens <= 60 < result.original_tokens
+    assert result.saved == sum(result.saved_by_step.values())
+    assert minimize.minimize("plain").saved == 0
@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+
+from ai_cli_assistant.output import MachineWriter, OutputFormat, write_records
+
+
+def test_jsonl_events():
+    stream = io.BytesIO()
+    writer = MachineWriter(OutputFormat.JSONL, stream)
+    writer.start("m1")
+    writer.chunk("Hel")
+    writer.chunk("lo")
+    writer.usage({"total_token_count": 7})
+    writer.end()
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [e["event"] for e in events] == ["start", "chunk", "chunk", "usage", "end"]
+    assert events[0]["model"] == "m1"
+    assert events[3]["total_token_count"] == 7
+
+
+def test_json_single_object():
+    stream = io.BytesIO()
+    writer = MachineWriter(OutputFormat.JSON, stream)
+    writer.start("m1")
+    writer.chunk("Hel")
+    writer.chunk("lo")
+    writer.usage({"total_token_count": 7})
+    writer.end()
+
+    data = json.loads(stream.getvalue())
+    assert data == {"model": "m1", "response": "Hello", "usage": {"total_token_count": 7}}
+
+
+def test_raw_text():
+    stream = io.BytesIO()
+    writer = MachineWriter(OutputFormat.RAW, stream)
+    writer.start("m1")
+    writer.chunk("héllo")
+    writer.end()
+    assert stream.getvalue().decode("utf-8") == "héllo\n"
+
+
+def test_rich_not_supported():
+    with pytest.raises(ValueError):
+        MachineWriter(OutputFormat.RICH, io.BytesIO())
+
+
+def test_write_records_jsonl():
+    stream = io.BytesIO()
+    write_records(OutputFormat.JSONL, [{"a": 1}, {"a": 2}], stream=stream)
+    assert stream.getvalue() == b'{"a": 1}\n{"a": 2}\n'
+
+
+def test_items_in_raw_and_jsonl():
+    raw = io.BytesIO()
+    writer = MachineWriter(OutputFormat.RAW, stream=raw)
+    writer.start("m")
+    writer.item(0, {"a": 1})
+    writer.item(1, [2])
+    writer.end()
+    assert raw.getvalue() == b'{"a": 1}\n[2]\n'
+
+    lines = io.BytesIO()
+    writer = MachineWriter(OutputFormat.JSONL, stream=lines)
+    writer.start("m")
+    writer.item(0, {"a": 1})
+    writer.end()
+    events = [json.loads(line) for line in lines.getvalue().splitlines()]
+    assert events[1] == {"event": "item", "index": 0, "data": {"a": 1}}
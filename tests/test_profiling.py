@@ -0,0 +1,59 @@
+import pstats
+import threading
+import time
+import tracemalloc
+
+from ai_cli_assistant import profiling
+from ai_cli_assistant.profiling import ProfileMode
+
+
+def busy_work():
+    return sum(i * i for i in range(20000))
+
+
+def test_cpu_profile_writes_stats_and_summary(tmp_path):
+    profiler = profiling.start(ProfileMode.CPU, tmp_path, "ask", top=5)
+    busy_work()
+    report = profiler.stop()
+
+    prof, summary = report.files
+    assert prof.suffix == ".prof" and prof.name.startswith("ai-assistant-ask-")
+    functions = {func for _, _, func in pstats.Stats(str(prof)).stats}
+    assert "busy_work" in functions
+    assert "busy_work" in report.summary
+    assert summary.read_text(encoding="utf-8") == report.summary
+
+
+def test_memory_profile_reports_allocation_sites(tmp_path):
+    profiler = profiling.start(ProfileMode.MEM, tmp_path, "ask")
+    kept = [bytearray(1024) for _ in range(200)]
+    report = profiler.stop()
+
+    snapshot = tracemalloc.Snapshot.load(str(report.files[0]))
+    assert snapshot.statistics("lineno")
+    assert "peak" in report.summary and "test_profiling.py" in report.summary
+    assert not tracemalloc.is_tracing()
+    assert len(kept) == 200
+
+
+def test_sampling_profile_sees_worker_threads(tmp_path):
+    profiler = profiling.SamplingProfiler(tmp_path, "chat", interval=0.001)
+    done = threading.Event()
+
+    def worker():
+        while not done.is_set():
+            busy_work()
+
+    thread = threading.Thread(target=worker, name="worker")
+    profiler.start()
+    thread.start()
+    time.sleep(0.1)
+    done.set()
+    thread.join()
+    report = profiler.stop()
+
+    assert profiler.samples > 0
+    folded = report.files[0].read_text(encoding="utf-8").splitlines()
+    assert any(line.startswith("worker;") and "busy_work" in line for line in folded)
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in folded)
+    assert "Top 20 by self:" in report.summary
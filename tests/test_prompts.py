@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from ai_cli_assistant.utils import prompts
+
+
+def test_load_system_prompt():
+    assert "helpful terminal-based AI assistant" in prompts.load_system_prompt()
+
+
+def test_registry_resolves_packaged_templates():
+    registry = prompts.get_template_registry()
+    assert "code_review" in registry.paths()
+    assert registry.resolve("review").stem == "code_review"
+
+
+def test_registry_is_shared_and_compiles_once():
+    registry = prompts.get_template_registry()
+    assert prompts.get_template_registry() is registry
+    assert registry.get("code_review") is registry.get("code_review")
+
+
+def test_user_template_with_variables(tmp_path):
+    (tmp_path / "lang_review.txt").write_text("Review this $lang code:\n$code")
+    source = tmp_path / "main.py"
+    source.write_text("print('hi')\n")
+
+    registry = prompts.get_template_registry([str(tmp_path)])
+    variables = prompts.parse_variables(["lang=py", f"code=@{source}"])
+
+    assert registry.render("lang_review", variables) == "Review this py code:\nprint('hi')"
+
+
+def test_user_template_recompiled_when_changed(tmp_path):
+    template_file = tmp_path / "greeting.txt"
+    template_file.write_text("Hello")
+    registry = prompts.TemplateRegistry([tmp_path])
+    first = registry.get("greeting")
+
+    template_file.write_text("Hello again")
+    os.utime(template_file, ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+    assert registry.render("greeting") == "Hello again"
+
+
+def test_missing_variable(tmp_path):
+    (tmp_path / "needs_lang.txt").write_text("Language: $lang")
+    registry = prompts.TemplateRegistry([tmp_path])
+
+    with pytest.raises(prompts.TemplateError) as exc:
+        registry.render("needs_lang")
+    assert "lang" in str(exc.value)
+
+
+def test_unknown_template():
+    with pytest.raises(prompts.TemplateError) as exc:
+        prompts.get_template_registry().resolve("does-not-exist")
+    assert "not found" in str(exc.value)
+
+
+def test_parse_variables_invalid():
+    with pytest.raises(prompts.TemplateError):
+        prompts.parse_variables(["no-equals-sign"])
@@ -0,0 +1,89 @@
+import io
+
+from rich.console import Console
+from rich.syntax import Syntax
+
+from ai_cli_assistant import render
+from ai_cli_assistant.render import BlockSplitter, LiveMarkdown
+
+REPLY = (
+    "# Title\n"
+    "Some *intro* text\n"
+    "over two lines.\n"
+    "\n"
+    "- one\n"
+    "\n"
+    "  continued item\n"
+    "- two\n"
+    "\n"
+    "```python\n"
+    "x = 1\n"
+    "\n"
+    "print(x)\n"
+    "```\n"
+    "Done."
+)
+
+
+def split_in_chunks(text, size):
+    splitter = BlockSplitter()
+    blocks = []
+    for i in range(0, len(text), size):
+        blocks.extend(splitter.feed(text[i : i + size]))
+    return blocks + splitter.close()
+
+
+def test_blocks_do_not_depend_on_chunking():
+    expected = [
+        "# Title",
+        "Some *intro* text\nover two lines.",
+        "- one\n\n  continued item\n- two",
+        "```python\nx = 1\n\nprint(x)\n```",
+        "Done.",
+    ]
+    assert split_in_chunks(REPLY, len(REPLY)) == expected
+    for size in (1, 3, 7):
+        assert split_in_chunks(REPLY, size) == expected
+
+
+def test_blocks_complete_once_the_next_one_starts():
+    splitter = BlockSplitter()
+    assert splitter.feed("First paragraph.\n\n") == []
+    assert splitter.tail == "First paragraph.\n\n"
+    assert splitter.feed("Sec") == ["First paragraph."]
+    assert splitter.tail == "Sec"
+    assert splitter.feed("ond\n```\ncode\n") == ["Second"]
+    assert splitter.feed("```\n") == ["```\ncode\n```"]
+    assert splitter.close() == []
+
+
+def test_render_block_highlights_fenced_code():
+    rendered = render.render_block("```python\nx = 1\n```")
+    assert isinstance(rendered, Syntax)
+    assert rendered.code == "x = 1"
+    assert rendered.lexer.name == "Python"
+
+    unclosed = render.render_block("~~~nosuchlanguage\nplain\n")
+    assert unclosed.code == "plain\n"
+
+
+def test_live_markdown_renders_each_block_once(monkeypatch):
+    calls = []
+    original = render.render_block
+
+    def counting(block, code_theme=render.DEFAULT_CODE_THEME):
+        calls.append(block)
+        return original(block, code_theme)
+
+    monkeypatch.setattr(render, "render_block", counting)
+    out = io.StringIO()
+    console = Console(file=out, force_terminal=False, width=60)
+    with LiveMarkdown(console) as live:
+        for char in REPLY:
+            live.feed(char)
+
+    # Non-terminal consoles never refresh the live tail, so only frozen blocks render
+    assert len(calls) == len(set(calls)) == live.blocks == 5
+    text = out.getvalue()
+    assert "Title" in text and "print(x)" in text and "Done." in text
+    assert "```" not in text
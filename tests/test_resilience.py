@@ -0,0 +1,119 @@
+import time
+from unittest.mock import Mock
+
+import httpx
+import pytest
+from google.genai import errors as genai_errors
+
+from ai_cli_assistant import resilience
+from ai_cli_assistant.config import RetrySettings
+from ai_cli_assistant.resilience import CircuitBreaker, ErrorKind, RetryBudget
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    resilience.configure(RetrySettings())
+    resilience.reset()
+    yield
+    resilience.reset()
+
+
+def api_error(code, status, details=None):
+    body = {"error": {"code": code, "status": status, "message": "x", "details": details or []}}
+    cls = genai_errors.ServerError if code >= 500 else genai_errors.ClientError
+    return cls(code, body)
+
+
+def test_classify_error():
+    assert resilience.classify_error(api_error(503, "UNAVAILABLE")) is ErrorKind.RETRYABLE
+    assert resilience.classify_error(api_error(429, "RESOURCE_EXHAUSTED")) is ErrorKind.QUOTA
+    assert resilience.classify_error(api_error(400, "INVALID_ARGUMENT")) is ErrorKind.FATAL
+    assert resilience.classify_error(api_error(403, "PERMISSION_DENIED")) is ErrorKind.FATAL
+    assert resilience.classify_error(httpx.ConnectError("reset")) is ErrorKind.RETRYABLE
+    assert resilience.classify_error(ConnectionError("reset")) is ErrorKind.RETRYABLE
+    assert resilience.classify_error(TimeoutError()) is ErrorKind.RETRYABLE
+
+
+def test_unknown_errors_are_fatal():
+    for exc in (TypeError("bug"), KeyError("text"), ValueError("bad"), RuntimeError()):
+        assert resilience.classify_error(exc) is ErrorKind.FATAL
+
+
+def test_server_delay_from_retry_info():
+    exc = api_error(
+        429,
+        "RESOURCE_EXHAUSTED",
+        [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "7s"}],
+    )
+    assert resilience.server_delay(exc) == 7.0
+    assert resilience.backoff_delay(1, exc, max_wait=10, rng=lambda low, high: low) == 7.0
+    assert resilience.backoff_delay(1, exc, max_wait=5) is None
+
+
+def test_quota_without_hint_is_not_retried():
+    exc = api_error(429, "RESOURCE_EXHAUSTED")
+    assert resilience.backoff_delay(1, exc, max_wait=10) is None
+    assert resilience.should_retry(exc, 1) is False
+
+
+def test_backoff_is_jittered_and_capped():
+    exc = ConnectionError("reset")
+    for attempt in range(1, 8):
+        delay = resilience.backoff_delay(attempt, exc, max_wait=4)
+        ceiling = min(4, 2 ** (attempt - 1))
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_retry_budget_refills_from_successes():
+    budget = RetryBudget(ratio=0.5, reserve=1)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_success()
+    budget.record_success()
+    assert budget.try_spend()
+
+
+def test_circuit_breaker_opens_and_probes():
+    now = [0.0]
+    breaker = CircuitBreaker("m", threshold=2, cooldown=10, clock=lambda: now[0])
+
+    breaker.record_failure(ErrorKind.RETRYABLE)
+    breaker.before_call()
+    breaker.record_failure(ErrorKind.RETRYABLE)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+
+    now[0] = 11
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_interrupted_probe_frees_the_half_open_slot():
+    resilience.configure(RetrySettings(breaker_threshold=1, breaker_cooldown=0.01))
+    with pytest.raises(ConnectionError):
+        resilience.guarded_call("m", Mock(side_effect=ConnectionError("down")))
+    time.sleep(0.02)
+
+    # The probe is interrupted: the next call probes instead of being rejected
+    with pytest.raises(KeyboardInterrupt):
+        resilience.guarded_call("m", Mock(side_effect=KeyboardInterrupt))
+    assert resilience.get_breaker("m").state == CircuitBreaker.OPEN
+    assert resilience.guarded_call("m", lambda: "ok") == "ok"
+    assert resilience.get_breaker("m").state == CircuitBreaker.CLOSED
+
+
+def test_guarded_call_records_failures_per_model():
+    resilience.configure(RetrySettings(breaker_threshold=1))
+    failing = Mock(side_effect=ConnectionError("down"))
+
+    with pytest.raises(ConnectionError):
+        resilience.guarded_call("flaky", failing)
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.guarded_call("flaky", failing)
+    assert failing.call_count == 1
+    assert resilience.guarded_call("healthy", lambda: "ok") == "ok"
@@ -0,0 +1,102 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from ai_cli_assistant.runner import RequestCancelledError, RequestRunner
+
+
+@pytest.fixture
+def request_runner():
+    request_runner = RequestRunner(poll_interval=0.01)
+    yield request_runner
+    request_runner.shutdown()
+
+
+def test_run_returns_result(request_runner):
+    assert request_runner.run(lambda a, b: a + b, 2, 3) == 5
+
+
+def test_run_propagates_errors(request_runner):
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        request_runner.run(fail)
+
+
+def test_iterate_yields_items(request_runner):
+    assert list(request_runner.iterate(lambda: iter([1, 2, 3]))) == [1, 2, 3]
+
+
+def test_iterate_propagates_errors(request_runner):
+    def broken():
+        yield 1
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        list(request_runner.iterate(broken))
+
+
+def test_iterate_cancel_stops_worker(request_runner):
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                time.sleep(0.005)
+                yield "chunk"
+        finally:
+            closed.set()
+
+    stream = request_runner.iterate(endless)
+    assert next(stream) == "chunk"
+    with pytest.raises(RequestCancelledError):
+        stream.throw(KeyboardInterrupt)
+    assert closed.wait(timeout=1)
+
+
+def test_run_cancelled_by_interrupt(request_runner, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def fake_wait(self, timeout=None):
+        calls.append(timeout)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(Future, "result", fake_wait)
+    with pytest.raises(RequestCancelledError):
+        request_runner.run(release.wait, 1)
+    assert calls == [0.01]
+
+
+def test_on_caller_thread_runs_on_the_waiting_thread(request_runner):
+    def request():
+        return request_runner.on_caller_thread(threading.current_thread, default=None)
+
+    assert request_runner.run(request) is threading.current_thread()
+    # Outside a request, the call is made directly
+    assert request_runner.on_caller_thread(lambda: "direct", default=None) == "direct"
+
+
+def test_cancel_during_pending_approval_declines_it(request_runner):
+    answers = []
+    finished = threading.Event()
+    asked = []
+
+    def prompt(question):
+        asked.append(question)
+        raise KeyboardInterrupt  # Ctrl+C at the question
+
+    def request():
+        answers.append(request_runner.on_caller_thread(prompt, "Allow?", default=False))
+        # Later questions from the cancelled request are not asked at all
+        answers.append(request_runner.on_caller_thread(prompt, "And this?", default=False))
+        finished.set()
+
+    with pytest.raises(RequestCancelledError):
+        request_runner.run(request)
+    assert finished.wait(timeout=1)
+    assert answers == [False, False]
+    assert asked == ["Allow?"]
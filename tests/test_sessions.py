@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from ai_cli_assistant import sessions
+
+
+def test_new_session_is_indexed(tmp_path):
+    session = sessions.ChatSession.open(tmp_path, name="work", model="m1")
+
+    index = sessions.load_index(tmp_path)
+    assert index["last"] == "work"
+    assert index["sessions"]["work"]["id"] == session.session_id
+    assert session.turn == 0
+
+
+def test_add_turn_appends_transcript(tmp_path):
+    session = sessions.ChatSession.open(tmp_path, name="work")
+    assert session.add_turn("hi", "hello") == 1
+    assert session.add_turn("again", "sure") == 2
+
+    lines = session.transcript_path.read_text().splitlines()
+    assert [json.loads(line)["turn"] for line in lines] == [1, 1, 2, 2]
+    assert sessions.load_index(tmp_path)["sessions"]["work"]["turns"] == 2
+
+
+def test_resume_loads_only_window(tmp_path):
+    session = sessions.ChatSession.open(tmp_path, name="long", window=50)
+    for i in range(30):
+        session.add_turn(f"question {i}", f"answer {i}")
+
+    resumed = sessions.ChatSession.open(tmp_path, resume=True, window=3)
+    assert resumed.name == "long"
+    assert resumed.session_id == session.session_id
+    assert resumed.turn == 30
+    assert [m["content"] for m in resumed.messages][0] == "question 27"
+    assert len(resumed.messages) == 6
+
+    prompt = resumed.build_prompt("next")
+    assert prompt.endswith("assistant: answer 29\nuser: next")
+
+
+def test_resume_without_sessions(tmp_path):
+    with pytest.raises(sessions.SessionError):
+        sessions.ChatSession.open(tmp_path, resume=True)
+
+
+def test_invalid_session_name(tmp_path):
+    with pytest.raises(sessions.SessionError):
+        sessions.ChatSession.open(tmp_path, name="../escape")
+
+
+def test_tail_lines_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, "_TAIL_BLOCK_SIZE", 8)
+    path = tmp_path / "t.jsonl"
+    path.write_text("".join(f"line {i}\n" for i in range(100)))
+
+    assert sessions.tail_lines(path, 3) == ["line 97", "line 98", "line 99"]
+
+
+def test_build_prompt_respects_token_budget(tmp_path):
+    session = sessions.ChatSession.open(tmp_path, name="budget")
+    for i in range(10):
+        session.add_turn("q" * 40, "a" * 40)
+
+    prompt = session.build_prompt("latest", max_tokens=30)
+    assert prompt.endswith("user: latest")
+    assert len(prompt) <= 30 * 4
